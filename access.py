@@ -0,0 +1,134 @@
+"""Who is signed in, and what they may do.
+
+The session only carries ``user_id``. ``current_user()`` resolves it once
+per request through ``user_cache``, a per-worker cache of small immutable
+user records, so a role change applies on the next request instead of at
+the next sign-in.
+
+The cache checks the ``users`` data version (see ``versions.py``) at most
+every ``USER_CACHE_SECONDS`` and drops everything when another worker has
+changed a user; the worker making a change forgets that user at once. In
+between, authorizing a request costs no query at all.
+"""
+import functools
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask import flash, g, jsonify, redirect, request, session, url_for
+
+from models import db, User
+import versions
+
+STAFF = ('admin', 'employee')
+ROLES = ('customer', 'employee', 'admin')
+
+CurrentUser = namedtuple('CurrentUser', ['id', 'name', 'email', 'role'])
+
+
+class UserCache:
+    def __init__(self, ttl=5.0, maxsize=10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.users = OrderedDict()
+        self.version = None
+        self.checked = 0.0
+        self.lock = threading.Lock()
+
+    def configure(self, ttl, maxsize):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.clear()
+
+    def _check_version(self):
+        if time.monotonic() - self.checked < self.ttl and self.version is not None:
+            return
+        version = versions.current(versions.USERS)
+        with self.lock:
+            if version != self.version:
+                self.users.clear()
+                self.version = version
+            self.checked = time.monotonic()
+
+    def get(self, user_id):
+        """The user's record, or None if there is no such user."""
+        self._check_version()
+        with self.lock:
+            user = self.users.get(user_id)
+            if user is not None:
+                self.users.move_to_end(user_id)
+                return user
+        row = (
+            db.session.query(User.id, User.name, User.email, User.role)
+            .filter(User.id == user_id)
+            .first()
+        )
+        if row is None:
+            return None
+        user = CurrentUser(*row)
+        with self.lock:
+            self.users[user_id] = user
+            while len(self.users) > self.maxsize:
+                self.users.popitem(last=False)
+        return user
+
+    def forget(self, user_id):
+        with self.lock:
+            self.users.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.users.clear()
+            self.version = None
+
+
+user_cache = UserCache()
+
+
+def current_user():
+    """The signed-in user of this request, or None."""
+    if '_current_user' not in g:
+        user_id = session.get('user_id')
+        user = user_cache.get(user_id) if user_id is not None else None
+        if user_id is not None and user is None:
+            session.clear()  # the account is gone
+        g._current_user = user
+    return g._current_user
+
+
+def user_changed(user_id):
+    """Call after committing a change to a user (with ``versions.bump(USERS)``)."""
+    user_cache.forget(user_id)
+    g.pop('_current_user', None)
+
+
+def login_required(role=None, api=False):
+    """Require a signed-in user, optionally with one of ``role`` (a role or tuple of roles).
+
+    Pages redirect with a flash message; ``api=True`` views get a JSON 401/403.
+    """
+    roles = (role,) if isinstance(role, str) else tuple(role or ())
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            user = current_user()
+            if user is None:
+                if api:
+                    return jsonify({"error": "Login required"}), 401
+                flash('Please log in first.')
+                return redirect(url_for('users.login'))
+            if roles and user.role not in roles:
+                if api:
+                    return jsonify({"error": "You are not authorized to do this."}), 403
+                flash('You are not authorized to do this.')
+                back = request.referrer if request.referrer and request.referrer != request.url else None
+                return redirect(back or url_for('products.order'))
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def init_app(app):
+    config = app.config
+    user_cache.configure(config.get('USER_CACHE_SECONDS', 5), config.get('USER_CACHE_SIZE', 10000))
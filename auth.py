@@ -0,0 +1,188 @@
+"""Password hashing off the request thread, PIN hashing and login throttling.
+
+Password hashes (scrypt) are deliberately slow, so ``hash_password`` and
+``verify_password`` run them in a small process pool. At most
+``AUTH_HASH_QUEUE`` jobs may be waiting or running per worker; beyond that
+``AuthBusy`` is raised at once instead of piling up blocked requests.
+
+PINs only unlock a register for staff switching over, so they use a
+cheaper salted PBKDF2 hash computed inline; admins cannot sign in with one,
+and a few wrong PINs lock PIN sign-in until a password sign-in (the count is
+kept on the user row, shared by all workers). Both login paths call
+``login_limiter.retry_after`` before any hashing: one token bucket per
+account and one per client address.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# ~10 ms per hash versus ~170 ms for the scrypt password hash.
+PIN_HASH_METHOD = 'pbkdf2:sha256:20000'
+
+
+class AuthBusy(Exception):
+    """Raised when the hashing pool is saturated or too slow to answer."""
+
+
+def hash_pin(pin):
+    return generate_password_hash(pin, method=PIN_HASH_METHOD)
+
+
+def check_pin(pin_hash, pin):
+    return bool(pin_hash) and check_password_hash(pin_hash, pin)
+
+
+# --- HASHING POOL ---
+class HashPool:
+    """Bounded process pool for password hashing.
+
+    The executor is created on first use in each process, so workers forked
+    by ``gunicorn --preload`` each get their own. With ``workers=0`` hashes
+    run inline (development, single-process tools).
+    """
+
+    def __init__(self, workers=2, max_pending=32, timeout=10):
+        self.configure(workers, max_pending, timeout)
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.peak = 0
+        self.submitted = 0
+        self.rejected = 0
+        self._executor = None
+        self._pid = None
+
+    def configure(self, workers, max_pending, timeout):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+
+    def _pool(self):
+        with self.lock:
+            if self._executor is None or self._pid != os.getpid():
+                # Children only ever run werkzeug's hash functions; they
+                # never touch the app, its connections or its locks.
+                self._executor = ProcessPoolExecutor(self.workers)
+                self._pid = os.getpid()
+            return self._executor
+
+    def run(self, fn, *args):
+        with self.lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise AuthBusy("Too many sign-ins in progress")
+            self.pending += 1
+            self.submitted += 1
+            self.peak = max(self.peak, self.pending)
+        try:
+            if not self.workers:
+                return fn(*args)
+            future = self._pool().submit(fn, *args)
+            try:
+                return future.result(timeout=self.timeout)
+            except FutureTimeout:
+                future.cancel()
+                raise AuthBusy("Sign-in timed out")
+        except BrokenProcessPool:
+            # A hashing process died; start a fresh pool on the next call.
+            with self.lock:
+                self._executor = None
+            raise AuthBusy("Sign-in is restarting")
+        finally:
+            with self.lock:
+                self.pending -= 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "queued": max(self.pending - self.workers, 0) if self.workers else 0,
+                "peak": self.peak,
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+            }
+
+
+hash_pool = HashPool()
+
+
+def hash_password(password):
+    return hash_pool.run(generate_password_hash, password)
+
+
+def verify_password(password_hash, password):
+    return hash_pool.run(check_password_hash, password_hash, password)
+
+
+# --- THROTTLING ---
+class TokenBucket:
+    """Per-key token buckets: ``burst`` attempts, refilled at ``per_minute``.
+
+    Keys are kept in a bounded LRU; an evicted key simply starts again with
+    a full bucket.
+    """
+
+    def __init__(self, burst, per_minute, max_keys=10000):
+        self.burst = burst
+        self.rate = per_minute / 60.0
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def take(self, key, now=None):
+        """Spend one token; return 0 when allowed, else seconds until one is available."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            tokens, stamp = self.buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - stamp) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+            else:
+                wait = (1 - tokens) / self.rate
+            self.buckets[key] = (tokens, now)
+            while len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+            return wait
+
+
+class LoginLimiter:
+    """Throttle sign-in attempts per account and per client address."""
+
+    def __init__(self, account_burst=5, account_per_minute=5, ip_burst=30, ip_per_minute=60):
+        self.configure(account_burst, account_per_minute, ip_burst, ip_per_minute)
+
+    def configure(self, account_burst, account_per_minute, ip_burst, ip_per_minute):
+        self.accounts = TokenBucket(account_burst, account_per_minute)
+        self.addresses = TokenBucket(ip_burst, ip_per_minute)
+
+    def retry_after(self, account, address):
+        """Return 0 if the attempt may proceed, else the seconds to wait."""
+        wait = self.addresses.take(address or '-')
+        if wait:
+            return wait
+        return self.accounts.take(str(account).strip().lower())
+
+
+login_limiter = LoginLimiter()
+
+
+def init_app(app):
+    config = app.config
+    hash_pool.configure(
+        config.get('AUTH_HASH_WORKERS', 2),
+        config.get('AUTH_HASH_QUEUE', 32),
+        config.get('AUTH_HASH_TIMEOUT', 10),
+    )
+    login_limiter.configure(
+        config.get('AUTH_ACCOUNT_BURST', 5),
+        config.get('AUTH_ACCOUNT_PER_MINUTE', 5),
+        config.get('AUTH_IP_BURST', 30),
+        config.get('AUTH_IP_PER_MINUTE', 60),
+    )
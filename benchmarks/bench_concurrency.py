@@ -0,0 +1,122 @@
+"""Concurrent order throughput with and without the SQLite tuning layer.
+
+Spawns several worker processes (like gunicorn sync workers) that place
+orders through the Flask test client against one shared SQLite file while
+reader processes poll order history, once with SQLite defaults
+(SQLITE_TUNING=0) and once with the WAL/busy_timeout pragmas.
+
+    python benchmarks/bench_concurrency.py --writers 4 --readers 2 --seconds 10
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PRODUCTS = 50
+CUSTOMERS = 200
+
+
+def _load_app(db_path, tuned):
+    os.environ['DATABASE_URL'] = 'sqlite:///' + db_path
+    os.environ['SQLITE_TUNING'] = '1' if tuned else '0'
+    from app import create_app
+    return create_app()
+
+
+def seed(db_path, tuned):
+    app = _load_app(db_path, tuned)
+    from models import db, Product, Customer
+    with app.app_context():
+        db.create_all()
+        db.session.add_all(
+            Product(name=f"Item {i}", category="Bench", stock=10 ** 9, price=1 + i % 7, image_url="")
+            for i in range(PRODUCTS)
+        )
+        db.session.add_all(Customer(name=f"Customer {i}", phone=f"555{i:07d}") for i in range(CUSTOMERS))
+        db.session.commit()
+
+
+def writer(db_path, tuned, seconds, results):
+    app = _load_app(db_path, tuned)
+    client = app.test_client()
+    ok = failed = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        items = [{"product_id": random.randint(1, PRODUCTS), "quantity": random.randint(1, 3)}
+                 for _ in range(random.randint(1, 5))]
+        try:
+            response = client.post('/create_order', json={
+                "customer_id": random.randint(1, CUSTOMERS), "items": items})
+            if response.status_code == 200:
+                ok += 1
+            else:
+                failed += 1
+        except Exception:  # "database is locked" surfaces as OperationalError
+            failed += 1
+    results.put(("write", ok, failed))
+
+
+def reader(db_path, tuned, seconds, results):
+    app = _load_app(db_path, tuned)
+    client = app.test_client()
+    ok = failed = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        try:
+            response = client.get(f'/orders/{random.randint(1, CUSTOMERS)}')
+            ok += response.status_code == 200
+            failed += response.status_code != 200
+        except Exception:
+            failed += 1
+    results.put(("read", ok, failed))
+
+
+def run(tuned, writers, readers, seconds):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        ctx = multiprocessing.get_context('spawn')
+        p = ctx.Process(target=seed, args=(db_path, tuned))
+        p.start()
+        p.join()
+
+        results = ctx.Queue()
+        procs = [ctx.Process(target=writer, args=(db_path, tuned, seconds, results)) for _ in range(writers)]
+        procs += [ctx.Process(target=reader, args=(db_path, tuned, seconds, results)) for _ in range(readers)]
+        for p in procs:
+            p.start()
+        totals = {"write": [0, 0], "read": [0, 0]}
+        for _ in procs:
+            kind, ok, failed = results.get()
+            totals[kind][0] += ok
+            totals[kind][1] += failed
+        for p in procs:
+            p.join()
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    print(f"{args.writers} writers, {args.readers} readers, {args.seconds:g}s per run")
+    rates = {}
+    for label, tuned in (("defaults", False), ("tuned", True)):
+        totals = run(tuned, args.writers, args.readers, args.seconds)
+        rates[label] = totals["write"][0] / args.seconds
+        print(f"{label:>9}: {rates[label]:8.1f} orders/s  ({totals['write'][1]} failed), "
+              f"{totals['read'][0] / args.seconds:8.1f} history reads/s ({totals['read'][1]} failed)")
+    if rates["defaults"]:
+        print(f"speedup: {rates['tuned'] / rates['defaults']:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Cold start cost of the application factory.
+
+Each sample runs in a fresh interpreter and reports the time to import the
+app module plus ``create_app()`` and the resulting peak RSS, once as a web
+worker sees it and once with ``FLASK_RUN_FROM_CLI=true`` (which also loads
+Flask-Migrate/Alembic for ``flask db``).
+
+    python benchmarks/bench_startup.py --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, resource, sys, time
+sys.path.insert(0, {root!r})
+started = time.perf_counter()
+from app import create_app
+create_app()
+elapsed = time.perf_counter() - started
+print(json.dumps({{
+    "ms": elapsed * 1000,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "alembic": "alembic" in sys.modules,
+}}))
+"""
+
+
+def sample(cli, db_path):
+    env = dict(os.environ, DATABASE_URL='sqlite:///' + db_path, SECRET_KEY='bench')
+    env.pop('FLASK_RUN_FROM_CLI', None)
+    if cli:
+        env['FLASK_RUN_FROM_CLI'] = 'true'
+    out = subprocess.run(
+        [sys.executable, '-c', PROBE.format(root=ROOT)],
+        env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        for label, cli in (('worker', False), ('flask CLI', True)):
+            samples = [sample(cli, db_path) for _ in range(args.runs)]
+            print(f"{label:>10}: {statistics.median(s['ms'] for s in samples):7.1f} ms median, "
+                  f"{statistics.median(s['rss_mb'] for s in samples):6.1f} MB peak RSS, "
+                  f"alembic loaded: {samples[0]['alembic']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,437 @@
+"""Latency, throughput and query-count benchmarks of the POS hot paths.
+
+Seeds a fresh SQLite database (see seed.py), then drives each scenario
+(order submission, catalog, inventory page, order history, customer
+directory, make-line queue, login) in two ways:
+
+* ``client``: sequential requests through the Flask test client in this
+  process. Besides latency it reports exact SQL statements per request,
+  read from the metrics registry (metrics.py).
+* ``http``: a real gunicorn server (gunicorn.conf.py) hammered by several
+  load-generator processes over keep-alive HTTP connections.
+
+Each scenario reports p50/p95/p99 latency and throughput. ``--save`` writes
+the results as a JSON baseline; ``--compare`` checks a run against one and
+exits non-zero on a regression (slower p95 or lower throughput beyond
+``--tolerance``, or any extra SQL statement per request).
+
+    python benchmarks/bench_suite.py --save benchmarks/baselines/local.json
+    python benchmarks/bench_suite.py --compare benchmarks/baselines/local.json
+    python benchmarks/bench_suite.py --mode http --clients 8 --seconds 10 --scenario create_order
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+from collections import Counter
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import seed as seeding  # noqa: E402
+
+# The suite measures the endpoints, not the login throttle.
+BENCH_ENV = {
+    'SECRET_KEY': 'bench',
+    'AUTH_ACCOUNT_BURST': '1000000',
+    'AUTH_ACCOUNT_PER_MINUTE': '1000000',
+    'AUTH_IP_BURST': '1000000',
+    'AUTH_IP_PER_MINUTE': '1000000',
+    'SLOW_QUERY_MS': '1000',
+}
+
+
+# --- SCENARIOS ---
+def _create_order(rng, volumes):
+    items = [{"product_id": seeding.stocked_product(rng, volumes["products"]), "quantity": rng.randint(1, 3)}
+             for _ in range(rng.randint(1, 5))]
+    body = json.dumps({"customer_id": rng.randint(1, volumes["customers"]), "items": items})
+    return 'POST', '/create_order', body, 'application/json'
+
+
+def _products(rng, volumes):
+    return 'GET', '/products', None, None
+
+
+def _inventory(rng, volumes):
+    return 'GET', '/inventory', None, None
+
+
+def _customer_orders(rng, volumes):
+    return 'GET', f'/orders/{rng.randint(1, volumes["customers"])}', None, None
+
+
+def _customers(rng, volumes):
+    # Half first pages of the directory, half prefix searches.
+    if rng.random() < 0.5:
+        return 'GET', '/customers', None, None
+    query = urllib.parse.urlencode({"q": f"Customer {rng.randint(0, 199):03d}"})
+    return 'GET', f'/customers?{query}', None, None
+
+
+def _queue(rng, volumes):
+    return 'GET', '/queue', None, None
+
+
+def _login(rng, volumes):
+    body = urllib.parse.urlencode({
+        "email": seeding.staff_email(rng.randrange(seeding.STAFF_USERS)),
+        "password": seeding.STAFF_PASSWORD,
+    })
+    return 'POST', '/login', body, 'application/x-www-form-urlencoded'
+
+
+# name -> (request builder, needs a signed-in session, share of --requests)
+SCENARIOS = {
+    'create_order': (_create_order, False, 1.0),
+    'products': (_products, False, 1.0),
+    'inventory': (_inventory, True, 1.0),
+    'customer_orders': (_customer_orders, False, 1.0),
+    'customers': (_customers, False, 1.0),
+    'queue': (_queue, True, 1.0),
+    # Password hashing is deliberately slow; fewer samples keep runs short.
+    'login': (_login, False, 0.1),
+}
+
+
+def _ok(status):
+    return status < 400
+
+
+def summarize(latencies, errors, seconds, statements=None):
+    """Percentiles (ms) and throughput of one scenario run.
+
+    ``latencies`` are of successful requests only; ``errors`` counts the
+    failed ones by status (``"connection"`` when there was no response).
+    """
+    latencies = sorted(latencies)
+
+    def percentile(p):
+        if not latencies:
+            return None
+        return round(latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000, 2)
+
+    result = {
+        "requests": len(latencies),
+        "errors": sum(errors.values()),
+        "error_statuses": dict(sorted(errors.items())),
+        "seconds": round(seconds, 2),
+        "throughput_rps": round(len(latencies) / seconds, 1) if seconds else None,
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+    }
+    if statements is not None:
+        result["queries_per_request"] = round(statements, 2)
+    return result
+
+
+# --- TEST CLIENT ---
+def _statement_totals():
+    import metrics
+    total = count = 0
+    for _, h in metrics.registry.snapshot()["statements"]:
+        total += h["sum"]
+        count += h["count"]
+    return total, count
+
+
+def run_client(scenarios, volumes, requests, warmup, seed):
+    from app import create_app
+    app = create_app()
+    results = {}
+    for name in scenarios:
+        build, needs_login, share = SCENARIOS[name]
+        rng = random.Random(f"{seed}-{name}")
+        client = app.test_client()
+        if needs_login:
+            _client_login(client)
+        for _ in range(warmup):
+            _client_send(client, *build(rng, volumes))
+
+        n = max(int(requests * share), 1)
+        statements_before, count_before = _statement_totals()
+        latencies, errors = [], Counter()
+        started = time.perf_counter()
+        for _ in range(n):
+            t0 = time.perf_counter()
+            status = _client_send(client, *build(rng, volumes))
+            if _ok(status):
+                latencies.append(time.perf_counter() - t0)
+            else:
+                errors[str(status)] += 1
+        elapsed = time.perf_counter() - started
+        statements_after, count_after = _statement_totals()
+        per_request = (statements_after - statements_before) / max(count_after - count_before, 1)
+        results[name] = summarize(latencies, errors, elapsed, per_request)
+        _print_row('client', name, results[name])
+    return results
+
+
+def _client_send(client, method, path, body, content_type):
+    response = client.open(path, method=method, data=body, content_type=content_type)
+    response.close()
+    return response.status_code
+
+
+def _client_login(client):
+    response = client.post('/login', data={"email": seeding.ADMIN_EMAIL, "password": seeding.STAFF_PASSWORD})
+    if response.status_code != 302:
+        raise RuntimeError(f"Benchmark login failed with {response.status_code}")
+
+
+# --- HTTP ---
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(db_path, workers, threads, metrics_dir):
+    port = _free_port()
+    env = dict(os.environ, **BENCH_ENV,
+               DATABASE_URL='sqlite:///' + db_path,
+               WEB_CONCURRENCY=str(workers),
+               GUNICORN_THREADS=str(threads),
+               BIND=f'127.0.0.1:{port}',
+               METRICS_DIR=metrics_dir)
+    env.pop('FLASK_RUN_FROM_CLI', None)
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--log-level', 'warning'],
+        cwd=ROOT, env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with {server.returncode}")
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/products', timeout=1).read()
+            return server, port
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("gunicorn did not start within 30s")
+
+
+class _Connection:
+    """Keep-alive connection that reconnects after errors and keeps the session cookie."""
+
+    def __init__(self, port):
+        self.port = port
+        self.conn = None
+        self.cookie = None
+
+    def send(self, method, path, body, content_type):
+        headers = {}
+        if content_type:
+            headers['Content-Type'] = content_type
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        try:
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+            self.conn.request(method, path, body=body.encode() if body else None, headers=headers)
+            response = self.conn.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            if self.conn is not None:
+                self.conn.close()
+            self.conn = None
+            return None
+        cookie = response.getheader('Set-Cookie')
+        if cookie and cookie.startswith('session='):
+            self.cookie = cookie.split(';', 1)[0]
+        return response.status
+
+
+def load_worker(port, name, volumes, seconds, warmup, seed, index, results):
+    build, needs_login, _ = SCENARIOS[name]
+    rng = random.Random(f"{seed}-{name}-{index}")
+    connection = _Connection(port)
+    if needs_login:
+        connection.send(*_login(random.Random(index), volumes))
+    for _ in range(warmup):
+        connection.send(*build(rng, volumes))
+
+    latencies, errors = [], Counter()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        status = connection.send(*build(rng, volumes))
+        if status is not None and _ok(status):
+            latencies.append(time.perf_counter() - t0)
+        else:
+            errors[str(status or 'connection')] += 1
+    results.put((latencies, errors))
+
+
+def run_http(scenarios, volumes, db_path, clients, seconds, warmup, seed, workers, threads):
+    metrics_dir = tempfile.mkdtemp(prefix='bench-metrics-')
+    server, port = start_server(db_path, workers, threads, metrics_dir)
+    ctx = multiprocessing.get_context('spawn')
+    results = {}
+    try:
+        for name in scenarios:
+            queue = ctx.Queue()
+            procs = [ctx.Process(target=load_worker, args=(port, name, volumes, seconds, warmup, seed, i, queue))
+                     for i in range(clients)]
+            started = time.perf_counter()
+            for p in procs:
+                p.start()
+            latencies, errors = [], Counter()
+            for _ in procs:
+                worker_latencies, worker_errors = queue.get()
+                latencies += worker_latencies
+                errors.update(worker_errors)
+            for p in procs:
+                p.join()
+            # Clients start staggered; throughput is over the measuring window.
+            elapsed = min(seconds, time.perf_counter() - started)
+            results[name] = summarize(latencies, errors, elapsed)
+            _print_row('http', name, results[name])
+    finally:
+        server.terminate()
+        server.wait(10)
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+    return results
+
+
+# --- REPORTING ---
+def _print_header():
+    print(f"{'mode':<7}{'scenario':<17}{'requests':>9}{'errors':>7}{'req/s':>9}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}")
+
+
+def _fmt(value):
+    return '-' if value is None else f"{value:g}"
+
+
+def _print_row(mode, name, r):
+    print(f"{mode:<7}{name:<17}{r['requests']:>9}{r['errors']:>7}{_fmt(r['throughput_rps']):>9}"
+          f"{_fmt(r['p50_ms']):>9}{_fmt(r['p95_ms']):>9}{_fmt(r['p99_ms']):>9}"
+          f"{_fmt(r.get('queries_per_request')):>9}", flush=True)
+
+
+def compare(baseline, current, tolerance):
+    """List of human-readable regressions of ``current`` against ``baseline``."""
+    regressions = []
+    for mode, scenarios in current["results"].items():
+        for name, now in scenarios.items():
+            before = baseline.get("results", {}).get(mode, {}).get(name)
+            if not before:
+                continue
+            label = f"{mode}/{name}"
+            if before.get("p95_ms") and now.get("p95_ms") and now["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{label}: p95 {before['p95_ms']} -> {now['p95_ms']} ms")
+            if before.get("throughput_rps") and now.get("throughput_rps") is not None \
+                    and now["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+                regressions.append(f"{label}: throughput {before['throughput_rps']} -> {now['throughput_rps']} req/s")
+            # Statement counts are deterministic: any increase is a real change.
+            if before.get("queries_per_request") is not None and now.get("queries_per_request") is not None \
+                    and now["queries_per_request"] > before["queries_per_request"] + 0.05:
+                regressions.append(f"{label}: queries/request {before['queries_per_request']} "
+                                   f"-> {now['queries_per_request']}")
+            if now["errors"] > before.get("errors", 0):
+                regressions.append(f"{label}: errors {before.get('errors', 0)} -> {now['errors']}")
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mode', choices=('client', 'http', 'both'), default='both')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help="Run only this scenario (repeatable); default all")
+    parser.add_argument('--products', type=int, default=seeding.DEFAULT_VOLUMES["products"])
+    parser.add_argument('--customers', type=int, default=seeding.DEFAULT_VOLUMES["customers"])
+    parser.add_argument('--orders', type=int, default=seeding.DEFAULT_VOLUMES["orders"])
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--requests', type=int, default=500, help="client mode: requests per scenario")
+    parser.add_argument('--warmup', type=int, default=20, help="unmeasured requests per scenario (and per client)")
+    parser.add_argument('--clients', type=int, default=4, help="http mode: load generator processes")
+    parser.add_argument('--seconds', type=float, default=5, help="http mode: seconds per scenario")
+    parser.add_argument('--workers', type=int, default=2, help="http mode: gunicorn workers")
+    parser.add_argument('--threads', type=int, default=4, help="http mode: threads per gunicorn worker")
+    parser.add_argument('--save', metavar='PATH', help="write results as a JSON baseline")
+    parser.add_argument('--compare', metavar='PATH', help="fail on regressions against this baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="allowed relative p95/throughput change before failing")
+    args = parser.parse_args()
+
+    scenarios = args.scenario or list(SCENARIOS)
+    volumes = {"products": args.products, "customers": args.customers, "orders": args.orders}
+    modes = ('client', 'http') if args.mode == 'both' else (args.mode,)
+
+    tmp = tempfile.mkdtemp(prefix='bench-')
+    db_path = os.path.join(tmp, 'bench.db')
+    os.environ.update(BENCH_ENV, DATABASE_URL='sqlite:///' + db_path)
+    try:
+        from app import create_app
+        started = time.perf_counter()
+        with create_app().app_context():
+            counts = seeding.seed(args.products, args.customers, args.orders, args.seed)
+        print(", ".join(f"{n} {name}" for name, n in counts.items()),
+              f"seeded in {time.perf_counter() - started:.1f}s\n")
+
+        _print_header()
+        results = {}
+        if 'client' in modes:
+            results['client'] = run_client(scenarios, volumes, args.requests, args.warmup, args.seed)
+        if 'http' in modes:
+            results['http'] = run_http(scenarios, volumes, db_path, args.clients, args.seconds,
+                                       args.warmup, args.seed, args.workers, args.threads)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "created": datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs",
+            "seed": args.seed,
+            "volumes": counts,
+            "settings": {k: getattr(args, k) for k in ('requests', 'warmup', 'clients', 'seconds', 'workers', 'threads')},
+        },
+        "results": results,
+    }
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+        print(f"\nSaved baseline to {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.compare}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions against {args.compare} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""Deterministic benchmark database: products, customers, orders and users.
+
+Rows are written with bulk Core inserts in chunks, so a database of a few
+hundred thousand order lines takes seconds rather than minutes. The same
+``--seed`` always produces the same data. Sales rollups are rebuilt at the
+end so reports and reorder suggestions see the seeded history.
+
+    python benchmarks/seed.py /tmp/bench.db --products 2000 --customers 20000 --orders 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CHUNK = 5000
+CATEGORIES = ("Drink", "Food", "Snack", "Dessert", "Merch", "Grocery")
+HISTORY_DAYS = 90
+# Login credentials of the seeded staff accounts, shared with bench_suite.py.
+ADMIN_EMAIL = 'admin@bench.local'
+STAFF_PASSWORD = 'bench-password'
+STAFF_PIN = '1234'
+STAFF_USERS = 20
+
+# Every LOW_STOCK_EVERY-th product starts below its reorder threshold.
+LOW_STOCK_EVERY = 50
+
+DEFAULT_VOLUMES = {"products": 2000, "customers": 20000, "orders": 100000}
+
+
+def staff_email(i):
+    return ADMIN_EMAIL if i == 0 else f'staff{i}@bench.local'
+
+
+def is_low_stock(product_id):
+    return (product_id - 1) % LOW_STOCK_EVERY == 0
+
+
+def stocked_product(rng, products):
+    """Random product id that can always be ordered."""
+    product_id = rng.randint(1, products)
+    return product_id + 1 if is_low_stock(product_id) and product_id < products else product_id
+
+
+def _insert(table, rows):
+    from models import db
+    rows = list(rows)
+    for start in range(0, len(rows), CHUNK):
+        db.session.execute(table.insert(), rows[start:start + CHUNK])
+
+
+def seed(products=DEFAULT_VOLUMES["products"], customers=DEFAULT_VOLUMES["customers"],
+         orders=DEFAULT_VOLUMES["orders"], seed=42, now=None):
+    """Fill the (empty) database of the current app context; return row counts."""
+    from models import db, Product, Customer, Order, OrderItem, User, normalize_phone
+    import auth
+    import reports
+
+    rng = random.Random(seed)
+    now = now or datetime.utcnow().replace(microsecond=0)
+    db.create_all()
+
+    prices = [rng.randint(100, 5000) for _ in range(products)]
+    _insert(Product.__table__, ({
+        "id": i + 1,
+        "name": f"Product {i + 1:05d}",
+        "category": CATEGORIES[i % len(CATEGORIES)],
+        # Plenty of stock so order benchmarks never run out; a few low items for alerts.
+        "stock": rng.randint(0, 5) if is_low_stock(i + 1) else 10 ** 7,
+        "reorder_threshold": 10 if is_low_stock(i + 1) else 0,
+        "price_cents": prices[i],
+        "image_url": "",
+        "last_restocked": now - timedelta(days=rng.randint(0, 30)),
+    } for i in range(products)))
+
+    _insert(Customer.__table__, ({
+        "id": i + 1,
+        "name": f"Customer {i + 1:06d}",
+        "email": f"customer{i + 1}@example.com",
+        "phone": f"555{i + 1:07d}",
+        "phone_normalized": normalize_phone(f"555{i + 1:07d}"),
+        "address": f"{i + 1} Main St",
+        "loyalty_points": 0,
+        "created_at": now - timedelta(days=HISTORY_DAYS, minutes=customers - i),
+    } for i in range(customers)))
+
+    # Hash once; every staff account shares the credentials.
+    password_hash = auth.hash_password(STAFF_PASSWORD)
+    pin_hash = auth.hash_pin(STAFF_PIN)
+    _insert(User.__table__, ({
+        "id": i + 1,
+        "name": "Bench Admin" if i == 0 else f"Bench Staff {i}",
+        "email": staff_email(i),
+        "password_hash": password_hash,
+        "pin_hash": pin_hash,
+        "role": "admin" if i == 0 else "employee",
+    } for i in range(STAFF_USERS)))
+
+    # Orders spread evenly over the history window, oldest first.
+    order_rows, item_rows = [], []
+    step = HISTORY_DAYS * 86400 / max(orders, 1)
+    started = now - timedelta(days=HISTORY_DAYS)
+    item_id = 0
+    for i in range(orders):
+        lines = {}
+        for _ in range(rng.randint(1, 5)):
+            product_id = rng.randint(1, products)
+            lines[product_id] = lines.get(product_id, 0) + rng.randint(1, 3)
+        total = 0
+        for product_id, quantity in lines.items():
+            item_id += 1
+            total += quantity * prices[product_id - 1]
+            item_rows.append({"id": item_id, "order_id": i + 1, "product_id": product_id,
+                              "quantity": quantity, "price_cents": prices[product_id - 1]})
+        order_rows.append({
+            "id": i + 1,
+            "customer_id": rng.randint(1, customers),
+            "created_at": started + timedelta(seconds=i * step),
+            "total_cents": total,
+            "status": "completed",
+        })
+        if len(item_rows) >= CHUNK:
+            _insert(Order.__table__, order_rows)
+            _insert(OrderItem.__table__, item_rows)
+            order_rows, item_rows = [], []
+    _insert(Order.__table__, order_rows)
+    _insert(OrderItem.__table__, item_rows)
+
+    db.session.commit()
+    reports.rebuild_rollups()
+    db.session.commit()
+    return {"products": products, "customers": customers, "orders": orders,
+            "order_items": item_id, "users": STAFF_USERS}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path', help="SQLite file to create (must not exist)")
+    parser.add_argument('--products', type=int, default=DEFAULT_VOLUMES["products"])
+    parser.add_argument('--customers', type=int, default=DEFAULT_VOLUMES["customers"])
+    parser.add_argument('--orders', type=int, default=DEFAULT_VOLUMES["orders"])
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    if os.path.exists(args.path):
+        parser.error(f"{args.path} already exists")
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.abspath(args.path)
+    os.environ.setdefault('AUTH_HASH_WORKERS', '0')
+    from app import create_app
+    app = create_app()
+    started = time.perf_counter()
+    with app.app_context():
+        counts = seed(args.products, args.customers, args.orders, args.seed)
+    print(", ".join(f"{n} {name}" for name, n in counts.items()),
+          f"in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Shared, versioned in-process cache of the product catalog.
+
+Each worker keeps one immutable snapshot of the product table together with
+a category index. Readers compare the snapshot against the ``catalog`` row of
+``data_version`` (one primary-key read) and only reload the table when some
+worker has bumped it, so invalidation holds across gunicorn workers.
+"""
+import threading
+from collections import namedtuple
+
+from models import Product
+from pricing import to_dollars
+import versions
+
+_CatalogRow = namedtuple(
+    "CatalogProduct",
+    [
+        "id", "name", "category", "stock", "last_restocked", "price_cents", "image_url", "reorder_threshold",
+        "image_hash",
+    ],
+)
+
+
+
+class CatalogProduct(_CatalogRow):
+    __slots__ = ()
+
+    @property
+    def price(self):
+        return to_dollars(self.price_cents)
+
+    @property
+    def is_low(self):
+        return self.stock <= self.reorder_threshold
+
+    @property
+    def image_src(self):
+        return f"/img/{self.image_hash}" if self.image_hash else self.image_url
+
+
+class CatalogSnapshot:
+    def __init__(self, version, products):
+        self.version = version
+        self.products = products
+        self.by_id = {p.id: p for p in products}
+        self.by_category = {}
+        for product in products:
+            self.by_category.setdefault(product.category, []).append(product)
+        self.categories = sorted(self.by_category)
+
+    def in_category(self, category):
+        return self.by_category.get(category, [])
+
+
+_snapshot = None
+_lock = threading.Lock()
+
+
+def _load(version):
+    rows = Product.query.with_entities(*(getattr(Product, f) for f in CatalogProduct._fields))
+    return CatalogSnapshot(version, [CatalogProduct(*row) for row in rows.order_by(Product.id)])
+
+
+def get_catalog():
+    """Return the current catalog snapshot, reloading it if it is stale."""
+    global _snapshot
+    # Read the version before the rows: a concurrent write then at worst
+    # forces one extra reload, never a stale snapshot under a new version.
+    version = versions.current(versions.CATALOG)
+    snapshot = _snapshot
+    if snapshot is None or snapshot.version != version:
+        with _lock:
+            snapshot = _snapshot
+            if snapshot is None or snapshot.version != version:
+                snapshot = _snapshot = _load(version)
+    return snapshot
+
+
+def invalidate():
+    """Mark the catalog as changed; call inside the writing transaction."""
+    versions.bump(versions.CATALOG)
@@ -2,5 +2,89 @@ import os
 
 class Config:
     basedir = os.path.abspath(os.path.dirname(__file__))
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(basedir, 'mydatabase.db')
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///' + os.path.join(basedir, 'mydatabase.db'))
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Must be identical in every worker; sessions themselves are server-side (see sessions.py).
+    SECRET_KEY = os.environ.get('SECRET_KEY')
+
+    # Applied to every new SQLite connection (see database.py). Set
+    # SQLITE_TUNING=0 to fall back to SQLite's defaults, e.g. for benchmarks.
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',          # readers no longer block behind writers
+        'synchronous': 'NORMAL',        # safe with WAL, far fewer fsyncs
+        'busy_timeout': 5000,           # ms to wait for a lock instead of "database is locked"
+        'cache_size': -64000,           # negative = KiB, so 64 MB page cache
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+    } if os.environ.get('SQLITE_TUNING', '1') != '0' else {}
+
+    # Connection pool, per worker process.
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # seconds, for server databases
+
+    # Password hashing pool and login throttling, per worker (see auth.py).
+    # AUTH_HASH_WORKERS=0 hashes inline in the request thread.
+    AUTH_HASH_WORKERS = int(os.environ.get('AUTH_HASH_WORKERS', 2))
+    AUTH_HASH_QUEUE = int(os.environ.get('AUTH_HASH_QUEUE', 32))
+    AUTH_HASH_TIMEOUT = float(os.environ.get('AUTH_HASH_TIMEOUT', 10))
+    AUTH_ACCOUNT_BURST = int(os.environ.get('AUTH_ACCOUNT_BURST', 5))
+    AUTH_ACCOUNT_PER_MINUTE = float(os.environ.get('AUTH_ACCOUNT_PER_MINUTE', 5))
+    AUTH_IP_BURST = int(os.environ.get('AUTH_IP_BURST', 30))           # a store's registers may share one address
+    AUTH_IP_PER_MINUTE = float(os.environ.get('AUTH_IP_PER_MINUTE', 60))
+    # Wrong PINs before PIN sign-in is locked until a password sign-in.
+    AUTH_PIN_MAX_FAILURES = int(os.environ.get('AUTH_PIN_MAX_FAILURES', 5))
+
+    # Server-side sessions (see sessions.py). Empty SESSION_URL keeps them in
+    # the app database; redis://... shares them through Redis instead.
+    SESSION_URL = os.environ.get('SESSION_URL', '')
+    SESSION_LIFETIME = int(os.environ.get('SESSION_LIFETIME', 12 * 3600))   # seconds idle before sign-out
+    SESSION_CACHE_SIZE = 10000                                                # per worker
+    SESSION_CACHE_SECONDS = 60
+    # Signed-in user records (see access.py); role changes made on another
+    # worker apply within this many seconds.
+    USER_CACHE_SECONDS = float(os.environ.get('USER_CACHE_SECONDS', 5))
+    USER_CACHE_SIZE = 10000
+
+    # Threads per gunicorn worker (gunicorn.conf.py reads it from here).
+    WEB_THREADS = int(os.environ.get('GUNICORN_THREADS', 12))
+
+    # Live updates (see events.py). Set EVENTS_URL=redis://... to share
+    # events between gunicorn workers; without it each worker only sees its own.
+    EVENTS_URL = os.environ.get('EVENTS_URL', '')
+    # Every open /events stream and /queue?wait= long-poll parks one of the
+    # worker's WEB_THREADS; by default they get half, the rest serve checkout.
+    EVENTS_MAX_STREAMS = int(os.environ.get('EVENTS_MAX_STREAMS', max(1, WEB_THREADS // 2)))    # per worker
+    EVENTS_STREAM_SECONDS = 300
+
+    # Instrumentation (see metrics.py). METRICS_DIR lets /metrics on any
+    # worker report the totals of all gunicorn workers.
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+    METRICS_DIR = os.environ.get('METRICS_DIR')
+    SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))
+    N_PLUS_ONE_THRESHOLD = int(os.environ.get('N_PLUS_ONE_THRESHOLD', 10))
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))   # e.g. 0.01 profiles 1% of requests
+    PROFILE_DIR = os.environ.get('PROFILE_DIR')                             # default: instance/profiles
+
+    # Columnar order history for analytics (see order_snapshot.py); built by
+    # `flask snapshot build`, default instance/snapshot.
+    SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR')
+    SNAPSHOT_SETTLE_HOURS = float(os.environ.get('SNAPSHOT_SETTLE_HOURS', 24))  # stop waiting for older open tickets
+
+    # Product image cache (see images.py). IMAGE_FETCHER may be set to a
+    # ``fetch(url) -> bytes`` callable, e.g. a local stand-in for tests.
+    IMAGE_DIR = os.environ.get('IMAGE_DIR')                                    # default: instance/images
+    IMAGE_CACHE_BYTES = int(os.environ.get('IMAGE_CACHE_BYTES', 200 * 1024 * 1024))
+    IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', 2))                    # 0 fetches inline
+    IMAGE_QUEUE = 1000
+    IMAGE_THUMB_SIZE = int(os.environ.get('IMAGE_THUMB_SIZE', 256))            # px, longest side
+    IMAGE_FETCHER = None
+
+    # Background jobs (see jobs.py): loyalty points earned and sales rollups
+    # run after checkout. Each web process runs JOBS_WORKERS threads; set 0
+    # and run `flask jobs work` to keep them out of the web workers entirely.
+    JOBS_WORKERS = int(os.environ.get('JOBS_WORKERS', 1))
+    JOBS_POLL_SECONDS = float(os.environ.get('JOBS_POLL_SECONDS', 5))          # idle wait when nothing woke them
+    JOBS_LINGER_SECONDS = float(os.environ.get('JOBS_LINGER_SECONDS', 0.5))    # gather a batch after a wake-up
+    JOBS_LEASE_SECONDS = 60                                                     # a crashed worker's jobs rerun after this
+    JOBS_MAX_ATTEMPTS = int(os.environ.get('JOBS_MAX_ATTEMPTS', 8))
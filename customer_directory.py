@@ -0,0 +1,153 @@
+"""Paginated, searchable customer directory and loyalty phone lookup.
+
+Every page is one index range scan: a search term is matched as a prefix
+against a single indexed column (phone for digits, email when it contains
+"@", otherwise name; both names and emails through case-insensitive
+indexes, since they are stored as entered) and results are ordered by
+that same column, then paged with a keyset cursor on ``(column, id)``.
+Latency therefore depends on the page size, not on the size of the table.
+"""
+import re
+import threading
+from collections import OrderedDict
+
+from sqlalchemy import tuple_
+
+from models import db, Customer, normalize_phone
+import versions
+
+PAGE_SIZE = 50
+PAGE_MAX = 200
+
+SORTS = ('name', 'newest')
+
+
+def search_field(q):
+    """Pick the indexed column a search term should be matched against."""
+    if '@' in q:
+        return 'email'
+    if re.fullmatch(r'[\d\s()+.-]+', q) and normalize_phone(q):
+        return 'phone'
+    return 'name'
+
+
+def _column(field):
+    if field in ('name', 'email'):
+        return getattr(Customer, field).collate('NOCASE')
+    if field == 'phone':
+        return Customer.phone_normalized
+    return getattr(Customer, field)
+
+
+def _prefix_upper_bound(prefix):
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def search_customers(q=None, sort='name', after=None, limit=PAGE_SIZE):
+    """Return ``(customers, next_after)`` for one page of the directory.
+
+    ``next_after`` is the id to pass as ``after`` for the following page, or
+    None on the last page. Raises ValueError for an unknown sort or cursor.
+    """
+    if sort not in SORTS:
+        raise ValueError(f"Unknown sort '{sort}'")
+    limit = min(max(limit, 1), PAGE_MAX)
+    q = (q or '').strip()
+
+    query = Customer.query
+    if q:
+        field = search_field(q)
+        prefix = normalize_phone(q) if field == 'phone' else q.lower()
+        column = _column(field)
+        query = query.filter(column >= prefix, column < _prefix_upper_bound(prefix))
+        order = (column, Customer.id)
+    elif sort == 'name':
+        column = _column('name')
+        order = (column, Customer.id)
+    else:
+        column = None
+        order = (Customer.id.desc(),)
+
+    if after:
+        if column is None:
+            query = query.filter(Customer.id < after)
+        else:
+            cursor = db.session.query(column, Customer.id).filter(Customer.id == after).first()
+            if cursor is None:
+                raise ValueError("Unknown cursor")
+            query = query.filter(tuple_(column, Customer.id) > tuple_(*cursor))
+
+    customers = query.order_by(*order).limit(limit + 1).all()
+    next_after = customers[limit - 1].id if len(customers) > limit else None
+    return customers[:limit], next_after
+
+
+# --- LOYALTY LOOKUP ---
+LOOKUP_CACHE_SIZE = 1024
+
+
+class LookupCache:
+    """Bounded LRU of phone lookups for one generation of customer data.
+
+    The generation is the ``customers`` data version, which create_customer
+    and every point change bump; a new generation drops all entries, so a
+    cached result is never older than the last committed customer write.
+    """
+
+    def __init__(self, maxsize=LOOKUP_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.version = None
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, version, phone):
+        with self.lock:
+            if version != self.version:
+                self.entries.clear()
+                self.version = version
+                return None
+            entry = self.entries.get(phone)
+            if entry is not None:
+                self.entries.move_to_end(phone)
+            return entry
+
+    def put(self, version, phone, entry):
+        with self.lock:
+            if version != self.version:
+                return
+            self.entries[phone] = entry
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.version = None
+
+
+lookup_cache = LookupCache()
+
+
+def lookup_by_phone(phone):
+    """Return the loyalty card dict for ``phone`` in any format, or None."""
+    phone = normalize_phone(phone)
+    if not phone:
+        raise ValueError("A phone number is required")
+
+    version = versions.current(versions.CUSTOMERS)
+    entry = lookup_cache.get(version, phone)
+    if entry is not None:
+        return entry
+
+    customer = Customer.query.filter(Customer.phone_normalized == phone).first()
+    if customer is None:
+        return None
+    entry = {
+        "id": customer.id,
+        "name": customer.name,
+        "email": customer.email,
+        "phone": customer.phone,
+        "points": customer.loyalty_points,
+    }
+    lookup_cache.put(version, phone, entry)
+    return entry
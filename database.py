@@ -0,0 +1,57 @@
+"""Engine setup for SQLite in production and server databases alike.
+
+``init_app`` derives SQLAlchemy engine/pool options from the app config
+(see ``config.Config``) before binding ``db``, and for SQLite applies
+``SQLITE_PRAGMAS`` on every new DBAPI connection through an engine event.
+"""
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from models import db
+
+
+def engine_options(config):
+    """Build ``SQLALCHEMY_ENGINE_OPTIONS`` for the configured database."""
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+
+    if url.get_backend_name() == 'sqlite':
+        if url.database in (None, '', ':memory:'):
+            # In-memory databases live in a single connection; keep the default pool.
+            return options
+        connect_args = dict(options.get('connect_args') or {})
+        # pysqlite's own lock wait, in seconds; mirrors busy_timeout.
+        connect_args.setdefault('timeout', config.get('SQLITE_PRAGMAS', {}).get('busy_timeout', 5000) / 1000)
+        # Connections are handed between threads by the pool, never shared.
+        connect_args.setdefault('check_same_thread', False)
+        options['connect_args'] = connect_args
+        options.setdefault('pool_size', config.get('DB_POOL_SIZE', 5))
+        options.setdefault('max_overflow', config.get('DB_MAX_OVERFLOW', 10))
+    else:
+        options.setdefault('pool_size', config.get('DB_POOL_SIZE', 5))
+        options.setdefault('max_overflow', config.get('DB_MAX_OVERFLOW', 10))
+        options.setdefault('pool_recycle', config.get('DB_POOL_RECYCLE', 1800))
+        options.setdefault('pool_pre_ping', True)
+    return options
+
+
+def apply_pragmas(engine, pragmas):
+    """Run ``PRAGMA key=value`` for each pragma whenever ``engine`` connects."""
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for key, value in pragmas.items():
+                cursor.execute(f"PRAGMA {key}={value}")
+        finally:
+            cursor.close()
+
+
+def init_app(app):
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    db.init_app(app)
+    with app.app_context():
+        apply_pragmas(db.engine, app.config.get('SQLITE_PRAGMAS', {}))
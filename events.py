@@ -0,0 +1,241 @@
+"""Live catalog and order events for the POS pages (server-sent events).
+
+Writers call ``publish`` after their transaction commits. The message goes
+through a backend to every worker's ``Broker``, which keeps a short replay
+buffer and fans it out to that worker's open ``/events`` streams.
+
+``LocalBackend`` delivers in-process only: enough for a single worker and
+for tests. ``RedisBackend`` (optional ``redis`` package, ``EVENTS_URL``)
+carries events between gunicorn workers over Redis pub/sub.
+"""
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from models import db, Product
+
+log = logging.getLogger(__name__)
+
+# Event types
+STOCK = 'stock'        # {"products": [{"id", "stock", "low"}, ...]}
+PRODUCT = 'product'    # full catalog row of an added or edited product
+ORDER = 'order'        # {"orders": [{"id", "total", "items"}, ...]}
+STATUS = 'status'      # {"id", "status", "at"}: an order moved along the make-line
+RELOAD = 'reload'      # the client missed events and must refetch the page
+
+REPLAY_SIZE = 256
+QUEUE_SIZE = 100
+
+
+class Event:
+    __slots__ = ('id', 'type', 'data')
+
+    def __init__(self, id, type, data):
+        self.id = id
+        self.type = type
+        self.data = data
+
+    def encode(self):
+        """Wire format of one SSE message."""
+        head = f"id: {self.id}\n" if self.id else ""
+        return f"{head}event: {self.type}\ndata: {self.data}\n\n"
+
+
+class Subscription:
+    """One open stream's bounded mailbox.
+
+    A client too slow to keep up is not buffered forever: on overflow its
+    queue is dropped and it is told to reload instead.
+    """
+
+    def __init__(self, maxsize=QUEUE_SIZE):
+        self.maxsize = maxsize
+        self.events = deque()
+        self.overflowed = False
+        self.cond = threading.Condition()
+
+    def push(self, event):
+        with self.cond:
+            if self.overflowed:
+                return
+            if len(self.events) >= self.maxsize:
+                self.overflowed = True
+                self.events.clear()
+            else:
+                self.events.append(event)
+            self.cond.notify()
+
+    def pop(self, timeout):
+        """Next event, a RELOAD event after overflow, or None on timeout."""
+        with self.cond:
+            if not self.events and not self.overflowed:
+                self.cond.wait(timeout)
+            if self.overflowed:
+                return Event('', RELOAD, '{}')
+            return self.events.popleft() if self.events else None
+
+
+class Broker:
+    """Per-process fan-out to open streams plus a short replay buffer."""
+
+    def __init__(self, backend=None, max_subscribers=50):
+        self.backend = backend or LocalBackend()
+        self.max_subscribers = max_subscribers
+        self.recent = deque(maxlen=REPLAY_SIZE)
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def configure(self, backend, max_subscribers):
+        self.backend = backend
+        self.max_subscribers = max_subscribers
+
+    def publish(self, event_type, data):
+        message = json.dumps({
+            "id": f"{os.getpid():x}-{next(self._ids)}",
+            "type": event_type,
+            "data": data,
+        }, separators=(',', ':'), default=str)
+        try:
+            self.backend.publish(message, self.deliver)
+        except Exception:
+            # Live updates are best effort; the write itself has committed.
+            log.exception("Could not publish %s event", event_type)
+
+    def deliver(self, message):
+        """Hand a published message to this worker's streams (backend callback)."""
+        raw = json.loads(message)
+        event = Event(raw['id'], raw['type'], json.dumps(raw['data'], separators=(',', ':')))
+        with self.lock:
+            self.recent.append(event)
+            subscribers = list(self.subscribers)
+        for subscription in subscribers:
+            subscription.push(event)
+
+    def last_event_id(self):
+        with self.lock:
+            return self.recent[-1].id if self.recent else ''
+
+    def subscribe(self, last_event_id=''):
+        """Open a subscription, replaying events after ``last_event_id``.
+
+        Returns None when this worker already serves ``max_subscribers``.
+        """
+        self.backend.start(self.deliver)
+        subscription = Subscription()
+        with self.lock:
+            if len(self.subscribers) >= self.max_subscribers:
+                return None
+            self.subscribers.add(subscription)
+            if last_event_id:
+                ids = [event.id for event in self.recent]
+                if last_event_id in ids:
+                    for event in list(self.recent)[ids.index(last_event_id) + 1:]:
+                        subscription.push(event)
+                else:
+                    subscription.push(Event('', RELOAD, '{}'))
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscribers.discard(subscription)
+
+    def stats(self):
+        with self.lock:
+            return {"subscribers": len(self.subscribers), "buffered": len(self.recent)}
+
+
+# --- BACKENDS ---
+class LocalBackend:
+    """Delivers straight to this process's broker; no cross-worker fan-out."""
+
+    def start(self, deliver):
+        pass
+
+    def publish(self, message, deliver):
+        deliver(message)
+
+
+class RedisBackend:
+    """Redis pub/sub: every worker subscribes once and re-broadcasts locally."""
+
+    def __init__(self, url, channel='pos-events'):
+        import redis  # optional dependency, only needed for EVENTS_URL
+        self.client = redis.Redis.from_url(url)
+        self.channel = channel
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def start(self, deliver):
+        # One listener thread per process, started after gunicorn forks.
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._listen, args=(deliver,), name='events-listener', daemon=True).start()
+
+    def _listen(self, deliver):
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    deliver(message['data'])
+            except Exception:
+                log.exception("Event listener lost its connection; retrying")
+                time.sleep(1)
+
+    def publish(self, message, deliver):
+        self.start(deliver)
+        self.client.publish(self.channel, message)
+
+
+broker = Broker()
+
+
+def publish(event_type, data):
+    broker.publish(event_type, data)
+
+
+def publish_stock(product_ids):
+    """Publish current stock for ``product_ids`` (one IN query)."""
+    if not product_ids:
+        return
+    rows = (
+        db.session.query(Product.id, Product.stock, Product.is_low)
+        .filter(Product.id.in_(list(product_ids)))
+        .all()
+    )
+    publish(STOCK, {"products": [{"id": pid, "stock": stock, "low": bool(low)} for pid, stock, low in rows]})
+
+
+def publish_product(product):
+    publish(PRODUCT, {
+        "id": product.id,
+        "name": product.name,
+        "category": product.category,
+        "stock": product.stock,
+        "reorder_threshold": product.reorder_threshold,
+        "low": product.is_low,
+        "price": product.price,
+        "image_url": product.image_url,
+        "image": product.image_src,
+        "last_restocked": product.last_restocked.strftime('%Y-%m-%d') if product.last_restocked else None,
+    })
+
+
+def init_app(app):
+    url = app.config.get('EVENTS_URL')
+    backend = RedisBackend(url) if url else LocalBackend()
+    max_streams = app.config.get('EVENTS_MAX_STREAMS', 6)
+    threads = app.config.get('WEB_THREADS')
+    if threads and max_streams >= threads:
+        # Parked streams would leave no thread for ordinary requests.
+        log.warning("EVENTS_MAX_STREAMS=%s leaves none of the %s worker threads free; using %s",
+                    max_streams, threads, threads - 1)
+        max_streams = max(threads - 1, 0)
+    broker.configure(backend, max_streams)
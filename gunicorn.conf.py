@@ -0,0 +1,59 @@
+import multiprocessing
+import os
+
+from config import Config
+
+wsgi_app = "wsgi:app"
+bind = os.environ.get("BIND", "0.0.0.0:" + os.environ.get("PORT", "8000"))
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+# Threads per worker (GUNICORN_THREADS, default 12). They keep serving while
+# others wait on the password hashing pool (auth.py), and each open /events
+# stream or /queue?wait= long-poll holds one for its whole duration.
+#
+# Sizing rule: threads = EVENTS_MAX_STREAMS + threads for ordinary requests.
+# EVENTS_MAX_STREAMS defaults to half the threads, so with 12 threads six
+# register screens can stream per worker and six threads stay free for
+# checkout and sign-in; further streams get a 503 and retry elsewhere. Size
+# workers * EVENTS_MAX_STREAMS to the number of open register/kitchen tabs.
+threads = Config.WEB_THREADS
+
+# Build the app once in the master and fork workers from it: imports and
+# compiled templates are shared copy-on-write, and a generated SECRET_KEY is
+# the same in every worker.
+preload_app = True
+
+
+def post_fork(server, worker):
+    # Never share pooled database connections across processes.
+    from models import db
+    from wsgi import app
+    import jobs
+    with app.app_context():
+        db.engine.dispose(close=False)
+    # Start this worker's job threads now rather than at its first order, so
+    # jobs queued before a restart do not wait for one.
+    jobs.worker.start()
+
+
+def worker_exit(server, worker):
+    # Flush the final totals; child_exit below folds them into retired.json.
+    if Config.METRICS_DIR:
+        import metrics
+        metrics.write_snapshot(Config.METRICS_DIR)
+
+
+def child_exit(server, worker):
+    # Runs in the master. Folding a dead worker's snapshot in once keeps the
+    # totals from dropping without summing a file per dead pid forever.
+    if Config.METRICS_DIR:
+        import metrics
+        metrics.retire_snapshot(Config.METRICS_DIR, worker.pid)
+
+
+def on_starting(server):
+    # Per-worker metrics snapshots from a previous run would inflate totals.
+    metrics_dir = Config.METRICS_DIR
+    if metrics_dir and os.path.isdir(metrics_dir):
+        for name in os.listdir(metrics_dir):
+            if name.endswith(".json"):
+                os.remove(os.path.join(metrics_dir, name))
@@ -0,0 +1,89 @@
+"""Conditional GET and pre-encoded JSON bodies for hot polling endpoints.
+
+Endpoints pass a cache key, a data version (see ``versions.py``) and a
+callable building the payload. The JSON body is encoded once per version -
+plus gzip and, when the optional ``brotli`` package is installed, brotli
+variants - and every later poll is either a 304 or a copy of cached bytes.
+"""
+import gzip
+import threading
+from collections import OrderedDict
+
+from flask import Response, current_app, request
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+# Bodies smaller than this are not worth compressing.
+MIN_COMPRESS_SIZE = 512
+# Keys include query strings for paged endpoints, so bound the cache.
+MAX_ENTRIES = 256
+
+
+class EncodedBody:
+    def __init__(self, version, body, headers=None):
+        self.version = version
+        self.headers = headers or {}
+        self.variants = {None: body}
+        if len(body) >= MIN_COMPRESS_SIZE:
+            self.variants['gzip'] = gzip.compress(body, compresslevel=6)
+            if brotli is not None:
+                self.variants['br'] = brotli.compress(body)
+
+
+_bodies = OrderedDict()
+_lock = threading.Lock()
+
+
+def _etag(key, version, encoding=None):
+    return f"{key}-{version}" + (f".{encoding}" if encoding else "")
+
+
+def _pick_encoding(entry):
+    accepted = request.accept_encodings
+    for encoding in ('br', 'gzip'):
+        if encoding in entry.variants and accepted[encoding]:
+            return encoding
+    return None
+
+
+def _not_modified(key, version):
+    etags = request.if_none_match
+    if not etags:
+        return False
+    return any(etags.contains(_etag(key, version, encoding)) for encoding in (None, 'gzip', 'br'))
+
+
+def cached_json(key, version, build):
+    """Return a JSON response for ``build()``, cached per (key, version).
+
+    Like a Flask view, ``build`` may return ``(payload, headers)``; the
+    headers are cached with the body and sent on every full response.
+    """
+    if _not_modified(key, version):
+        response = Response(status=304)
+        response.set_etag(_etag(key, version))
+        return response
+
+    entry = _bodies.get(key)
+    if entry is None or entry.version != version:
+        payload = build()
+        headers = None
+        if isinstance(payload, tuple):
+            payload, headers = payload
+        entry = EncodedBody(version, current_app.json.dumps(payload).encode('utf-8'), headers)
+        with _lock:
+            _bodies[key] = entry
+            _bodies.move_to_end(key)
+            while len(_bodies) > MAX_ENTRIES:
+                _bodies.popitem(last=False)
+
+    encoding = _pick_encoding(entry)
+    response = Response(entry.variants[encoding], mimetype='application/json', headers=entry.headers)
+    response.set_etag(_etag(key, version, encoding))
+    response.vary.add('Accept-Encoding')
+    if encoding:
+        response.content_encoding = encoding
+    return response
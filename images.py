@@ -0,0 +1,464 @@
+"""Local product images: fetched once, thumbnailed, served from disk.
+
+Saving a product's ``image_url`` queues it with ``pipeline.submit(url)`` on
+a small background thread pool. A job fetches the image once, shrinks it to
+a register-sized thumbnail (WebP, with Pillow) and stores it under the
+SHA-256 of its bytes in ``IMAGE_DIR``. Every product with that URL then gets
+the hash in ``image_hash``, and pages load ``/img/<hash>`` from this server
+instead of the remote original; the browser may keep it for a year, since
+the bytes behind a hash never change. Until a thumbnail exists, or when the
+fetch fails, pages keep using the remote URL.
+
+The store is capped at ``IMAGE_CACHE_BYTES``. Serving a file refreshes its
+mtime (at most hourly) and writes evict the least recently used files; a
+request for an evicted thumbnail is redirected to the original URL and
+queues it again.
+
+The fetcher is pluggable: any ``fetch(url) -> bytes`` callable that raises
+``FetchError`` (``IMAGE_FETCHER`` in the config), so tests and offline demos
+can run against a local stand-in. The default one only connects to public
+addresses, redirects included: a staff-entered URL is a server-side fetch
+and must not reach loopback, private or link-local hosts (cloud metadata).
+Pillow is in requirements.txt; without it images are stored as fetched,
+unresized, and ``init_app`` logs a warning.
+"""
+import hashlib
+import http.client
+import ipaddress
+import logging
+import os
+import socket
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import update
+
+from models import db, Product
+import catalog
+import events
+
+log = logging.getLogger(__name__)
+
+THUMB_SIZE = 256
+FETCH_TIMEOUT = 10
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+# Serving refreshes a file's mtime (its LRU position) at most this often.
+TOUCH_SECONDS = 3600
+# An eviction pass frees space down to this share of the cap.
+EVICT_TO = 0.9
+# More changed products than this and pages are told to reload instead.
+MAX_PRODUCT_EVENTS = 50
+# Store subdirectory of URL -> hash memos; not part of the cache proper.
+URLS_DIR = 'urls'
+
+
+class FetchError(Exception):
+    """The image could not be downloaded or is not a usable image."""
+
+
+def sniff(data):
+    """Mimetype of image ``data`` from its magic bytes, or None."""
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    if data[:3] == b'\xff\xd8\xff':
+        return 'image/jpeg'
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        return 'image/png'
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image/gif'
+    return None
+
+
+# --- FETCHING AND THUMBNAILS ---
+def _public_address(address):
+    ip = ipaddress.ip_address(address.split('%', 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def _public_connection(address, timeout=socket._GLOBAL_DEFAULT_TIMEOUT, source_address=None, *args, **kwargs):
+    """``socket.create_connection`` that refuses hosts resolving to non-public addresses.
+
+    It connects to the address it checked, so the name cannot be re-resolved
+    to an internal one in between.
+    """
+    host, port = address[:2]
+    try:
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except OSError as e:
+        raise FetchError(f"Could not resolve {host}: {e}")
+    addresses = [info[4][0] for info in infos]
+    if not addresses or not all(_public_address(a) for a in addresses):
+        raise FetchError(f"Refusing to fetch from non-public host {host}")
+    error = None
+    for a in addresses:
+        try:
+            return socket.create_connection((a, port), timeout, source_address)
+        except OSError as e:
+            error = e
+    raise error
+
+
+class _PublicHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = _public_connection
+
+
+class _PublicHTTPSConnection(http.client.HTTPSConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = _public_connection
+
+
+class _PublicHTTPHandler(urllib.request.HTTPHandler):
+    def http_open(self, req):
+        return self.do_open(_PublicHTTPConnection, req)
+
+
+class _PublicHTTPSHandler(urllib.request.HTTPSHandler):
+    def https_open(self, req):
+        return self.do_open(_PublicHTTPSConnection, req, context=self._context)
+
+
+class _RedirectHandler(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        if urllib.parse.urlsplit(newurl).scheme.lower() not in ('http', 'https'):
+            raise FetchError(f"Refusing redirect to {newurl!r}")
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+# No proxies: the address check has to see the image host itself.
+_opener = urllib.request.build_opener(
+    urllib.request.ProxyHandler({}), _PublicHTTPHandler, _PublicHTTPSHandler, _RedirectHandler,
+)
+
+
+def http_fetch(url):
+    """Default fetcher: a plain HTTP(S) GET from a public host, at most ``MAX_IMAGE_BYTES``."""
+    if not url.lower().startswith(('http://', 'https://')):
+        raise FetchError(f"Unsupported image URL {url!r}")
+    request = urllib.request.Request(url, headers={'User-Agent': 'POS-System image cache'})
+    try:
+        with _opener.open(request, timeout=FETCH_TIMEOUT) as response:
+            data = response.read(MAX_IMAGE_BYTES + 1)
+    except (OSError, ValueError, http.client.HTTPException) as e:
+        raise FetchError(f"Could not fetch {url}: {e}")
+    if len(data) > MAX_IMAGE_BYTES:
+        raise FetchError(f"{url} is larger than {MAX_IMAGE_BYTES} bytes")
+    return data
+
+
+def _pillow():
+    try:
+        from PIL import Image, ImageOps, features
+    except ImportError:  # optional dependency
+        return None
+    return Image, ImageOps, features
+
+
+def make_thumbnail(data, size=THUMB_SIZE):
+    """A copy of image ``data`` fitting in ``size`` x ``size``.
+
+    WebP when Pillow has WebP support (else PNG/JPEG); without Pillow the
+    original bytes, provided they are an image at all.
+    """
+    pillow = _pillow()
+    if pillow is None:
+        if sniff(data) is None:
+            raise FetchError("Not an image")
+        return data
+    Image, ImageOps, features = pillow
+    out = BytesIO()
+    try:
+        with Image.open(BytesIO(data)) as image:
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((size, size))
+            alpha = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+            image = image.convert('RGBA' if alpha else 'RGB')
+            if features.check('webp'):
+                image.save(out, 'WEBP', quality=80, method=4)
+            elif alpha:
+                image.save(out, 'PNG', optimize=True)
+            else:
+                image.save(out, 'JPEG', quality=85, optimize=True)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise FetchError(f"Not a usable image: {e}")
+    return out.getvalue()
+
+
+# --- STORE ---
+class ImageStore:
+    """Content-addressed files ``<dir>/<hash[:2]>/<hash>``, least recently used evicted first.
+
+    ``<dir>/urls/`` remembers which hash each fetched URL was stored as.
+    Those memos are tiny and neither count toward ``max_bytes`` nor age out
+    on their own; one goes when its file is evicted.
+    """
+
+    def __init__(self, directory=None, max_bytes=200 * 1024 * 1024):
+        self.lock = threading.Lock()
+        self.configure(directory, max_bytes)
+
+    def configure(self, directory, max_bytes):
+        with self.lock:
+            self.directory = directory
+            self.max_bytes = max_bytes
+            self.size = None  # bytes on disk as this process last counted them
+
+    def path(self, digest):
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def exists(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def open(self, digest):
+        """Path of a stored file, marked as recently used, or None."""
+        path = self.path(digest)
+        try:
+            if time.time() - os.stat(path).st_mtime > TOUCH_SECONDS:
+                os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, data):
+        """Store ``data`` and return its hash."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if self.open(digest):
+            return digest
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, 'wb') as f:
+            f.write(data)
+        os.replace(temporary, path)
+
+        with self.lock:
+            self.size = None if self.size is None else self.size + len(data)
+            size = self.size
+        if size is None or size > self.max_bytes:
+            self.evict(keep=digest)
+        return digest
+
+    def _memo(self, url):
+        return os.path.join(self.directory, URLS_DIR, hashlib.sha256(url.encode()).hexdigest())
+
+    def remember(self, url, digest):
+        path = self._memo(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(digest)
+
+    def recall(self, url):
+        """Hash ``url`` is still stored under, or None."""
+        try:
+            with open(self._memo(url)) as f:
+                digest = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return digest if self.exists(digest) else None
+
+    def _files(self):
+        if not os.path.isdir(self.directory):
+            return
+        for prefix in os.scandir(self.directory):
+            if not prefix.is_dir() or prefix.name == URLS_DIR:
+                continue
+            for entry in os.scandir(prefix.path):
+                if entry.name.endswith('.tmp'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                yield stat.st_mtime, stat.st_size, entry.name, entry.path
+
+    def evict(self, keep=None):
+        """Recount the store and, when over the cap, delete the least recently used files."""
+        files = sorted(self._files())
+        total = sum(size for _, size, _, _ in files)
+        evicted = set()
+        if total > self.max_bytes:
+            target = self.max_bytes * EVICT_TO
+            for _, size, name, path in files:
+                if total <= target:
+                    break
+                if name == keep:
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                evicted.add(name)
+                total -= size
+        if evicted:
+            self._forget(evicted)
+        with self.lock:
+            self.size = total
+        return total
+
+    def _forget(self, digests):
+        """Drop the URL memos pointing at evicted ``digests``."""
+        directory = os.path.join(self.directory, URLS_DIR)
+        if not os.path.isdir(directory):
+            return
+        for entry in os.scandir(directory):
+            try:
+                with open(entry.path) as f:
+                    if f.read().strip() in digests:
+                        os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+
+
+store = ImageStore()
+
+
+# --- PIPELINE ---
+class ImagePipeline:
+    """Background fetch-and-thumbnail jobs, one per distinct URL.
+
+    The thread pool is created on first use in each process, so workers
+    forked by ``gunicorn --preload`` each get their own. At most
+    ``max_pending`` URLs wait at a time; beyond that ``submit`` drops them
+    and ``flask images fetch`` picks them up later. With ``workers=0`` jobs
+    run inline.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = set()
+        self.app = None
+        self._executor = None
+        self._pid = None
+        self.configure(None, workers=2, max_pending=1000, fetcher=None, thumb_size=THUMB_SIZE)
+
+    def configure(self, app, workers, max_pending, fetcher, thumb_size):
+        self.app = app
+        self.workers = workers
+        self.max_pending = max_pending
+        self.fetcher = fetcher or http_fetch
+        self.thumb_size = thumb_size
+
+    def _pool(self):
+        with self.lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='images')
+                self._pid = os.getpid()
+            return self._executor
+
+    def submit(self, url):
+        """Queue ``url``; False when it is empty, already queued or the queue is full."""
+        if not url or self.app is None:
+            return False
+        with self.lock:
+            if url in self.pending or len(self.pending) >= self.max_pending:
+                return False
+            self.pending.add(url)
+        if self.workers:
+            self._pool().submit(self._run, url)
+        else:
+            self._run(url)
+        return True
+
+    def _run(self, url):
+        try:
+            with self.app.app_context():
+                self.process(url)
+        except Exception:
+            log.exception("Image job for %s failed", url)
+        finally:
+            with self.lock:
+                self.pending.discard(url)
+
+    def process(self, url):
+        """Make sure ``url`` has a stored thumbnail and its products point at it.
+
+        Returns the hash, or None when the image could not be fetched.
+        """
+        digest = store.recall(url)
+        if digest is None:
+            try:
+                digest = store.put(make_thumbnail(self.fetcher(url), self.thumb_size))
+            except FetchError as e:
+                log.warning("%s", e)
+                return None
+            store.remember(url, digest)
+        self._assign(url, digest)
+        return digest
+
+    def _assign(self, url, digest):
+        try:
+            changed = db.session.execute(
+                update(Product)
+                .where(Product.image_url == url, Product.image_hash.is_distinct_from(digest))
+                .values(image_hash=digest)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if changed:
+                catalog.invalidate()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        if not changed:
+            return
+        if changed > MAX_PRODUCT_EVENTS:
+            events.publish(events.RELOAD, {})
+            return
+        for product in Product.query.filter(Product.image_url == url, Product.image_hash == digest):
+            events.publish_product(product)
+
+    def queue_missing(self):
+        """Queue every product image without a thumbnail; return how many URLs were queued."""
+        return sum(self.submit(url) for url in missing_urls())
+
+
+pipeline = ImagePipeline()
+
+
+def missing_urls():
+    """Distinct product image URLs that have no thumbnail yet."""
+    return [
+        url for (url,) in
+        db.session.query(Product.image_url)
+        .filter(Product.image_hash.is_(None), Product.image_url != '')
+        .distinct()
+    ]
+
+
+# --- CLI ---
+images_cli = AppGroup('images', help="Product image cache.")
+
+
+@images_cli.command('fetch')
+def fetch_command():
+    """Fetch and thumbnail every product image not cached yet."""
+    urls = missing_urls()
+    stored = sum(pipeline.process(url) is not None for url in urls)
+    click.echo(f"{stored} of {len(urls)} images cached, {store.evict()} bytes on disk")
+
+
+def init_app(app):
+    config = app.config
+    store.configure(
+        config.get('IMAGE_DIR') or os.path.join(app.instance_path, 'images'),
+        config.get('IMAGE_CACHE_BYTES', 200 * 1024 * 1024),
+    )
+    pipeline.configure(
+        app,
+        workers=config.get('IMAGE_WORKERS', 2),
+        max_pending=config.get('IMAGE_QUEUE', 1000),
+        fetcher=config.get('IMAGE_FETCHER'),
+        thumb_size=config.get('IMAGE_THUMB_SIZE', THUMB_SIZE),
+    )
+    if _pillow() is None:
+        log.warning("Pillow is not installed; product images will be stored full size")
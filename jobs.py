@@ -0,0 +1,347 @@
+"""Durable background jobs for work that can follow a commit.
+
+``enqueue(kind, payload)`` adds a ``Job`` row in the caller's transaction,
+so a job exists exactly when the change that asked for it committed, and
+the request returns without doing the work. Modules register what a kind
+does with ``@handler(kind, batch_size)``; the handler gets a list of
+payloads, so like jobs are processed together (one rollup upsert for a
+hundred orders rather than a hundred).
+
+Workers claim due jobs of one kind with a lease (``locked_by`` /
+``locked_until``, one guarded UPDATE, so two workers never claim the same
+row), then delete them and run the handler in one transaction: the work and
+its removal from the queue commit together. A worker that dies mid-batch
+leaves the lease to expire and the jobs run again, so delivery is at least
+once and handlers must tolerate repeats. A failed batch is retried job by
+job so one bad payload cannot hold back its neighbours; a failing job is
+retried with exponential backoff and jitter and, after ``max_attempts``,
+parked as ``dead`` (``flask jobs status``, ``flask jobs retry``).
+
+Each web process runs ``JOBS_WORKERS`` worker threads, started on first
+use so workers forked by ``gunicorn --preload`` each get their own;
+``flask jobs work`` runs a dedicated worker process instead
+(``JOBS_WORKERS=0`` in the web config).
+"""
+import json
+import logging
+import os
+import random
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import delete, func, insert, or_, select, update
+
+from models import db, Job
+
+log = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+DEAD = 'dead'
+
+BATCH_SIZE = 100
+MAX_ATTEMPTS = 8
+LEASE_SECONDS = 60
+POLL_SECONDS = 5
+LINGER_SECONDS = 0.5
+BACKOFF_SECONDS = 2
+BACKOFF_MAX_SECONDS = 3600
+
+HANDLERS = {}  # kind -> (function, batch_size)
+
+
+def handler(kind, batch_size=BATCH_SIZE):
+    """Register ``function(payloads)`` as the handler of ``kind`` jobs.
+
+    It runs inside the transaction that removes its jobs from the queue and
+    must not commit.
+    """
+    def register(function):
+        HANDLERS[kind] = (function, batch_size)
+        return function
+    return register
+
+
+# --- ENQUEUE ---
+def enqueue(kind, payload=None, delay=0):
+    """Add one job within the caller's transaction."""
+    enqueue_many(kind, [payload or {}], delay)
+
+
+def enqueue_many(kind, payloads, delay=0):
+    """Add one job per payload with a single executemany, within the caller's transaction."""
+    if not payloads:
+        return
+    now = datetime.utcnow()
+    run_at = now + timedelta(seconds=delay)
+    db.session.execute(insert(Job), [
+        {"kind": kind, "payload": json.dumps(payload), "status": QUEUED, "run_at": run_at, "created_at": now}
+        for payload in payloads
+    ])
+
+
+def take(kind):
+    """Remove every queued ``kind`` job within the caller's transaction and return their payloads.
+
+    For callers about to redo that work wholesale (e.g. a rollup rebuild).
+    """
+    rows = db.session.execute(
+        select(Job.id, Job.payload).where(Job.kind == kind, Job.status == QUEUED)
+    ).all()
+    if rows:
+        db.session.execute(delete(Job).where(Job.id.in_([row.id for row in rows])))
+    return [json.loads(row.payload) for row in rows]
+
+
+def backlog(kind):
+    """``(count, oldest created_at)`` of the queued ``kind`` jobs, for readers of what they produce."""
+    return tuple(db.session.execute(
+        select(func.count(), func.min(Job.created_at)).where(Job.kind == kind, Job.status == QUEUED)
+    ).one())
+
+
+# --- RUNNING ---
+def _due(now):
+    return (Job.status == QUEUED, Job.run_at <= now,
+            or_(Job.locked_until.is_(None), Job.locked_until < now))
+
+
+def claim(batch_size=None, lease=LEASE_SECONDS, kind=None):
+    """Lease a batch of due jobs of one kind; return ``(kind, token, jobs)`` or None.
+
+    The kind is that of the oldest due job unless given.
+    """
+    now = datetime.utcnow()
+    try:
+        if kind is None:
+            kind = db.session.execute(
+                select(Job.kind).where(Job.kind.in_(list(HANDLERS)), *_due(now))
+                .order_by(Job.run_at, Job.id).limit(1)
+            ).scalar()
+            if kind is None:
+                return None
+        elif kind not in HANDLERS:
+            raise LookupError(f"No handler for {kind!r} jobs")
+        ids = select(Job.id).where(Job.kind == kind, *_due(now)) \
+            .order_by(Job.run_at, Job.id).limit(batch_size or HANDLERS[kind][1])
+        token = uuid.uuid4().hex
+        db.session.execute(
+            update(Job)
+            .where(Job.id.in_(ids.scalar_subquery()), *_due(now))
+            .values(locked_by=token, locked_until=now + timedelta(seconds=lease), attempts=Job.attempts + 1)
+            .execution_options(synchronize_session=False)
+        )
+        jobs = db.session.execute(
+            select(Job.id, Job.payload, Job.attempts).where(Job.locked_by == token).order_by(Job.id)
+        ).all()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return (kind, token, jobs) if jobs else None
+
+
+def run_batch(kind, token, jobs, max_attempts=MAX_ATTEMPTS):
+    """Run claimed jobs; return how many completed."""
+    function, _ = HANDLERS[kind]
+    try:
+        removed = db.session.execute(
+            delete(Job).where(Job.id.in_([job.id for job in jobs]), Job.locked_by == token)
+        ).rowcount
+        if removed != len(jobs):
+            # The lease ran out and another worker has (some of) them now.
+            db.session.rollback()
+            return 0
+        function([json.loads(job.payload) for job in jobs])
+        db.session.commit()
+        return len(jobs)
+    except Exception as e:
+        db.session.rollback()
+        if len(jobs) > 1:
+            return sum(run_batch(kind, token, [job], max_attempts) for job in jobs)
+        log.warning("%s job %s failed (attempt %s): %s", kind, jobs[0].id, jobs[0].attempts, e)
+        _fail(jobs[0], token, e, max_attempts)
+        return 0
+
+
+def backoff(attempts):
+    """Seconds before retry number ``attempts``: exponential, capped, with jitter."""
+    return min(BACKOFF_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS) * random.uniform(0.5, 1.0)
+
+
+def _fail(job, token, error, max_attempts):
+    dead = job.attempts >= max_attempts
+    try:
+        db.session.execute(
+            update(Job)
+            .where(Job.id == job.id, Job.locked_by == token)
+            .values(
+                status=DEAD if dead else QUEUED,
+                run_at=datetime.utcnow() + timedelta(seconds=backoff(job.attempts)),
+                locked_by=None,
+                locked_until=None,
+                last_error=f"{type(error).__name__}: {error}"[:1000],
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        log.exception("Could not record the failure of job %s", job.id)
+
+
+def run_pending(kind=None, limit=None, max_attempts=MAX_ATTEMPTS):
+    """Run due jobs in this thread until none are left (or ``limit`` batches); return how many completed."""
+    done = batches = 0
+    while limit is None or batches < limit:
+        claimed = claim(kind=kind)
+        if claimed is None:
+            break
+        done += run_batch(*claimed, max_attempts=max_attempts)
+        batches += 1
+    return done
+
+
+# --- WORKERS ---
+class Worker:
+    """Threads that poll for due jobs and run them.
+
+    ``wake()`` starts the threads on first use in each process and cuts
+    their sleep short after a commit that enqueued work. A woken thread
+    lingers ``linger`` seconds first, so a busy register's orders are picked
+    up as one batch instead of one transaction each.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.event = threading.Event()
+        self.stopping = threading.Event()
+        self.threads = []
+        self.app = None
+        self._pid = None
+        self.configure(None, threads=1, poll_seconds=POLL_SECONDS, linger=LINGER_SECONDS,
+                       lease=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS)
+
+    def configure(self, app, threads, poll_seconds, linger, lease, max_attempts):
+        self.app = app
+        self.thread_count = threads
+        self.poll_seconds = poll_seconds
+        self.linger = linger
+        self.lease = lease
+        self.max_attempts = max_attempts
+
+    def start(self, threads=None):
+        with self.lock:
+            if self._pid == os.getpid() or self.app is None:
+                return
+            self._pid = os.getpid()
+            self.stopping.clear()
+            self.threads = [
+                threading.Thread(target=self._loop, name=f'jobs-{i}', daemon=True)
+                for i in range(self.thread_count if threads is None else threads)
+            ]
+        for thread in self.threads:
+            thread.start()
+
+    def wake(self):
+        if not self.thread_count:
+            return
+        self.start()
+        self.event.set()
+
+    def stop(self, timeout=None):
+        self.stopping.set()
+        self.event.set()
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def _loop(self):
+        with self.app.app_context():
+            while not self.stopping.is_set():
+                self.event.clear()
+                try:
+                    claimed = claim(lease=self.lease)
+                    if claimed is not None:
+                        run_batch(*claimed, max_attempts=self.max_attempts)
+                        continue
+                except Exception:
+                    log.exception("Job worker error")
+                finally:
+                    db.session.remove()
+                if self.event.wait(self.poll_seconds):
+                    self.stopping.wait(self.linger)
+
+
+worker = Worker()
+
+
+def wake():
+    """Let this process's workers know new jobs were committed."""
+    worker.wake()
+
+
+# --- CLI ---
+jobs_cli = AppGroup('jobs', help="Background job queue.")
+
+
+@jobs_cli.command('work')
+@click.option('--threads', type=int, default=2, show_default=True)
+def work_command(threads):
+    """Run job workers until interrupted."""
+    worker.start(threads)
+    click.echo(f"Running {len(worker.threads)} job worker threads; Ctrl+C to stop.")
+    try:
+        for thread in worker.threads:
+            while thread.is_alive():
+                thread.join(1)
+    except KeyboardInterrupt:
+        click.echo("Stopping after the current batches...")
+        worker.stop()
+
+
+@jobs_cli.command('run')
+@click.option('--kind', default=None, help="Only jobs of this kind.")
+def run_command(kind):
+    """Run every due job once in this process, then exit."""
+    click.echo(f"{run_pending(kind, max_attempts=worker.max_attempts)} jobs completed")
+
+
+@jobs_cli.command('status')
+def status_command():
+    """Queued and dead jobs per kind."""
+    rows = db.session.execute(
+        select(Job.kind, Job.status, func.count(), func.min(Job.run_at))
+        .group_by(Job.kind, Job.status).order_by(Job.kind, Job.status)
+    ).all()
+    if not rows:
+        click.echo("No jobs queued.")
+    for kind, status, count, oldest in rows:
+        click.echo(f"{kind:<20} {status:<7} {count:>8}  next {oldest:%Y-%m-%d %H:%M:%S}")
+
+
+@jobs_cli.command('retry')
+@click.option('--kind', default=None, help="Only jobs of this kind.")
+def retry_command(kind):
+    """Queue dead jobs again with a fresh attempt count."""
+    stmt = update(Job).where(Job.status == DEAD).values(
+        status=QUEUED, attempts=0, run_at=datetime.utcnow(), last_error=None,
+    )
+    if kind:
+        stmt = stmt.where(Job.kind == kind)
+    count = db.session.execute(stmt).rowcount
+    db.session.commit()
+    click.echo(f"{count} jobs queued again")
+
+
+def init_app(app):
+    config = app.config
+    worker.configure(
+        app,
+        threads=config.get('JOBS_WORKERS', 1),
+        poll_seconds=config.get('JOBS_POLL_SECONDS', POLL_SECONDS),
+        linger=config.get('JOBS_LINGER_SECONDS', LINGER_SECONDS),
+        lease=config.get('JOBS_LEASE_SECONDS', LEASE_SECONDS),
+        max_attempts=config.get('JOBS_MAX_ATTEMPTS', MAX_ATTEMPTS),
+    )
@@ -0,0 +1,251 @@
+"""Loyalty points: an append-only ledger behind a cached balance.
+
+Every change to a balance is a ``LoyaltyEntry`` row written in the caller's
+transaction together with an atomic ``loyalty_points = loyalty_points +
+:delta`` on the customer, never a read-modify-write in Python, so two
+registers crediting the same customer cannot lose points. Spending is a
+guarded ``UPDATE ... WHERE loyalty_points >= :points``, the same way stock
+is reserved, so a balance can never be overdrawn.
+
+Points earned by an order are credited after checkout by a ``loyalty.earn``
+job (see jobs.py); redemptions stay in the order transaction, since the
+balance has to cover them before the order is accepted.
+
+Reading a balance stays one primary-key read of ``customer.loyalty_points``;
+the ledger is the audit trail, and ``reconcile`` (``flask loyalty
+reconcile``, meant for cron) checks that the two still agree.
+"""
+from datetime import datetime
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import bindparam, func, insert, select, update
+
+from models import db, Customer, LoyaltyEntry, Order
+import customer_directory
+import jobs
+import pricing
+import versions
+
+EARN = 'earn'          # points for a completed purchase
+REDEEM = 'redeem'      # points spent as a discount at checkout
+REVERSE = 'reverse'    # a canceled order giving back what it earned/spent
+OPENING = 'opening'    # balances carried over when the ledger was introduced
+
+EARN_JOB = 'loyalty.earn'  # payload {"order_id"}
+
+HISTORY_PAGE_SIZE = 50
+HISTORY_PAGE_MAX = 200
+RECONCILE_BATCH_SIZE = 5000
+
+customer_table = Customer.__table__
+balance = func.coalesce(customer_table.c.loyalty_points, 0)
+
+
+class InsufficientPoints(Exception):
+    """The customer's balance does not cover a redemption. Nothing has been written."""
+
+
+# --- WRITES ---
+def credit(entries, reason, now=None):
+    """Append ``(customer_id, order_id, delta)`` entries and move the cached balances.
+
+    One executemany for the ledger and one for the balances, whatever the
+    number of entries, in the caller's transaction. Deltas may be negative;
+    spending goes through ``redeem`` so it cannot overdraw.
+    """
+    entries = [(customer_id, order_id, delta) for customer_id, order_id, delta in entries if delta]
+    if not entries:
+        return
+    now = now or datetime.utcnow()
+    db.session.execute(insert(LoyaltyEntry), [
+        {"customer_id": customer_id, "order_id": order_id, "delta": delta, "reason": reason, "created_at": now}
+        for customer_id, order_id, delta in entries
+    ])
+    per_customer = {}
+    for customer_id, _, delta in entries:
+        per_customer[customer_id] = per_customer.get(customer_id, 0) + delta
+    db.session.execute(
+        update(customer_table)
+        .where(customer_table.c.id == bindparam('customer_id'))
+        .values(loyalty_points=balance + bindparam('delta')),
+        [{"customer_id": cid, "delta": delta} for cid, delta in per_customer.items() if delta],
+    )
+
+
+def redeem(customer_id, points, order_id=None, now=None):
+    """Spend ``points`` of the customer's balance, or raise InsufficientPoints."""
+    result = db.session.execute(
+        update(customer_table)
+        .where(customer_table.c.id == customer_id, balance >= points)
+        .values(loyalty_points=balance - points)
+    )
+    if result.rowcount != 1:
+        raise InsufficientPoints(f"Customer {customer_id} has fewer than {points} points")
+    db.session.execute(insert(LoyaltyEntry).values(
+        customer_id=customer_id, order_id=order_id, delta=-points, reason=REDEEM,
+        created_at=now or datetime.utcnow(),
+    ))
+
+
+@jobs.handler(EARN_JOB, batch_size=500)
+def earn_for_orders(payloads):
+    """Job: credit the points newly placed orders earned.
+
+    Safe to repeat: orders that already earned, or were canceled meanwhile,
+    are skipped.
+    """
+    order_ids = sorted({payload["order_id"] for payload in payloads})
+    orders = db.session.execute(
+        select(Order.id, Order.customer_id, Order.total_cents)
+        .where(Order.id.in_(order_ids), Order.status.is_distinct_from('canceled'))
+        .with_for_update()
+    ).all()
+    earned = set(db.session.scalars(
+        select(LoyaltyEntry.order_id).where(LoyaltyEntry.order_id.in_(order_ids), LoyaltyEntry.reason == EARN)
+    ))
+    entries = [
+        (order.customer_id, order.id, pricing.loyalty_points(order.total_cents))
+        for order in orders if order.id not in earned
+    ]
+    credit(entries, EARN)
+    if any(delta for _, _, delta in entries):
+        versions.bump(versions.CUSTOMERS)
+
+
+def reverse_order(customer_id, order_id, now=None):
+    """Give back what a canceled order earned and spent; return the balance change.
+
+    Points the order earned that were already spent elsewhere stay spent:
+    the reversal takes back at most the current balance.
+    """
+    net = db.session.query(func.coalesce(func.sum(LoyaltyEntry.delta), 0)).filter(
+        LoyaltyEntry.order_id == order_id, LoyaltyEntry.customer_id == customer_id,
+    ).scalar()
+    delta = -net
+    if delta < 0:
+        current = db.session.execute(
+            select(balance).where(customer_table.c.id == customer_id).with_for_update()
+        ).scalar()
+        delta = max(delta, -max(current or 0, 0))
+    credit([(customer_id, order_id, delta)], REVERSE, now)
+    return delta
+
+
+# --- READS ---
+def current_balance(customer_id):
+    """The cached balance, or None for an unknown customer."""
+    return db.session.execute(select(balance).where(customer_table.c.id == customer_id)).scalar()
+
+
+def history(customer_id, before=None, limit=HISTORY_PAGE_SIZE):
+    """One page of the customer's ledger, newest first, and the cursor of the next page.
+
+    Keyset-paged on ``ix_loyalty_entry_customer`` (customer_id, id), so
+    deep pages cost the same as the first.
+    """
+    limit = min(max(limit, 1), HISTORY_PAGE_MAX)
+    query = db.session.query(
+        LoyaltyEntry.id, LoyaltyEntry.order_id, LoyaltyEntry.delta, LoyaltyEntry.reason, LoyaltyEntry.created_at,
+    ).filter(LoyaltyEntry.customer_id == customer_id)
+    if before:
+        query = query.filter(LoyaltyEntry.id < before)
+    rows = query.order_by(LoyaltyEntry.id.desc()).limit(limit + 1).all()
+    entries = [
+        {
+            "id": row.id,
+            "order_id": row.order_id,
+            "points": row.delta,
+            "reason": row.reason,
+            "created_at": row.created_at.isoformat(),
+        }
+        for row in rows[:limit]
+    ]
+    return entries, (rows[limit - 1].id if len(rows) > limit else None)
+
+
+# --- RECONCILIATION ---
+def _mismatches(cached, ledger):
+    """Positions where the cached balance differs from the ledger sum."""
+    np = pricing._numpy()
+    if np is None:
+        return [i for i, (c, l) in enumerate(zip(cached, ledger)) if c != l]
+    return np.flatnonzero(np.asarray(cached, dtype=np.int64) != np.asarray(ledger, dtype=np.int64)).tolist()
+
+
+def reconcile(batch_size=RECONCILE_BATCH_SIZE, fix=False):
+    """Compare every cached balance with its ledger, ``batch_size`` customers at a time.
+
+    Each batch is one primary-key range scan of customers and one GROUP BY
+    over their ledger rows, compared as whole arrays. With ``fix`` the
+    mismatched balances are reset from the ledger in the same statement that
+    re-sums it, so orders committing meanwhile are not overwritten; the
+    ledger is the source of truth and is never edited. Returns a report dict.
+    """
+    report = {"customers": 0, "mismatched": 0, "fixed": 0, "examples": []}
+    last_id = 0
+    while True:
+        rows = (
+            db.session.query(Customer.id, func.coalesce(Customer.loyalty_points, 0))
+            .filter(Customer.id > last_id)
+            .order_by(Customer.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+        ids = [cid for cid, _ in rows]
+        sums = dict(
+            db.session.query(LoyaltyEntry.customer_id, func.sum(LoyaltyEntry.delta))
+            .filter(LoyaltyEntry.customer_id.between(ids[0], ids[-1]))
+            .group_by(LoyaltyEntry.customer_id)
+            .all()
+        )
+        cached = [points for _, points in rows]
+        ledger = [sums.get(cid) or 0 for cid in ids]
+        positions = _mismatches(cached, ledger)
+
+        report["customers"] += len(rows)
+        report["mismatched"] += len(positions)
+        for i in positions[:max(0, 10 - len(report["examples"]))]:
+            report["examples"].append({"customer_id": ids[i], "cached": cached[i], "ledger": ledger[i]})
+        if fix and positions:
+            ledger_sum = (
+                select(func.coalesce(func.sum(LoyaltyEntry.delta), 0))
+                .where(LoyaltyEntry.customer_id == customer_table.c.id)
+                .scalar_subquery()
+            )
+            result = db.session.execute(
+                update(customer_table)
+                .where(customer_table.c.id.in_([ids[i] for i in positions]))
+                .values(loyalty_points=ledger_sum)
+            )
+            report["fixed"] += result.rowcount
+            db.session.commit()
+        else:
+            db.session.rollback()  # don't hold a read transaction across batches
+        last_id = ids[-1]
+
+    if report["fixed"]:
+        versions.bump(versions.CUSTOMERS)
+        db.session.commit()
+        customer_directory.lookup_cache.clear()
+    return report
+
+
+# --- CLI ---
+loyalty_cli = AppGroup('loyalty', help="Loyalty points maintenance.")
+
+
+@loyalty_cli.command('reconcile')
+@click.option('--fix', is_flag=True, help="Reset mismatched balances from the ledger.")
+@click.option('--batch-size', type=int, default=RECONCILE_BATCH_SIZE, show_default=True)
+def reconcile_command(fix, batch_size):
+    """Check cached point balances against the ledger."""
+    report = reconcile(batch_size, fix)
+    for example in report['examples']:
+        click.echo(f"customer {example['customer_id']}: cached {example['cached']}, ledger {example['ledger']}",
+                   err=True)
+    click.echo(f"{report['customers']} customers checked, {report['mismatched']} mismatched, {report['fixed']} fixed")
+    if report['mismatched'] and not fix:
+        raise SystemExit(1)
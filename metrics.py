@@ -0,0 +1,358 @@
+"""Request and SQL instrumentation with a Prometheus text endpoint.
+
+When ``METRICS_ENABLED`` is on, ``init_app`` installs request hooks and
+SQLAlchemy cursor events that record, per endpoint:
+
+* a latency histogram and request counts by status,
+* SQL statements and SQL time per request,
+* slow statements (``SLOW_QUERY_MS``), logged with their route,
+* N+1 patterns: one statement run ``N_PLUS_ONE_THRESHOLD`` or more times
+  in a single request, logged with their route.
+
+``PROFILE_SAMPLE_RATE`` runs that fraction of requests under cProfile and
+writes ``.prof`` files to ``PROFILE_DIR``. With everything disabled no hook
+or event is registered at all.
+
+Streamed bodies (SSE, exports) are timed until the response starts.
+Counters live in each process; other modules' running totals join them
+through ``registry.collect``. With ``METRICS_DIR`` set every worker also
+writes its totals there about once a second, and ``/metrics`` adds up all
+the files, so any worker can answer a scrape for the whole server. When a
+worker exits, gunicorn's master folds its file into ``retired.json`` once
+(``retire_snapshot``), so totals neither drop nor keep a file per dead pid.
+"""
+import cProfile
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+from models import db
+import auth
+
+log = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+FLUSH_SECONDS = 1.0
+RETIRED = 'retired'
+# Recently retired pids remembered in retired.json.
+RETIRED_PIDS = 32
+
+
+class Histogram:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+
+class Registry:
+    """All counters of this process, keyed by label tuples."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = {}         # (endpoint, method) -> Histogram
+        self.statements = {}      # endpoint -> Histogram of statements per request
+        self.requests = {}        # (endpoint, method, status) -> count
+        self.sql_seconds = {}     # endpoint -> seconds
+        self.slow_queries = {}    # endpoint -> count
+        self.n_plus_one = {}      # endpoint -> count
+        self.collectors = {}      # name -> (help, function returning this process's total)
+
+    def collect(self, name, help_text, function):
+        """Report ``function()``, a running total kept elsewhere, as counter ``name``."""
+        self.collectors[name] = (help_text, function)
+
+    def observe(self, endpoint, method, status, seconds, statements, sql_seconds, slow, repeated):
+        with self.lock:
+            _observe(self.latency, (endpoint, method), LATENCY_BUCKETS, seconds)
+            _observe(self.statements, endpoint, STATEMENT_BUCKETS, statements)
+            key = (endpoint, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.sql_seconds[endpoint] = self.sql_seconds.get(endpoint, 0.0) + sql_seconds
+            if slow:
+                self.slow_queries[endpoint] = self.slow_queries.get(endpoint, 0) + slow
+            if repeated:
+                self.n_plus_one[endpoint] = self.n_plus_one.get(endpoint, 0) + repeated
+
+    def snapshot(self):
+        """Plain-JSON copy of every counter (label tuples become lists)."""
+        def hist(h):
+            return {"counts": list(h.counts), "sum": h.sum, "count": h.count}
+
+        with self.lock:
+            return {
+                "latency": [[list(k), hist(h)] for k, h in self.latency.items()],
+                "statements": [[[k], hist(h)] for k, h in self.statements.items()],
+                "requests": [[list(k), v] for k, v in self.requests.items()],
+                "sql_seconds": [[[k], v] for k, v in self.sql_seconds.items()],
+                "slow_queries": [[[k], v] for k, v in self.slow_queries.items()],
+                "n_plus_one": [[[k], v] for k, v in self.n_plus_one.items()],
+                "counters": [[[name], function()] for name, (_, function) in self.collectors.items()],
+            }
+
+
+def _observe(histograms, key, buckets, value):
+    histogram = histograms.get(key)
+    if histogram is None:
+        histogram = histograms[key] = Histogram(buckets)
+    for i, bound in enumerate(buckets):
+        if value <= bound:
+            histogram.counts[i] += 1
+            break
+    histogram.sum += value
+    histogram.count += 1
+
+
+registry = Registry()
+
+
+# --- REQUEST HOOKS ---
+class RequestMetrics:
+    __slots__ = ('started', 'statements', 'sql_seconds', 'slow', 'seen', 'profiler')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.slow = 0
+        self.seen = {}
+        self.profiler = None
+
+
+class Instrumentation:
+    def __init__(self, app):
+        config = app.config
+        self.metrics_enabled = config.get('METRICS_ENABLED', True)
+        self.slow_query = config.get('SLOW_QUERY_MS', 100) / 1000
+        self.n_plus_one = config.get('N_PLUS_ONE_THRESHOLD', 10)
+        self.profile_rate = config.get('PROFILE_SAMPLE_RATE', 0.0)
+        self.profile_dir = config.get('PROFILE_DIR') or os.path.join(app.instance_path, 'profiles')
+        self.metrics_dir = config.get('METRICS_DIR')
+        self.profile_lock = threading.Lock()
+        self.flushed = 0.0
+
+    def before_request(self):
+        metrics = g._request_metrics = RequestMetrics()
+        # cProfile allows one active profiler per process.
+        if self.profile_rate and random.random() < self.profile_rate and self.profile_lock.acquire(blocking=False):
+            metrics.profiler = cProfile.Profile()
+            metrics.profiler.enable()
+
+    def after_request(self, response):
+        metrics = g.pop('_request_metrics', None)
+        if metrics is None:
+            return response
+        elapsed = time.perf_counter() - metrics.started
+        endpoint = request.endpoint or 'unmatched'
+
+        if metrics.profiler is not None:
+            metrics.profiler.disable()
+            self._save_profile(metrics.profiler, endpoint)
+            self.profile_lock.release()
+
+        repeated = [(sql, n) for sql, n in metrics.seen.items() if n >= self.n_plus_one]
+        for sql, n in repeated:
+            log.warning("N+1 on %s %s: %d x %s", request.method, endpoint, n, _short(sql))
+
+        if self.metrics_enabled:
+            registry.observe(endpoint, request.method, response.status_code, elapsed,
+                             metrics.statements, metrics.sql_seconds, metrics.slow, len(repeated))
+            if self.metrics_dir and time.monotonic() - self.flushed >= FLUSH_SECONDS:
+                self.flushed = time.monotonic()
+                write_snapshot(self.metrics_dir)
+        return response
+
+    def teardown_request(self, exc):
+        # after_request is skipped when an exception escapes the app; never
+        # leave the process profiler running.
+        metrics = g.pop('_request_metrics', None)
+        if metrics is not None and metrics.profiler is not None:
+            metrics.profiler.disable()
+            self.profile_lock.release()
+
+    def _save_profile(self, profiler, endpoint):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        path = os.path.join(self.profile_dir, f"{endpoint}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.prof")
+        profiler.dump_stats(path)
+        log.info("Profiled %s %s -> %s", request.method, endpoint, path)
+
+    # SQLAlchemy cursor events
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_started = time.perf_counter()
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_metrics_started', None)
+        if started is None or not has_request_context():
+            return
+        elapsed = time.perf_counter() - started
+        metrics = g.get('_request_metrics')
+        if metrics is None:
+            return
+        metrics.statements += 1
+        metrics.sql_seconds += elapsed
+        metrics.seen[statement] = metrics.seen.get(statement, 0) + 1
+        if elapsed >= self.slow_query:
+            metrics.slow += 1
+            log.warning("Slow query on %s %s: %.1f ms %s",
+                        request.method, request.endpoint, elapsed * 1000, _short(statement))
+
+
+def _short(sql, limit=300):
+    sql = ' '.join(sql.split())
+    return sql if len(sql) <= limit else sql[:limit] + '...'
+
+
+def init_app(app):
+    config = app.config
+    if not (config.get('METRICS_ENABLED', True) or config.get('PROFILE_SAMPLE_RATE')):
+        return
+    if config.get('METRICS_ENABLED', True):
+        registry.collect('pos_auth_hash_rejected_total', "Sign-ins refused because the hash pool was full.",
+                         lambda: auth.hash_pool.rejected)
+    instrumentation = Instrumentation(app)
+    app.before_request(instrumentation.before_request)
+    app.after_request(instrumentation.after_request)
+    app.teardown_request(instrumentation.teardown_request)
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', instrumentation.before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', instrumentation.after_cursor_execute)
+
+
+# --- EXPOSITION ---
+def _write_json(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def write_snapshot(directory):
+    os.makedirs(directory, exist_ok=True)
+    _write_json(os.path.join(directory, f"{os.getpid()}.json"), registry.snapshot())
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def retire_snapshot(directory, pid):
+    """Fold the snapshot of exited worker ``pid`` into ``retired.json`` and remove it.
+
+    Runs in the gunicorn master (``child_exit``), one worker at a time.
+    ``retired.json`` names the pids it already holds, so a scrape that still
+    finds such a file in between does not count it twice.
+    """
+    path = os.path.join(directory, f"{pid}.json")
+    snapshot = _read(path)
+    if snapshot is None:
+        return
+    retired = os.path.join(directory, f"{RETIRED}.json")
+    previous = _read(retired) or {"pids": [], "snapshot": {}}
+    merged = _combine([previous["snapshot"], snapshot])
+    _write_json(retired, {
+        "pids": (previous["pids"] + [pid])[-RETIRED_PIDS:],
+        "snapshot": {family: [[list(k), v] for k, v in entries.items()] for family, entries in merged.items()},
+    })
+    os.remove(path)
+
+
+def _merged(directory):
+    """Sum this process's counters with every worker's (and the retired) snapshot file."""
+    snapshots = [registry.snapshot()]
+    if directory and os.path.isdir(directory):
+        # Read first, so no file it already holds is added again.
+        retired = _read(os.path.join(directory, f"{RETIRED}.json"))
+        skip = {f"{RETIRED}.json", f"{os.getpid()}.json"}
+        if retired is not None:
+            snapshots.append(retired["snapshot"])
+            skip.update(f"{pid}.json" for pid in retired["pids"])
+        for name in os.listdir(directory):
+            if not name.endswith('.json') or name in skip:
+                continue
+            snapshot = _read(os.path.join(directory, name))
+            if snapshot is not None:
+                snapshots.append(snapshot)
+    return _combine(snapshots)
+
+
+def _combine(snapshots):
+    merged = {}
+    for snapshot in snapshots:
+        for family, entries in snapshot.items():
+            target = merged.setdefault(family, {})
+            for labels, value in entries:
+                key = tuple(labels)
+                if isinstance(value, dict):
+                    current = target.setdefault(key, {"counts": [0] * len(value["counts"]), "sum": 0.0, "count": 0})
+                    current["counts"] = [a + b for a, b in zip(current["counts"], value["counts"])]
+                    current["sum"] += value["sum"]
+                    current["count"] += value["count"]
+                else:
+                    target[key] = target.get(key, 0) + value
+    return merged
+
+
+def _labels(names, values, **extra):
+    pairs = list(zip(names, values)) + list(extra.items())
+    inner = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in pairs)
+    return '{' + inner + '}'
+
+
+def _histogram_lines(name, names, buckets, entries):
+    for labels, h in sorted(entries.items()):
+        cumulative = 0
+        for bound, count in zip(buckets, h["counts"]):
+            cumulative += count
+            yield f"{name}_bucket{_labels(names, labels, le=bound)} {cumulative}"
+        yield f"{name}_bucket{_labels(names, labels, le='+Inf')} {h['count']}"
+        yield f"{name}_sum{_labels(names, labels)} {h['sum']}"
+        yield f"{name}_count{_labels(names, labels)} {h['count']}"
+
+
+def render(directory=None, gauges=()):
+    """Prometheus text exposition of all counters plus ``(name, help, value)`` gauges."""
+    merged = _merged(directory)
+    lines = [
+        "# HELP pos_http_request_duration_seconds Request latency by endpoint.",
+        "# TYPE pos_http_request_duration_seconds histogram",
+        *_histogram_lines('pos_http_request_duration_seconds', ('endpoint', 'method'),
+                          LATENCY_BUCKETS, merged.get('latency', {})),
+        "# HELP pos_http_requests_total Requests by endpoint and status.",
+        "# TYPE pos_http_requests_total counter",
+    ]
+    for labels, value in sorted(merged.get('requests', {}).items()):
+        lines.append(f"pos_http_requests_total{_labels(('endpoint', 'method', 'status'), labels)} {value}")
+    lines += [
+        "# HELP pos_sql_statements_per_request SQL statements executed per request.",
+        "# TYPE pos_sql_statements_per_request histogram",
+        *_histogram_lines('pos_sql_statements_per_request', ('endpoint',),
+                          STATEMENT_BUCKETS, merged.get('statements', {})),
+    ]
+    for family, name, help_text in (
+        ('sql_seconds', 'pos_sql_duration_seconds_total', "Time spent in SQL by endpoint."),
+        ('slow_queries', 'pos_sql_slow_queries_total', "Statements slower than SLOW_QUERY_MS."),
+        ('n_plus_one', 'pos_sql_n_plus_one_total', "Requests repeating one statement N_PLUS_ONE_THRESHOLD+ times."),
+    ):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        for labels, value in sorted(merged.get(family, {}).items()):
+            lines.append(f"{name}{_labels(('endpoint',), labels)} {value}")
+    for (name,), value in sorted(merged.get('counters', {}).items()):
+        help_text = registry.collectors.get(name, (name,))[0]
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter", f"{name} {value}"]
+    for name, help_text, value in gauges:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"]
+    return '\n'.join(lines) + '\n'
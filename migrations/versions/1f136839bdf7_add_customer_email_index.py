@@ -0,0 +1,27 @@
+"""Add customer email index
+
+Revision ID: 1f136839bdf7
+Revises: c42d7d2e3f72
+Create Date: 2026-10-18 03:43:28.631147
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1f136839bdf7'
+down_revision = 'c42d7d2e3f72'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Expression index, so it is not picked up by autogenerate.
+    with op.batch_alter_table('customer', schema=None) as batch_op:
+        batch_op.create_index('ix_customer_email_nocase', [sa.text('email COLLATE NOCASE')], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('customer', schema=None) as batch_op:
+        batch_op.drop_index('ix_customer_email_nocase')
@@ -0,0 +1,33 @@
+"""Seed customer and user data versions
+
+Revision ID: 8e41c0a7d9b2
+Revises: 5cb3a4a2ad51
+Create Date: 2026-10-18 02:24:10.418206
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e41c0a7d9b2'
+down_revision = '5cb3a4a2ad51'
+branch_labels = None
+depends_on = None
+
+
+data_version = sa.table('data_version',
+    sa.column('name', sa.String(length=50)),
+    sa.column('version', sa.Integer()),
+)
+
+
+def upgrade():
+    op.bulk_insert(data_version, [
+        {'name': 'customers', 'version': 1},
+        {'name': 'users', 'version': 1},
+    ])
+
+
+def downgrade():
+    op.execute(data_version.delete().where(data_version.c.name.in_(['customers', 'users'])))
@@ -0,0 +1,27 @@
+"""Add customer name index
+
+Revision ID: b7d15e9c3a60
+Revises: 8e41c0a7d9b2
+Create Date: 2026-10-18 02:31:52.904117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d15e9c3a60'
+down_revision = '8e41c0a7d9b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Expression index, so it is not picked up by autogenerate.
+    with op.batch_alter_table('customer', schema=None) as batch_op:
+        batch_op.create_index('ix_customer_name_nocase', [sa.text('name COLLATE NOCASE')], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('customer', schema=None) as batch_op:
+        batch_op.drop_index('ix_customer_name_nocase')
@@ -0,0 +1,49 @@
+"""Hash user PINs
+
+Revision ID: c41d7e2a9f05
+Revises: f622bdb8bfda
+Create Date: 2026-10-18 04:10:12.418733
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from werkzeug.security import generate_password_hash
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41d7e2a9f05'
+down_revision = 'f622bdb8bfda'
+branch_labels = None
+depends_on = None
+
+# Same as auth.PIN_HASH_METHOD at the time of writing.
+PIN_HASH_METHOD = 'pbkdf2:sha256:20000'
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('pin_hash', sa.String(length=128), nullable=True))
+
+    bind = op.get_bind()
+    users = sa.table('user', sa.column('id', sa.Integer), sa.column('pin', sa.String),
+                     sa.column('pin_hash', sa.String))
+    rows = bind.execute(sa.select(users.c.id, users.c.pin)).all()
+    if rows:
+        bind.execute(
+            users.update().where(users.c.id == sa.bindparam('user_id')).values(pin_hash=sa.bindparam('hashed')),
+            [{"user_id": user_id, "hashed": generate_password_hash(pin or '', method=PIN_HASH_METHOD)}
+             for user_id, pin in rows],
+        )
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('pin_hash', existing_type=sa.String(length=128), nullable=False)
+        batch_op.drop_column('pin')
+
+
+def downgrade():
+    # Hashed PINs cannot be recovered; every user is reset to 0000.
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('pin', sa.String(length=4), nullable=False, server_default='0000'))
+        batch_op.drop_column('pin_hash')
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('pin', existing_type=sa.String(length=4), server_default=None)
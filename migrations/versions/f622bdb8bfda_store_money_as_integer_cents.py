@@ -0,0 +1,48 @@
+"""Store money as integer cents
+
+Revision ID: f622bdb8bfda
+Revises: 0f918c3bac68
+Create Date: 2026-10-18 02:22:56.129896
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f622bdb8bfda'
+down_revision = '0f918c3bac68'
+branch_labels = None
+depends_on = None
+
+
+# (table, float column, integer cents column)
+MONEY_COLUMNS = [
+    ('product', 'price', 'price_cents'),
+    ('order', 'total_price', 'total_cents'),
+    ('order_item', 'price', 'price_cents'),
+    ('sales_hourly', 'revenue', 'revenue_cents'),
+    ('product_sales_daily', 'revenue', 'revenue_cents'),
+    ('category_sales_daily', 'revenue', 'revenue_cents'),
+]
+
+
+def _convert(table, old, new, new_type, expression):
+    with op.batch_alter_table(table, schema=None) as batch_op:
+        batch_op.add_column(sa.Column(new, new_type, nullable=True))
+
+    op.execute(f'UPDATE "{table}" SET {new} = {expression.format(old)}')
+
+    with op.batch_alter_table(table, schema=None) as batch_op:
+        batch_op.alter_column(new, existing_type=new_type, nullable=False)
+        batch_op.drop_column(old)
+
+
+def upgrade():
+    for table, dollars, cents in MONEY_COLUMNS:
+        _convert(table, dollars, cents, sa.Integer(), 'CAST(ROUND({} * 100) AS INTEGER)')
+
+
+def downgrade():
+    for table, dollars, cents in reversed(MONEY_COLUMNS):
+        _convert(table, cents, dollars, sa.Float(), '{} / 100.0')
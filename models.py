@@ -1,7 +1,13 @@
+import re
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import validates
 from werkzeug.security import generate_password_hash, check_password_hash
 
+from pricing import to_cents, to_dollars
+import auth
+
 db = SQLAlchemy()
 
 class User(db.Model):
@@ -9,7 +15,11 @@ class User(db.Model):
     name = db.Column(db.String(80), nullable=False)
     email = db.Column(db.String(120), nullable=False, unique=True, index=True)
     password_hash = db.Column(db.String(128), nullable=False)
-    pin = db.Column(db.String(4), nullable=False)
+    # Salted PBKDF2 of the register-switching PIN; see auth.hash_pin.
+    pin_hash = db.Column(db.String(128), nullable=False)
+    # Wrong PINs since the last successful sign-in; the PIN is locked at
+    # AUTH_PIN_MAX_FAILURES until the user signs in with their password.
+    pin_failures = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     # Roles: customer, employee, admin
     role = db.Column(db.String(20), nullable=False, default="customer")
@@ -24,6 +34,12 @@ class User(db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
+    def set_pin(self, pin):
+        self.pin_hash = auth.hash_pin(pin)
+
+    def check_pin(self, pin):
+        return auth.check_pin(self.pin_hash, pin)
+
     def is_admin(self):
         return self.role == "admin"
 
@@ -41,37 +57,80 @@ class Product(db.Model):
     category = db.Column(db.String(50), nullable=False, default="General")
     stock = db.Column(db.Integer, nullable=False, default=0)
     last_restocked = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
-    price = db.Column(db.Float, nullable=False)
+    price_cents = db.Column(db.Integer, nullable=False)
     image_url = db.Column(db.String(255), nullable=False)
+    image_hash = db.Column(db.String(64))  # local thumbnail of image_url, see images.py
+    # Alert once stock falls to this level; 0 means only when sold out.
+    reorder_threshold = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    __table_args__ = (
+        # Partial index holding only products at or below their threshold,
+        # so the low-stock list and badge never scan the catalog.
+        db.Index(
+            'ix_product_low_stock', 'stock',
+            sqlite_where=db.text('stock <= reorder_threshold'),
+            postgresql_where=db.text('stock <= reorder_threshold'),
+        ),
+    )
 
     def __repr__(self):
         return f"<Product {self.name}>"
 
+    @hybrid_property
+    def is_low(self):
+        return self.stock <= self.reorder_threshold
+
+    @property
+    def image_src(self):
+        """Where pages load the picture from: the local thumbnail once there is one."""
+        return f"/img/{self.image_hash}" if self.image_hash else self.image_url
+
+    @hybrid_property
+    def price(self):
+        """Unit price in dollars; stored as integer cents."""
+        return to_dollars(self.price_cents)
+
+    @price.setter
+    def price(self, value):
+        self.price_cents = to_cents(value)
+
+    @price.expression
+    def price(cls):
+        return cls.price_cents / 100.0
+
+
+def normalize_phone(phone):
+    """Canonical form used for loyalty lookup: digits only, no leading US country code."""
+    digits = re.sub(r'\D', '', phone or '')
+    if len(digits) == 11 and digits.startswith('1'):
+        digits = digits[1:]
+    return digits
+
 
 class Customer(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), nullable=False)
     email = db.Column(db.String(120), unique=True, index=True)
     phone = db.Column(db.String(20), unique=True, index=True, nullable=False)  # used for loyalty lookup
+    phone_normalized = db.Column(db.String(20), index=True)  # kept in sync with phone, see normalize_phone
     address = db.Column(db.String(255))
-    loyalty_points = db.Column(db.Integer, default=0)  # tracks accumulated points
+    loyalty_points = db.Column(db.Integer, default=0)  # cached sum of the loyalty ledger, see loyalty.py
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     orders = db.relationship("Order", back_populates="customer", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        db.Index('ix_customer_name_nocase', db.text('name COLLATE NOCASE')),  # directory search/sort
+        db.Index('ix_customer_email_nocase', db.text('email COLLATE NOCASE')),  # directory search by email
+    )
+
     def __repr__(self):
         return f"<Customer {self.name} | {self.phone} | Points: {self.loyalty_points}>"
 
-    def add_points(self, amount):
-        """Add loyalty points to this customer."""
-        self.loyalty_points += amount
-
-    def redeem_points(self, amount):
-        """Redeem points if available."""
-        if self.loyalty_points >= amount:
-            self.loyalty_points -= amount
-            return True
-        return False
+    @validates('phone')
+    def _sync_phone_normalized(self, key, phone):
+        self.phone_normalized = normalize_phone(phone)
+        return phone
 
 
 
@@ -79,25 +138,153 @@ class Order(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey("customer.id"), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    total_price = db.Column(db.Float, nullable=False, default=0.0)
-    status = db.Column(db.String(50), default="pending")  # e.g., pending, completed, canceled
+    total_cents = db.Column(db.Integer, nullable=False, default=0)  # after any points discount
+    discount_cents = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # paid with loyalty points
+    status = db.Column(db.String(50), default="pending")  # see order_status.py for the lifecycle
+    idempotency_key = db.Column(db.String(64), unique=True, index=True)  # set by registers replaying offline tickets
+    # When the order entered each later status (see order_status.py).
+    started_at = db.Column(db.DateTime)
+    ready_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime)
+    canceled_at = db.Column(db.DateTime)
 
     customer = db.relationship("Customer", back_populates="orders")
     items = db.relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        db.Index('ix_order_customer_created', 'customer_id', 'created_at'),  # order history pages
+        db.Index('ix_order_status_created', 'status', 'created_at'),  # make-line queue
+        db.Index('ix_order_created', 'created_at'),  # shift reports over a time window
+    )
+
     def __repr__(self):
         return f"<Order {self.id} - Customer {self.customer_id}>"
 
+    @hybrid_property
+    def total_price(self):
+        return to_dollars(self.total_cents)
+
+    @total_price.setter
+    def total_price(self, value):
+        self.total_cents = to_cents(value)
+
+    @total_price.expression
+    def total_price(cls):
+        return cls.total_cents / 100.0
+
 
 class OrderItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey("order.id"), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey("order.id"), nullable=False, index=True)
     product_id = db.Column(db.Integer, db.ForeignKey("product.id"), nullable=False)
     quantity = db.Column(db.Integer, nullable=False, default=1)
-    price = db.Column(db.Float, nullable=False)  # snapshot of price at time of order
+    price_cents = db.Column(db.Integer, nullable=False)  # snapshot of price at time of order
 
     order = db.relationship("Order", back_populates="items")
     product = db.relationship("Product")
 
     def __repr__(self):
-        return f"<OrderItem {self.product_id} x {self.quantity}>"
\ No newline at end of file
+        return f"<OrderItem {self.product_id} x {self.quantity}>"
+
+    @hybrid_property
+    def price(self):
+        return to_dollars(self.price_cents)
+
+    @price.setter
+    def price(self, value):
+        self.price_cents = to_cents(value)
+
+    @price.expression
+    def price(cls):
+        return cls.price_cents / 100.0
+
+class LoyaltyEntry(db.Model):
+    """Append-only loyalty points ledger; ``Customer.loyalty_points`` caches its sum (see loyalty.py)."""
+    id = db.Column(db.Integer, primary_key=True)
+    customer_id = db.Column(db.Integer, db.ForeignKey("customer.id"), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey("order.id"), index=True)
+    delta = db.Column(db.Integer, nullable=False)
+    reason = db.Column(db.String(20), nullable=False)  # earn, redeem, reverse, opening
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_loyalty_entry_customer', 'customer_id', 'id'),  # statements, newest first
+    )
+
+    def __repr__(self):
+        return f"<LoyaltyEntry {self.customer_id} {self.delta:+d} {self.reason}>"
+
+
+class DataVersion(db.Model):
+    """Version counter for a cached data set (e.g. the product catalog).
+
+    Writers bump the counter in the same transaction as their change, so every
+    worker can tell its cached copy is stale with a single primary-key read.
+    """
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<DataVersion {self.name}={self.version}>"
+
+
+class UserSession(db.Model):
+    """Server-side session payload, keyed by the id in the session cookie (see sessions.py)."""
+    id = db.Column(db.String(128), primary_key=True)
+    data = db.Column(db.LargeBinary, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<UserSession {self.id[:16]}... until {self.expires_at}>"
+
+
+class Job(db.Model):
+    """Durable background job; see jobs.py."""
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')  # JSON
+    status = db.Column(db.String(10), nullable=False, default='queued')  # queued, dead
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # not before; pushed back on retry
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    locked_by = db.Column(db.String(32), index=True)  # lease token of the worker running it
+    locked_until = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_job_due', 'status', 'run_at'),  # workers polling for due jobs
+    )
+
+    def __repr__(self):
+        return f"<Job {self.id} {self.kind} {self.status}>"
+
+
+# --- REPORTING ROLLUPS (maintained by reports.py) ---
+class SalesHourly(db.Model):
+    bucket = db.Column(db.DateTime, primary_key=True)  # start of the hour (UTC)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue_cents = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<SalesHourly {self.bucket} {self.revenue_cents}>"
+
+
+class ProductSalesDaily(db.Model):
+    day = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey("product.id"), primary_key=True)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue_cents = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<ProductSalesDaily {self.day} {self.product_id} x {self.units}>"
+
+
+class CategorySalesDaily(db.Model):
+    day = db.Column(db.Date, primary_key=True)
+    category = db.Column(db.String(50), primary_key=True)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue_cents = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<CategorySalesDaily {self.day} {self.category} {self.revenue_cents}>"
@@ -0,0 +1,403 @@
+"""Order submission engine.
+
+A ticket is validated against a single batched product load, stock is
+reserved with one guarded UPDATE and the order plus its lines are written
+in the same transaction, together with any loyalty points it redeems (see
+loyalty.py). Any failure rolls the whole session back.
+
+Only what checkout depends on is written before the response. Points
+earned and the reporting rollups are queued as jobs in the same
+transaction (see jobs.py) and applied by a background worker shortly after.
+"""
+from datetime import datetime
+
+from sqlalchemy import case, insert, update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Product, Order, OrderItem, Customer
+import catalog
+import customer_directory
+import events
+import jobs
+import loyalty
+import pricing
+import reports
+import versions
+
+
+class OrderError(Exception):
+    """Raised when an order cannot be placed. Nothing has been written."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def parse_lines(items):
+    """Normalize the posted line items into (product_id, quantity) pairs."""
+    lines = []
+    for item in items:
+        try:
+            product_id = int(item['product_id'])
+            quantity = int(item['quantity'])
+        except (KeyError, TypeError, ValueError):
+            raise OrderError("Each item needs a product_id and quantity")
+        if quantity <= 0:
+            raise OrderError(f"Invalid quantity for product {product_id}")
+        lines.append((product_id, quantity))
+    return lines
+
+
+def total_quantities(lines):
+    """Sum quantities per product so repeated lines reserve stock once."""
+    quantities = {}
+    for product_id, quantity in lines:
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return quantities
+
+
+def load_products(product_ids):
+    """Load every product of a ticket with one IN (...) query."""
+    if not product_ids:
+        return {}
+    products = Product.query.filter(Product.id.in_(product_ids)).all()
+    return {p.id: p for p in products}
+
+
+def reserve_stock(quantities):
+    """Decrement stock for all products in one atomic, guarded UPDATE.
+
+    Rows only change when ``stock >= quantity``, so concurrent registers can
+    never drive stock negative. Returns True when every product was reserved;
+    the caller must roll back otherwise.
+    """
+    if not quantities:
+        return True
+    qty = case(quantities, value=Product.id)
+    result = db.session.execute(
+        update(Product)
+        .where(Product.id.in_(list(quantities)), Product.stock >= qty)
+        .values(stock=Product.stock - qty)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == len(quantities)
+
+
+def _first_short(quantities):
+    """Find a product that can no longer cover its quantity."""
+    stock = dict(
+        db.session.query(Product.id, Product.stock)
+        .filter(Product.id.in_(list(quantities)))
+        .all()
+    )
+    for product_id, quantity in quantities.items():
+        if stock.get(product_id, 0) < quantity:
+            return product_id
+    return next(iter(quantities))
+
+
+def existing_orders(keys):
+    """Map already-used idempotency keys to their order ids."""
+    if not keys:
+        return {}
+    rows = (
+        db.session.query(Order.idempotency_key, Order.id)
+        .filter(Order.idempotency_key.in_(list(keys)))
+        .all()
+    )
+    return dict(rows)
+
+
+def parse_redeem_points(value):
+    """Validate the number of loyalty points a ticket pays with."""
+    try:
+        points = int(value or 0)
+    except (TypeError, ValueError):
+        raise OrderError("redeem_points must be a whole number")
+    if points < 0:
+        raise OrderError("redeem_points cannot be negative")
+    return points
+
+
+def submit_order(customer_id, items, idempotency_key=None, redeem_points=0):
+    """Place an order and return ``(order_id, created)``, or raise OrderError.
+
+    ``redeem_points`` of the customer's balance are taken off the total
+    (see ``pricing.points_value``); points are earned on what is left.
+    When ``idempotency_key`` was already used the existing order id is
+    returned with ``created`` False and nothing is written.
+    """
+    if not customer_id or not items:
+        raise OrderError("Customer and items are required")
+
+    lines = parse_lines(items)
+    redeem_points = parse_redeem_points(redeem_points)
+    quantities = total_quantities(lines)
+
+    try:
+        if idempotency_key:
+            existing = existing_orders([idempotency_key]).get(idempotency_key)
+            if existing:
+                return existing, False
+
+        products = load_products(list(quantities))
+        for product_id, quantity in quantities.items():
+            product = products.get(product_id)
+            if not product or product.stock < quantity:
+                raise OrderError(f"Product {product_id} unavailable")
+
+        customer = db.session.get(Customer, customer_id)
+        if customer is None:
+            raise OrderError("Customer not found", 404)
+
+        prices = {pid: products[pid].price_cents for pid in quantities}
+        _, total_cents, _ = pricing.price_order(lines, prices)
+        discount_cents = pricing.points_value(redeem_points)
+        if discount_cents > total_cents:
+            raise OrderError("Cannot redeem more points than the order total")
+        total_cents -= discount_cents
+
+        if not reserve_stock(quantities):
+            db.session.rollback()
+            raise OrderError(f"Product {_first_short(quantities)} unavailable")
+
+        created_at = datetime.utcnow()
+        order = Order(
+            customer_id=customer.id,
+            created_at=created_at,
+            status="pending",
+            total_cents=total_cents,
+            discount_cents=discount_cents,
+            idempotency_key=idempotency_key,
+        )
+        db.session.add(order)
+        db.session.flush()
+
+        db.session.execute(insert(OrderItem), [
+            {"order_id": order.id, "product_id": pid, "quantity": qty, "price_cents": prices[pid]}
+            for pid, qty in lines
+        ])
+
+        if redeem_points:
+            try:
+                loyalty.redeem(customer.id, redeem_points, order.id, created_at)
+            except loyalty.InsufficientPoints:
+                raise OrderError("Not enough loyalty points", 409)
+            versions.bump(versions.CUSTOMERS)
+        _queue_follow_up([order.id])
+        catalog.invalidate()
+
+        order_id = order.id
+        db.session.commit()
+        if redeem_points:
+            customer_directory.lookup_cache.clear()
+    except IntegrityError:
+        # Another worker committed the same idempotency key first.
+        db.session.rollback()
+        existing = existing_orders([idempotency_key]).get(idempotency_key) if idempotency_key else None
+        if existing is None:
+            raise
+        return existing, False
+    except Exception:
+        db.session.rollback()
+        raise
+
+    jobs.wake()
+    _publish_orders([(order_id, total_cents, len(lines))], quantities)
+    return order_id, True
+
+
+def _queue_follow_up(order_ids):
+    """Queue the work a new order triggers that checkout need not wait for."""
+    payloads = [{"order_id": order_id} for order_id in order_ids]
+    jobs.enqueue_many(loyalty.EARN_JOB, payloads)
+    jobs.enqueue_many(reports.SALES_JOB, payloads)
+
+
+def _publish_orders(orders, quantities):
+    """Tell live pages about committed ``(order_id, total_cents, lines)`` orders."""
+    events.publish(events.ORDER, {"orders": [
+        {"id": order_id, "total": pricing.to_dollars(total), "items": lines} for order_id, total, lines in orders
+    ]})
+    events.publish_stock(quantities)
+
+
+# --- BATCH INGESTION ---
+BATCH_CHUNK_SIZE = 100
+
+
+def _batch_result(index, key, status, **extra):
+    return dict({"index": index, "idempotency_key": key, "status": status}, **extra)
+
+
+def submit_batch(orders, chunk_size=BATCH_CHUNK_SIZE):
+    """Ingest a backlog of offline tickets and return one result per order.
+
+    Every order must carry an ``idempotency_key``; replayed keys report
+    ``duplicate`` with the original order id and never touch stock or points
+    again. Orders are validated against one product/customer snapshot and
+    written ``chunk_size`` at a time, each chunk in its own transaction.
+    """
+    orders = list(orders)
+    results = [None] * len(orders)
+    parsed = []
+    seen = {}
+
+    for index, raw in enumerate(orders):
+        key = raw.get('idempotency_key') if isinstance(raw, dict) else None
+        if not key:
+            results[index] = _batch_result(index, key, "error", error="idempotency_key is required")
+            continue
+        key = str(key)
+        if len(key) > 64:
+            results[index] = _batch_result(index, key, "error", error="idempotency_key is too long")
+            continue
+        if key in seen:
+            parsed.append((index, key, None, None))
+            continue
+        seen[key] = index
+        try:
+            if not raw.get('customer_id') or not raw.get('items'):
+                raise OrderError("Customer and items are required")
+            if raw.get('redeem_points'):
+                # Offline registers cannot check a balance; redeem at a live register.
+                raise OrderError("Points cannot be redeemed in a batch")
+            lines = parse_lines(raw['items'])
+        except OrderError as e:
+            results[index] = _batch_result(index, key, "error", error=e.message)
+            continue
+        parsed.append((index, key, raw['customer_id'], lines))
+
+    product_ids = {pid for _, _, _, lines in parsed if lines for pid, _ in lines}
+    customer_ids = {cid for _, _, cid, lines in parsed if lines}
+    snapshot = {
+        pid: [p.price_cents, p.stock] for pid, p in load_products(list(product_ids)).items()
+    }
+    customers = {
+        cid for (cid,) in db.session.query(Customer.id).filter(Customer.id.in_(list(customer_ids)))
+    } if customer_ids else set()
+    used = existing_orders(seen)
+    db.session.rollback()
+
+    accepted = []
+    for index, key, customer_id, lines in parsed:
+        if lines is None:
+            # A repeated key inside the same batch resolves after writing.
+            continue
+        if key in used:
+            results[index] = _batch_result(index, key, "duplicate", order_id=used[key])
+            continue
+        try:
+            customer_id = int(customer_id)
+        except (TypeError, ValueError):
+            customer_id = None
+        if customer_id not in customers:
+            results[index] = _batch_result(index, key, "error", error="Customer not found")
+            continue
+        quantities = total_quantities(lines)
+        short = next(
+            (pid for pid, qty in quantities.items() if pid not in snapshot or snapshot[pid][1] < qty),
+            None,
+        )
+        if short is not None:
+            results[index] = _batch_result(index, key, "error", error=f"Product {short} unavailable")
+            continue
+        for pid, qty in quantities.items():
+            snapshot[pid][1] -= qty
+        accepted.append((index, key, customer_id, lines))
+
+    for start in range(0, len(accepted), chunk_size):
+        chunk = accepted[start:start + chunk_size]
+        try:
+            written = _write_chunk(chunk, snapshot)
+        except IntegrityError:
+            db.session.rollback()
+            written = None
+        if written is None:
+            # Stock moved underneath us or a key raced in from another
+            # worker; fall back to placing this chunk one order at a time.
+            written = {}
+            for index, key, customer_id, lines in chunk:
+                try:
+                    order_id, created = submit_order(
+                        customer_id,
+                        [{"product_id": pid, "quantity": qty} for pid, qty in lines],
+                        idempotency_key=key,
+                    )
+                except OrderError as e:
+                    results[index] = _batch_result(index, key, "error", error=e.message)
+                    continue
+                written[key] = order_id
+                if not created:
+                    results[index] = _batch_result(index, key, "duplicate", order_id=order_id)
+        for index, key, _, _ in chunk:
+            if key in written and results[index] is None:
+                results[index] = _batch_result(index, key, "created", order_id=written[key])
+        used.update(written)
+
+    for index, key, _, lines in parsed:
+        if lines is None:
+            first = results[seen[key]]
+            if first and "order_id" in first:
+                results[index] = _batch_result(index, key, "duplicate", order_id=first["order_id"])
+            else:
+                results[index] = _batch_result(index, key, "error", error="Duplicate idempotency_key in batch")
+
+    return results
+
+
+def _write_chunk(chunk, snapshot):
+    """Write one chunk in a single transaction.
+
+    Returns ``{idempotency_key: order_id}``, or None after rolling back when
+    the guarded stock reservation did not cover the whole chunk.
+    """
+    quantities = total_quantities(line for _, _, _, lines in chunk for line in lines)
+    try:
+        if not reserve_stock(quantities):
+            db.session.rollback()
+            return None
+
+        flat = [(position, pid, qty) for position, (_, _, _, lines) in enumerate(chunk) for pid, qty in lines]
+        totals, _ = pricing.bulk_order_totals(
+            [position for position, _, _ in flat],
+            [snapshot[pid][0] for _, pid, _ in flat],
+            [qty for _, _, qty in flat],
+            len(chunk),
+        )
+        created_at = datetime.utcnow()
+        order_ids = db.session.scalars(
+            insert(Order).returning(Order.id, sort_by_parameter_order=True),
+            [
+                {
+                    "customer_id": customer_id,
+                    "created_at": created_at,
+                    "status": "pending",
+                    "total_cents": total,
+                    "idempotency_key": key,
+                }
+                for (_, key, customer_id, _), total in zip(chunk, totals)
+            ],
+        ).all()
+
+        db.session.execute(insert(OrderItem), [
+            {"order_id": order_id, "product_id": pid, "quantity": qty, "price_cents": snapshot[pid][0]}
+            for order_id, (_, _, _, lines) in zip(order_ids, chunk)
+            for pid, qty in lines
+        ])
+        _queue_follow_up(order_ids)
+        catalog.invalidate()
+
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    jobs.wake()
+
+    _publish_orders(
+        [(order_id, total, len(lines)) for order_id, total, (_, _, _, lines) in zip(order_ids, totals, chunk)],
+        quantities,
+    )
+    return {key: order_id for (_, key, _, _), order_id in zip(chunk, order_ids)}
@@ -0,0 +1,420 @@
+"""Columnar, memory-mapped snapshot of the order history for analytics.
+
+``build`` appends settled order lines to one raw little-endian file per
+column (see ``COLUMNS``) under ``SNAPSHOT_DIR``; ``manifest.json`` records
+how many rows are valid and the last order exported. Each run only reads
+the orders past that watermark, in ``yield_per`` partitions, so a nightly
+build costs one day of orders, not the whole history. Rows are in order id
+order, so every basket is one contiguous run of rows.
+
+An order is settled once it is completed or canceled. The export stops
+short of the oldest ticket still on the make line, so a later cancel can
+never leave a stale line behind; canceled orders are left out. A ticket
+open for longer than ``settle_hours`` (abandoned, never bumped) no longer
+holds the export back: it is exported as placed and counted in the build
+report, which also says how far behind the live tables the snapshot is.
+
+``load`` maps the files read-only with ``numpy.memmap``: opening years of
+lines costs nothing, the OS pages in only what an analysis touches, and
+nothing goes near the live database. ``top_pairs``, ``hourly_demand`` and
+``product_velocity`` are whole-array NumPy passes over those columns.
+
+Unlike the bulk paths in pricing.py there is no pure-Python fallback: this
+module needs NumPy.
+"""
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import func, select
+
+from models import db, Order, OrderItem
+import catalog
+import order_status
+import pricing
+
+FORMAT_VERSION = 1
+MANIFEST = 'manifest.json'
+COLUMNS = (
+    ('order_id', '<i8'),
+    ('product_id', '<i4'),
+    ('quantity', '<i4'),
+    ('price_cents', '<i8'),  # unit price at the time of the order
+    ('created_at', '<i8'),   # Unix seconds, UTC
+)
+BUILD_PARTITION_SIZE = 50000
+SETTLE_HOURS = 24  # open tickets older than this stop holding the export back
+EPOCH = datetime(1970, 1, 1)
+DAY = 86400
+
+
+def _np():
+    np = pricing._numpy()
+    if np is None:
+        raise RuntimeError("The order snapshot needs NumPy (pip install numpy)")
+    return np
+
+
+def default_directory():
+    return current_app.config.get('SNAPSHOT_DIR') or os.path.join(current_app.instance_path, 'snapshot')
+
+
+def _epoch(moment):
+    return int((moment - EPOCH).total_seconds())
+
+
+# --- BUILD ---
+def _empty_manifest():
+    return {"version": FORMAT_VERSION, "rows": 0, "last_order_id": 0, "built_at": None,
+            "columns": dict(COLUMNS)}
+
+
+def read_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return _empty_manifest()
+    if manifest.get("version") != FORMAT_VERSION:
+        raise RuntimeError(f"{directory} holds a snapshot in another format; rebuild it with --full")
+    return manifest
+
+
+def _write_manifest(directory, manifest):
+    # Written last and swapped in atomically: a build that dies half way
+    # leaves the previous manifest, and the next build cuts the files back.
+    path = os.path.join(directory, MANIFEST)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + '.tmp', path)
+
+
+def _settled_upto(stale_before):
+    """Highest order id below which no order is expected to change any more.
+
+    Tickets still open since before ``stale_before`` are not waited for.
+    """
+    oldest_open = db.session.query(func.min(Order.id)).filter(
+        Order.status.in_(order_status.ACTIVE), Order.created_at >= stale_before,
+    ).scalar()
+    if oldest_open is not None:
+        return oldest_open - 1
+    return db.session.query(func.coalesce(func.max(Order.id), 0)).scalar()
+
+
+def _lag(after, upto, stale_before):
+    """How the export stands against the live tables, for the build report."""
+    open_ = Order.status.in_(order_status.ACTIVE)
+    behind, oldest_behind = db.session.query(func.count(Order.id), func.min(Order.created_at)) \
+        .filter(Order.id > upto).one()
+    stale = db.session.query(func.count(Order.id)).filter(
+        open_, Order.created_at < stale_before, Order.id > after, Order.id <= upto,
+    ).scalar()
+    return {
+        "orders_behind": behind,  # placed but not exported yet
+        "behind_since": oldest_behind.isoformat() if oldest_behind else None,
+        "stale_open_exported": stale,  # open past settle_hours, exported as placed
+    }
+
+
+def build(directory, full=False, partition_size=BUILD_PARTITION_SIZE, settle_hours=SETTLE_HOURS):
+    """Append the lines of orders settled since the last build; return a report dict."""
+    np = _np()
+    started = time.perf_counter()
+    os.makedirs(directory, exist_ok=True)
+    # A full build starts over, whatever format the old files are in.
+    manifest = _empty_manifest() if full else read_manifest(directory)
+    rows, after = manifest["rows"], manifest["last_order_id"]
+    stale_before = datetime.utcnow() - timedelta(hours=settle_hours)
+    upto = max(_settled_upto(stale_before), after)
+    lag = _lag(after, upto, stale_before)
+
+    lines = (
+        select(OrderItem.order_id, OrderItem.product_id, OrderItem.quantity, OrderItem.price_cents, Order.created_at)
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(OrderItem.order_id > after, OrderItem.order_id <= upto,
+               Order.status.is_distinct_from(order_status.CANCELED))
+        .order_by(OrderItem.order_id, OrderItem.id)
+    )
+    files = {}
+    added = 0
+    try:
+        for name, dtype in COLUMNS:
+            f = files[name] = open(os.path.join(directory, name + '.bin'), 'a+b')
+            f.truncate(rows * np.dtype(dtype).itemsize)
+        for chunk in db.session.execute(lines.execution_options(yield_per=partition_size)).partitions():
+            columns = dict(zip((name for name, _ in COLUMNS), zip(*chunk)))
+            columns['created_at'] = np.asarray(columns['created_at'], dtype='datetime64[s]')
+            for name, dtype in COLUMNS:
+                files[name].write(np.asarray(columns[name]).astype(dtype).tobytes())
+            added += len(chunk)
+        for f in files.values():
+            f.flush()
+            os.fsync(f.fileno())
+    finally:
+        for f in files.values():
+            f.close()
+        db.session.rollback()
+
+    manifest.update(rows=rows + added, last_order_id=upto, built_at=datetime.utcnow().isoformat(),
+                    columns=dict(COLUMNS))
+    _write_manifest(directory, manifest)
+    return {
+        "rows_added": added,
+        "rows": manifest["rows"],
+        "last_order_id": upto,
+        **lag,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+# --- READ ---
+class Snapshot:
+    """Read-only columns of a built snapshot, one NumPy array per name in ``COLUMNS``."""
+
+    def __init__(self, directory):
+        np = _np()
+        manifest = read_manifest(directory)
+        self.directory = directory
+        self.rows = manifest["rows"]
+        self.last_order_id = manifest["last_order_id"]
+        self.built_at = manifest["built_at"]
+        for name, dtype in COLUMNS:
+            if self.rows:
+                column = np.memmap(os.path.join(directory, name + '.bin'), dtype=dtype, mode='r', shape=(self.rows,))
+            else:
+                column = np.zeros(0, dtype=dtype)  # memmap refuses empty files
+            setattr(self, name, column)
+
+    def window(self, begin=None, end=None):
+        """Row mask for lines placed in ``[begin, end)``, or None for all rows."""
+        if begin is None and end is None:
+            return None
+        mask = _np().ones(self.rows, dtype=bool)
+        if begin is not None:
+            mask &= self.created_at >= _epoch(begin)
+        if end is not None:
+            mask &= self.created_at < _epoch(end)
+        return mask
+
+
+def load(directory):
+    return Snapshot(directory)
+
+
+def _select(columns, mask):
+    return columns if mask is None else [column[mask] for column in columns]
+
+
+def _order_starts(order_ids):
+    """True on the first row of every order (rows of an order are adjacent)."""
+    np = _np()
+    starts = np.ones(len(order_ids), dtype=bool)
+    starts[1:] = order_ids[1:] != order_ids[:-1]
+    return starts
+
+
+# --- ANALYSES ---
+def top_pairs(snapshot, limit=20, begin=None, end=None):
+    """Product pairs bought together most often, with support and lift.
+
+    Baskets are sorted by product once; pairing each row with the one ``d``
+    rows further on in the same basket, for ``d`` up to the largest basket,
+    then yields every pair exactly once as ``(smaller id, larger id)``.
+    """
+    np = _np()
+    order_ids, product_ids = _select([snapshot.order_id, snapshot.product_id], snapshot.window(begin, end))
+    order = np.lexsort((product_ids, order_ids))
+    order_ids, product_ids = order_ids[order], product_ids[order].astype(np.int64)
+    # A product repeated on several lines counts once per basket.
+    distinct = _order_starts(order_ids)
+    distinct[1:] |= product_ids[1:] != product_ids[:-1]
+    order_ids, product_ids = order_ids[distinct], product_ids[distinct]
+
+    baskets = int(np.count_nonzero(_order_starts(order_ids)))
+    if not baskets:
+        return {"orders": 0, "pairs": []}
+    stride = int(product_ids.max()) + 1
+    keys = []
+    for d in range(1, len(order_ids)):
+        same = order_ids[d:] == order_ids[:-d]
+        if not same.any():
+            break  # no basket has more than d products
+        keys.append(product_ids[:-d][same] * stride + product_ids[d:][same])
+    if not keys:
+        return {"orders": baskets, "pairs": []}
+
+    pairs, counts = np.unique(np.concatenate(keys), return_counts=True)
+    with_product = np.bincount(product_ids, minlength=stride)
+    top = np.lexsort((pairs, -counts))[:limit]
+    result = []
+    for pair, count in zip(pairs[top].tolist(), counts[top].tolist()):
+        a, b = divmod(pair, stride)
+        result.append({
+            "product_ids": [a, b],
+            "orders": count,
+            "support": round(count / baskets, 6),
+            "lift": round(count * baskets / (int(with_product[a]) * int(with_product[b])), 4),
+        })
+    return {"orders": baskets, "pairs": result}
+
+
+def hourly_demand(snapshot, begin=None, end=None, product_id=None, utc_offset_minutes=0):
+    """Orders, units and revenue per hour of day, plus units per weekday and hour.
+
+    Hours are shifted by ``utc_offset_minutes`` to the store's local time;
+    weekdays run Monday (0) to Sunday (6).
+    """
+    np = _np()
+    mask = snapshot.window(begin, end)
+    if product_id is not None:
+        matches = snapshot.product_id == product_id
+        mask = matches if mask is None else mask & matches
+    order_ids, quantities, prices, created = _select(
+        [snapshot.order_id, snapshot.quantity, snapshot.price_cents, snapshot.created_at], mask)
+
+    local = created + utc_offset_minutes * 60
+    slot = (local // DAY + 3) % 7 * 24 + local // 3600 % 24  # 1970-01-01 was a Thursday
+    units = np.bincount(slot, weights=quantities, minlength=7 * 24).round().astype(np.int64).reshape(7, 24)
+    revenue = np.bincount(slot, weights=quantities * prices, minlength=7 * 24).round().astype(np.int64)
+    orders = np.bincount(slot[_order_starts(order_ids)], minlength=7 * 24).reshape(7, 24)
+
+    revenue = revenue.reshape(7, 24).sum(axis=0)
+    return {
+        "by_hour": [
+            {"hour": hour, "orders": int(o), "units": int(u), "revenue": pricing.to_dollars(int(r))}
+            for hour, (o, u, r) in enumerate(zip(orders.sum(axis=0), units.sum(axis=0), revenue))
+        ],
+        "units_by_weekday_hour": units.tolist(),
+    }
+
+
+def product_velocity(snapshot, days=28, now=None, limit=None):
+    """Units sold per day by product over the last ``days``, fastest first.
+
+    ``trend`` compares with the ``days`` before that (None when the product
+    did not sell then); products that stopped selling show up with 0 units.
+    """
+    np = _np()
+    now = _epoch(now or datetime.utcnow())
+    span = days * DAY
+    created, product_ids, quantities = snapshot.created_at, snapshot.product_id, snapshot.quantity
+    if not snapshot.rows:
+        return []
+    recent = (created > now - span) & (created <= now)
+    prior = (created > now - 2 * span) & (created <= now - span)
+
+    size = int(product_ids.max()) + 1
+    units = np.bincount(product_ids[recent], weights=quantities[recent], minlength=size).round().astype(np.int64)
+    revenue = np.bincount(
+        product_ids[recent], weights=quantities[recent] * snapshot.price_cents[recent], minlength=size,
+    ).round().astype(np.int64)
+    before = np.bincount(product_ids[prior], weights=quantities[prior], minlength=size).round().astype(np.int64)
+
+    ids = np.flatnonzero(units | before)
+    ids = ids[np.lexsort((ids, -units[ids]))][:limit]
+    return [
+        {
+            "product_id": int(pid),
+            "units": int(units[pid]),
+            "per_day": round(int(units[pid]) / days, 2),
+            "revenue": pricing.to_dollars(int(revenue[pid])),
+            "previous_units": int(before[pid]),
+            "trend": round((int(units[pid]) - int(before[pid])) / int(before[pid]), 4) if before[pid] else None,
+        }
+        for pid in ids
+    ]
+
+
+# --- CLI ---
+snapshot_cli = AppGroup('snapshot', help="Columnar order history for analytics.")
+directory_option = click.option('--dir', 'directory', type=click.Path(file_okay=False), default=None,
+                                help="Snapshot directory; SNAPSHOT_DIR or instance/snapshot by default.")
+json_option = click.option('--json', 'as_json', is_flag=True, help="Print the full result as JSON.")
+
+
+def _names():
+    return {pid: product.name for pid, product in catalog.get_catalog().by_id.items()}
+
+
+def _timed(function, *args, **kwargs):
+    started = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+@snapshot_cli.command('build')
+@directory_option
+@click.option('--full', is_flag=True, help="Start over instead of appending.")
+def build_command(directory, full):
+    """Export orders settled since the last build."""
+    settle_hours = current_app.config.get('SNAPSHOT_SETTLE_HOURS', SETTLE_HOURS)
+    report = build(directory or default_directory(), full, settle_hours=settle_hours)
+    click.echo(f"{report['rows_added']} lines added, {report['rows']} in total, "
+               f"up to order {report['last_order_id']} in {report['seconds']}s")
+    if report['orders_behind']:
+        click.echo(f"{report['orders_behind']} newer orders wait for open tickets, "
+                   f"the oldest placed {report['behind_since']}")
+    if report['stale_open_exported']:
+        click.echo(f"{report['stale_open_exported']} tickets open for over {settle_hours:g}h were exported as placed", err=True)
+
+
+@snapshot_cli.command('pairs')
+@directory_option
+@json_option
+@click.option('--limit', type=int, default=20, show_default=True)
+@click.option('--from', 'begin', type=click.DateTime(), default=None)
+@click.option('--to', 'end', type=click.DateTime(), default=None)
+def pairs_command(directory, as_json, limit, begin, end):
+    """Products most often bought together."""
+    result, seconds = _timed(top_pairs, load(directory or default_directory()), limit, begin, end)
+    if as_json:
+        click.echo(json.dumps(result, indent=2))
+        return
+    names = _names()
+    click.echo(f"{result['orders']} orders, {seconds:.2f}s")
+    for pair in result['pairs']:
+        a, b = (names.get(pid, f"#{pid}") for pid in pair['product_ids'])
+        click.echo(f"{pair['orders']:>8}  lift {pair['lift']:>7.2f}  {a} + {b}")
+
+
+@snapshot_cli.command('hourly')
+@directory_option
+@json_option
+@click.option('--product', 'product_id', type=int, default=None, help="Only this product.")
+@click.option('--from', 'begin', type=click.DateTime(), default=None)
+@click.option('--to', 'end', type=click.DateTime(), default=None)
+@click.option('--utc-offset', type=int, default=0, show_default=True, help="Store time zone, in minutes.")
+def hourly_command(directory, as_json, product_id, begin, end, utc_offset):
+    """Demand per hour of the day."""
+    result, seconds = _timed(hourly_demand, load(directory or default_directory()), begin, end, product_id, utc_offset)
+    if as_json:
+        click.echo(json.dumps(result, indent=2))
+        return
+    click.echo(f"hour   orders    units    revenue  ({seconds:.2f}s)")
+    for row in result['by_hour']:
+        click.echo(f"{row['hour']:>4} {row['orders']:>8} {row['units']:>8} {row['revenue']:>10.2f}")
+
+
+@snapshot_cli.command('velocity')
+@directory_option
+@json_option
+@click.option('--days', type=int, default=28, show_default=True)
+@click.option('--limit', type=int, default=20, show_default=True)
+def velocity_command(directory, as_json, days, limit):
+    """Fastest-selling products over the last days."""
+    result, seconds = _timed(product_velocity, load(directory or default_directory()), days, limit=limit)
+    if as_json:
+        click.echo(json.dumps(result, indent=2))
+        return
+    names = _names()
+    click.echo(f"units/day    units   trend  product  ({seconds:.2f}s)")
+    for row in result:
+        trend = f"{row['trend']:+.0%}" if row['trend'] is not None else 'new'
+        click.echo(f"{row['per_day']:>9.2f} {row['units']:>8} {trend:>7}  {names.get(row['product_id'], row['product_id'])}")
@@ -0,0 +1,203 @@
+"""Order lifecycle and the make-line queue.
+
+    pending -> in_progress -> ready -> completed
+    pending | in_progress | ready -> canceled
+
+Each move is one guarded ``UPDATE ... WHERE status IN (<allowed from>)``,
+so two screens bumping the same ticket cannot both win, and it stamps the
+matching ``*_at`` column. Canceling also puts the stock back, reverses the
+order's loyalty points (earned and redeemed, see loyalty.py) and removes the
+sale from the reporting rollups, all in the same transaction. Either may
+still be queued as jobs for a fresh order (see jobs.py); those jobs skip or
+offset canceled orders, so the outcome does not depend on which runs first.
+
+The queue only ever reads active tickets through ``ix_order_status_created``
+(status, created_at), so its cost follows the number of open tickets, not
+the millions of completed orders behind them.
+"""
+import time
+from datetime import datetime
+
+from sqlalchemy import case, update
+
+from models import db, Order, OrderItem, Product
+from order_engine import OrderError, total_quantities
+import catalog
+import customer_directory
+import events
+import loyalty
+import pricing
+import reports
+import versions
+
+PENDING = 'pending'
+IN_PROGRESS = 'in_progress'
+READY = 'ready'
+COMPLETED = 'completed'
+CANCELED = 'canceled'
+
+ACTIVE = (PENDING, IN_PROGRESS, READY)
+STATUSES = ACTIVE + (COMPLETED, CANCELED)
+
+# target status -> statuses it may be reached from
+ALLOWED_FROM = {
+    IN_PROGRESS: (PENDING,),
+    READY: (IN_PROGRESS,),
+    COMPLETED: (READY,),
+    CANCELED: ACTIVE,
+}
+TIMESTAMPS = {
+    IN_PROGRESS: 'started_at',
+    READY: 'ready_at',
+    COMPLETED: 'completed_at',
+    CANCELED: 'canceled_at',
+}
+
+QUEUE_LIMIT = 200
+QUEUE_WAIT_MAX = 30
+
+
+# --- TRANSITIONS ---
+def transition(order_id, status, now=None):
+    """Move an order to ``status`` and return its new queue row, or raise OrderError."""
+    if status not in ALLOWED_FROM:
+        raise OrderError(f"Unknown status '{status}'")
+    now = now or datetime.utcnow()
+    quantities = {}
+    try:
+        result = db.session.execute(
+            update(Order)
+            .where(Order.id == order_id, Order.status.in_(ALLOWED_FROM[status]))
+            .values({Order.status: status, getattr(Order, TIMESTAMPS[status]): now})
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            current = db.session.query(Order.status).filter(Order.id == order_id).scalar()
+            db.session.rollback()
+            if current is None:
+                raise OrderError("Order not found", 404)
+            raise OrderError(f"Cannot move order {order_id} from {current} to {status}", 409)
+        if status == CANCELED:
+            quantities = _undo_order(order_id, now)
+        row = queue_rows([order_id])[0]
+        db.session.commit()
+    except OrderError:
+        raise
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if status == CANCELED:
+        customer_directory.lookup_cache.clear()
+    events.publish(events.STATUS, {"id": order_id, "status": status, "at": now.isoformat()})
+    if quantities:
+        events.publish_stock(quantities)
+    return row
+
+
+def _undo_order(order_id, now):
+    """Reverse a sale inside the cancel transaction; return the restored quantities."""
+    order = (
+        db.session.query(Order.customer_id, Order.created_at)
+        .filter(Order.id == order_id)
+        .one()
+    )
+    lines = (
+        db.session.query(OrderItem.product_id, Product.category, OrderItem.quantity, OrderItem.price_cents)
+        .join(Product, Product.id == OrderItem.product_id)
+        .filter(OrderItem.order_id == order_id)
+        .all()
+    )
+    quantities = total_quantities((pid, qty) for pid, _, qty, _ in lines)
+    if quantities:
+        qty = case(quantities, value=Product.id)
+        db.session.execute(
+            update(Product)
+            .where(Product.id.in_(list(quantities)))
+            .values(stock=Product.stock + qty)
+            .execution_options(synchronize_session=False)
+        )
+        catalog.invalidate()
+    reports.record_sales(
+        ((order_id, order.created_at, pid, category, qty, price) for pid, category, qty, price in lines),
+        sign=-1,
+    )
+
+    if loyalty.reverse_order(order.customer_id, order_id, now):
+        versions.bump(versions.CUSTOMERS)
+    return quantities
+
+
+# --- QUEUE ---
+def queue_rows(order_ids):
+    """Queue rows (with items) for ``order_ids``, in the given order."""
+    if not order_ids:
+        return []
+    orders = {
+        o.id: o for o in db.session.query(
+            Order.id, Order.customer_id, Order.status, Order.created_at,
+            Order.started_at, Order.ready_at, Order.total_cents,
+        ).filter(Order.id.in_(order_ids))
+    }
+    items = {}
+    for order_id, product_id, quantity in (
+        db.session.query(OrderItem.order_id, OrderItem.product_id, OrderItem.quantity)
+        .filter(OrderItem.order_id.in_(order_ids))
+        .order_by(OrderItem.id)
+    ):
+        items.setdefault(order_id, []).append((product_id, quantity))
+
+    products = catalog.get_catalog().by_id
+    rows = []
+    for order_id in order_ids:
+        o = orders.get(order_id)
+        if o is None:
+            continue
+        rows.append({
+            "id": o.id,
+            "customer_id": o.customer_id,
+            "status": o.status,
+            "created_at": o.created_at.isoformat() if o.created_at else None,
+            "started_at": o.started_at.isoformat() if o.started_at else None,
+            "ready_at": o.ready_at.isoformat() if o.ready_at else None,
+            "total": pricing.to_dollars(o.total_cents),
+            "items": [
+                {"product_id": pid, "product": products[pid].name if pid in products else None, "qty": qty}
+                for pid, qty in items.get(order_id, [])
+            ],
+        })
+    return rows
+
+
+def active_queue(statuses=ACTIVE, limit=QUEUE_LIMIT):
+    """Open tickets, oldest first."""
+    ids = [
+        order_id for (order_id,) in
+        db.session.query(Order.id)
+        .filter(Order.status.in_(statuses))
+        .order_by(Order.created_at, Order.id)
+        .limit(limit)
+    ]
+    return queue_rows(ids)
+
+
+def wait_for_change(since, timeout):
+    """Block until an order is placed or moves after event ``since``, or ``timeout`` passes.
+
+    Events already published after ``since`` return at once, so a poller
+    that passes back the cursor of its last answer never misses a change.
+    """
+    subscription = events.broker.subscribe(since)
+    if subscription is None:
+        return  # this worker is out of streams; answer right away
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            event = subscription.pop(remaining)
+            if event is None or event.type in (events.ORDER, events.STATUS, events.RELOAD):
+                return
+    finally:
+        events.broker.unsubscribe(subscription)
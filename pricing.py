@@ -0,0 +1,91 @@
+"""Exact money math on integer cents.
+
+Prices and totals are stored as integer cents. Single tickets are priced in
+one pure-Python pass; bulk and report paths use NumPy int64 arrays when NumPy
+is installed and fall back to the same integer arithmetic otherwise.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+CENTS_PER_DOLLAR = 100
+# Loyalty: 1 point per whole dollar spent.
+CENTS_PER_POINT = 100
+# Redeemed at checkout, a point is worth one cent.
+POINT_VALUE_CENTS = 1
+
+
+def to_cents(amount):
+    """Convert a dollar amount (float, str or Decimal) to integer cents, rounding half up."""
+    if amount is None:
+        return None
+    return int((Decimal(str(amount)) * CENTS_PER_DOLLAR).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def to_dollars(cents):
+    """Dollar value of ``cents`` for display and JSON."""
+    if cents is None:
+        return None
+    return cents / CENTS_PER_DOLLAR
+
+
+def format_cents(cents):
+    """Exact decimal string of ``cents`` in dollars, e.g. 1205 -> '12.05'."""
+    sign = '-' if cents < 0 else ''
+    return f"{sign}{abs(cents) // CENTS_PER_DOLLAR}.{abs(cents) % CENTS_PER_DOLLAR:02d}"
+
+
+def loyalty_points(total_cents):
+    return total_cents // CENTS_PER_POINT
+
+
+def points_value(points):
+    """Discount in cents for redeeming ``points``."""
+    return points * POINT_VALUE_CENTS
+
+
+def price_order(lines, prices):
+    """Price a ticket in one pass.
+
+    ``lines`` are ``(product_id, quantity)`` pairs and ``prices`` maps product
+    ids to unit prices in cents. Returns ``(line_totals, total_cents, points)``.
+    """
+    line_totals = [prices[product_id] * quantity for product_id, quantity in lines]
+    total_cents = sum(line_totals)
+    return line_totals, total_cents, loyalty_points(total_cents)
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:  # optional dependency
+        return None
+    return numpy
+
+
+def bulk_line_totals(prices, quantities):
+    """Element-wise ``price * quantity`` for many lines, as a list of ints."""
+    np = _numpy()
+    if np is None:
+        return [p * q for p, q in zip(prices, quantities)]
+    return (np.asarray(prices, dtype=np.int64) * np.asarray(quantities, dtype=np.int64)).tolist()
+
+
+def bulk_order_totals(order_index, prices, quantities, order_count):
+    """Sum line totals into ``order_count`` orders.
+
+    ``order_index[i]`` is the position (0..order_count-1) of the order line
+    ``i`` belongs to. Returns ``(totals, points)`` as lists of ints.
+    """
+    np = _numpy()
+    if np is None:
+        totals = [0] * order_count
+        for index, price, quantity in zip(order_index, prices, quantities):
+            totals[index] += price * quantity
+        return totals, [loyalty_points(t) for t in totals]
+
+    totals = np.zeros(order_count, dtype=np.int64)
+    np.add.at(
+        totals,
+        np.asarray(order_index, dtype=np.intp),
+        np.asarray(prices, dtype=np.int64) * np.asarray(quantities, dtype=np.int64),
+    )
+    return totals.tolist(), (totals // CENTS_PER_POINT).tolist()
@@ -0,0 +1,324 @@
+"""Bulk product import: CSV or JSON in, batched upserts on ``product.name``.
+
+Rows are read lazily from the uploaded file, validated ``chunk_size`` at a
+time and written with one ``INSERT ... ON CONFLICT(name) DO UPDATE`` per
+chunk, each chunk in its own transaction. Bad rows are reported with their
+line number and skipped; they never abort the rest of the import. A chunk
+the database still rejects is retried row by row to single out the culprit.
+
+Only the columns present in a row are updated on conflict, so a price-only
+file leaves stock and images alone. New products take the model defaults
+for missing columns. A changed ``image_url`` drops the cached thumbnail,
+and new images are queued for caching once the import is done.
+"""
+import csv
+import io
+import itertools
+import json
+import time
+from datetime import datetime
+from decimal import InvalidOperation
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import case
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import OperationalError
+
+from models import db, Product
+from pricing import to_cents
+import catalog
+import events
+import images
+
+IMPORT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+MAX_INTEGER = 2 ** 63 - 1  # the most an INTEGER column holds
+
+
+class RowError(ValueError):
+    pass
+
+
+# --- READERS ---
+def _text(stream):
+    if isinstance(stream, io.TextIOBase):
+        return stream
+    if not isinstance(stream, io.BufferedIOBase):
+        stream = io.BufferedReader(stream)
+    return io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+
+def read_csv(stream):
+    """Yield ``(line, row)`` pairs from a CSV file with a header row."""
+    reader = csv.DictReader(_text(stream))
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_json(stream):
+    """Yield ``(line, row)`` pairs from NDJSON, or from a JSON array.
+
+    NDJSON is read line by line; a JSON array has to be parsed whole, so
+    prefer NDJSON (or CSV) for very large catalogs.
+    """
+    text = _text(stream)
+    first = text.readline()
+    if first.lstrip().startswith('['):
+        try:
+            rows = json.loads(first + text.read())
+        except ValueError as e:
+            raise RowError(f"Invalid JSON: {e}")
+        if not isinstance(rows, list):
+            raise RowError("Expected a JSON array of products")
+        yield from enumerate(rows, start=1)
+        return
+    for line_no, line in enumerate(itertools.chain([first], text), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = RowError("Invalid JSON")
+        yield line_no, row
+
+
+READERS = {'csv': read_csv, 'json': read_json}
+
+
+# --- VALIDATION ---
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _in_range(values, column, label):
+    if values[column] < 0:
+        raise RowError(f"{label} cannot be negative")
+    if values[column] > MAX_INTEGER:
+        raise RowError(f"{label} is too large")
+
+
+def validate(row):
+    """Turn one raw row into Product column values, or raise RowError."""
+    if isinstance(row, RowError):
+        raise row
+    if not isinstance(row, dict):
+        raise RowError("Expected an object with product fields")
+
+    values = {}
+    name = row.get('name')
+    if _blank(name):
+        raise RowError("name is required")
+    values['name'] = str(name).strip()
+    if len(values['name']) > 100:
+        raise RowError("name is longer than 100 characters")
+
+    if not _blank(row.get('category')):
+        values['category'] = str(row['category']).strip()[:50]
+
+    if not _blank(row.get('price')):
+        try:
+            values['price_cents'] = to_cents(str(row['price']).strip().lstrip('$'))
+        except (InvalidOperation, ValueError):
+            raise RowError(f"invalid price '{row['price']}'")
+        _in_range(values, 'price_cents', 'price')
+
+    if not _blank(row.get('stock')):
+        try:
+            values['stock'] = int(str(row['stock']).strip())
+        except ValueError:
+            raise RowError(f"invalid stock '{row['stock']}'")
+        _in_range(values, 'stock', 'stock')
+
+    if not _blank(row.get('reorder_threshold')):
+        try:
+            values['reorder_threshold'] = int(str(row['reorder_threshold']).strip())
+        except ValueError:
+            raise RowError(f"invalid reorder_threshold '{row['reorder_threshold']}'")
+        _in_range(values, 'reorder_threshold', 'reorder_threshold')
+
+    if not _blank(row.get('image_url')):
+        values['image_url'] = str(row['image_url']).strip()
+
+    if not _blank(row.get('last_restocked')):
+        try:
+            values['last_restocked'] = datetime.fromisoformat(str(row['last_restocked']).strip())
+        except ValueError:
+            raise RowError(f"invalid last_restocked '{row['last_restocked']}'")
+
+    return values
+
+
+# --- WRITING ---
+def _insert_values(values, now):
+    """Fill model defaults for columns a new product would need."""
+    return {
+        'category': 'General',
+        'stock': 0,
+        'reorder_threshold': 0,
+        'image_url': '',
+        'last_restocked': now,
+        **values,
+    }
+
+
+def _upsert(rows, overwrite=True):
+    """One INSERT ... ON CONFLICT(name) DO UPDATE per set of provided columns.
+
+    Without ``overwrite`` existing products are left untouched (DO NOTHING).
+    """
+    dialect = db.session.get_bind().dialect.name
+    insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+    table = Product.__table__
+    now = datetime.utcnow()
+
+    groups = {}
+    for values in rows:
+        groups.setdefault(frozenset(values), []).append(values)
+    for provided, group in groups.items():
+        stmt = insert(table)
+        updates = {c: stmt.excluded[c] for c in provided if c != 'name'}
+        if 'image_url' in provided:
+            updates['image_hash'] = case(
+                (table.c.image_url == stmt.excluded.image_url, table.c.image_hash), else_=None)
+        stmt = stmt.on_conflict_do_update(index_elements=['name'], set_=updates) if updates and overwrite \
+            else stmt.on_conflict_do_nothing(index_elements=['name'])
+        db.session.execute(stmt, [_insert_values(values, now) for values in group])
+
+
+def _write_chunk(rows, report, overwrite=True):
+    # Later rows in the same file win over earlier ones with the same name.
+    by_name = {values['name']: values for values in rows}
+    existing = {
+        name for (name,) in db.session.query(Product.name).filter(Product.name.in_(list(by_name)))
+    }
+    missing_price = [name for name in by_name if name not in existing and 'price_cents' not in by_name[name]]
+    for name in missing_price:
+        report.error(by_name.pop(name)['_line'], "price is required for new products")
+    lines = {name: values.pop('_line') for name, values in by_name.items()}
+    if not by_name:
+        return
+    try:
+        _upsert(list(by_name.values()), overwrite)
+        catalog.invalidate()
+        db.session.commit()
+        written = list(by_name)
+    except OperationalError:
+        db.session.rollback()
+        raise
+    except Exception:
+        db.session.rollback()
+        # Find the offending row(s): write this chunk one row at a time.
+        written = []
+        for name, values in by_name.items():
+            try:
+                _upsert([values], overwrite)
+                catalog.invalidate()
+                db.session.commit()
+                written.append(name)
+            except OperationalError:
+                db.session.rollback()
+                raise
+            except Exception as e:
+                db.session.rollback()
+                report.error(lines[name], f"could not be saved: {type(e).__name__}")
+    report.inserted += sum(1 for name in written if name not in existing)
+    if overwrite:
+        report.updated += sum(1 for name in written if name in existing)
+    else:
+        report.skipped += sum(1 for name in written if name in existing)
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.skipped = 0  # existing products left alone by an insert-only import
+        self.failed = 0
+        self.errors = []
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+
+    def error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+            "seconds": round(self.seconds, 3),
+            "rows_per_second": round(self.rows / self.seconds) if self.seconds else None,
+        }
+
+
+def import_rows(rows, chunk_size=IMPORT_CHUNK_SIZE, overwrite=True):
+    """Validate and upsert ``(line, row)`` pairs; return an ImportReport.
+
+    With ``overwrite=False`` only new products are inserted.
+    """
+    report = ImportReport()
+    chunk = []
+    try:
+        for line, row in rows:
+            report.rows += 1
+            try:
+                values = validate(row)
+            except RowError as e:
+                report.error(line, str(e))
+                continue
+            values['_line'] = line
+            chunk.append(values)
+            if len(chunk) >= chunk_size:
+                _write_chunk(chunk, report, overwrite)
+                chunk = []
+    except RowError as e:
+        # The file itself is unreadable past this point.
+        report.error(None, str(e))
+    except UnicodeDecodeError:
+        report.error(None, 'File is not UTF-8 text; save it as UTF-8 ("CSV UTF-8" in Excel) and import again')
+    except csv.Error as e:
+        report.error(None, f"Malformed CSV: {e}")
+    if chunk:
+        _write_chunk(chunk, report, overwrite)
+
+    report.seconds = time.perf_counter() - report.started
+    if report.inserted or report.updated:
+        # Too many changes to patch in place; live pages just refetch.
+        events.publish(events.RELOAD, {})
+        images.pipeline.queue_missing()
+    return report
+
+
+def import_file(stream, fmt, chunk_size=IMPORT_CHUNK_SIZE):
+    return import_rows(READERS[fmt](stream), chunk_size)
+
+
+# --- CLI ---
+products_cli = AppGroup('products', help="Product catalog maintenance.")
+
+
+@products_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(sorted(READERS)), default=None,
+              help="File format; guessed from the extension by default.")
+@click.option('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE, show_default=True)
+def import_command(path, fmt, chunk_size):
+    """Upsert products from a CSV or JSON/NDJSON file."""
+    fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'json')
+    with open(path, 'rb') as stream:
+        report = import_file(stream, fmt, chunk_size).as_dict()
+    for error in report['errors']:
+        click.echo(f"line {error['line']}: {error['error']}", err=True)
+    click.echo(
+        f"{report['rows']} rows: {report['inserted']} inserted, {report['updated']} updated, "
+        f"{report['failed']} failed in {report['seconds']}s ({report['rows_per_second']} rows/s)"
+    )
@@ -0,0 +1,91 @@
+"""Low-stock alerts and reorder suggestions.
+
+A product is low once ``stock <= reorder_threshold``. The partial index
+``ix_product_low_stock`` holds exactly those rows, so listing or counting
+them costs the number of low products, not the size of the catalog.
+
+Sales velocity comes from the ``product_sales_daily`` rollup: units sold
+over the last ``VELOCITY_DAYS`` days, per day. The rollup is written by the
+``reports.sales`` job (see jobs.py), not by the order path, so it trails the
+orders by the queue backlog; ``velocity_lag`` says how far. Stock and the
+low flag are always current. Delivery is at least once, and the job counts
+an order exactly once only because it removes itself from the queue in the
+same transaction as its rollup upsert.
+"""
+import math
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from models import db, Product, ProductSalesDaily
+import jobs
+import reports
+
+VELOCITY_DAYS = 14
+# Suggested orders restock enough to cover this many days of sales.
+COVER_DAYS = 7
+
+
+def low_stock_count():
+    return db.session.query(func.count(Product.id)).filter(Product.is_low).scalar()
+
+
+def sales_velocity(product_ids, days=VELOCITY_DAYS, today=None):
+    """Average units sold per day over the last ``days`` days, by product id."""
+    if not product_ids:
+        return {}
+    today = today or datetime.utcnow().date()
+    rows = (
+        db.session.query(ProductSalesDaily.product_id, func.sum(ProductSalesDaily.units))
+        .filter(
+            ProductSalesDaily.day > today - timedelta(days=days),
+            ProductSalesDaily.product_id.in_(list(product_ids)),
+        )
+        .group_by(ProductSalesDaily.product_id)
+        .all()
+    )
+    return {product_id: units / days for product_id, units in rows}
+
+
+def velocity_lag():
+    """Orders placed but not yet in the velocity figures, and since when."""
+    orders, since = jobs.backlog(reports.SALES_JOB)
+    return {"orders": orders, "since": since.isoformat() if since else None}
+
+
+def suggested_order(stock, threshold, velocity):
+    """Units to order to get back above ``threshold`` with COVER_DAYS of sales in hand."""
+    return max(math.ceil(velocity * COVER_DAYS) + threshold + 1 - stock, 0)
+
+
+def alerts(limit=None):
+    """Low products, most urgent (fewest days of cover) first."""
+    query = (
+        db.session.query(Product.id, Product.name, Product.category, Product.stock, Product.reorder_threshold)
+        .filter(Product.is_low)
+    )
+    if limit:
+        # Most depleted first, so a limit keeps the worst cases.
+        query = query.order_by(Product.stock).limit(limit)
+    rows = query.all()
+    velocity = sales_velocity([row.id for row in rows])
+
+    result = []
+    for product_id, name, category, stock, threshold in rows:
+        rate = velocity.get(product_id, 0.0)
+        result.append({
+            "id": product_id,
+            "name": name,
+            "category": category,
+            "stock": stock,
+            "reorder_threshold": threshold,
+            "velocity_per_day": round(rate, 2),
+            "days_of_cover": round(max(stock, 0) / rate, 1) if rate else None,
+            "suggested_order": suggested_order(stock, threshold, rate),
+        })
+    # Sold-out products with no recent sales are as urgent as any other.
+    result.sort(key=lambda a: (
+        a["days_of_cover"] if a["days_of_cover"] is not None else (0 if a["stock"] <= 0 else math.inf),
+        a["stock"],
+    ))
+    return result
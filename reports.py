@@ -0,0 +1,414 @@
+"""Sales reporting on incrementally maintained rollup tables.
+
+Placing an order queues a ``reports.sales`` job (see jobs.py) whose
+``record_sales`` call folds the new lines into three rollups: revenue per
+hour, units/revenue per product per day and units/revenue per category per
+day. The ``/reports/*`` endpoints only read those tables, so a month-range
+query scans buckets, never order lines. ``rebuild_rollups`` recomputes them
+from the raw tables (backfills, repairs).
+
+The shift (Z) report is the exception: closing a register needs exact
+totals for an arbitrary window, not whole hours or days, so ``shift_report``
+streams that window's order lines once (``ix_order_created``) through a
+generator that folds them into every total as they arrive.
+"""
+import json
+from datetime import datetime, time, timedelta
+from itertools import groupby
+from operator import itemgetter
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import (
+    db, Order, OrderItem, Product, SalesHourly, ProductSalesDaily, CategorySalesDaily,
+)
+from pricing import bulk_line_totals, to_dollars
+import jobs
+
+SALES_JOB = 'reports.sales'  # payload {"order_id"}
+
+DEFAULT_RANGE_DAYS = 30
+GRANULARITIES = ('hour', 'day')
+
+
+def hour_bucket(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def _upsert(model, keys, rows, counters):
+    """INSERT ... ON CONFLICT DO UPDATE adding ``counters`` to existing rows."""
+    if not rows:
+        return
+    dialect = db.session.get_bind().dialect.name
+    insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+    stmt = insert(model.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=keys,
+        set_={c: model.__table__.c[c] + stmt.excluded[c] for c in counters},
+    )
+    db.session.execute(stmt, rows)
+
+
+def record_sales(sales, sign=1):
+    """Fold order lines into the rollups within the caller's transaction.
+
+    ``sales`` is a sequence of ``(order_key, created_at, product_id,
+    category, quantity, price_cents)`` tuples; ``order_key`` is anything that
+    tells orders apart and is only used to count orders per hour. ``sign=-1``
+    takes the lines back out again (canceled orders).
+    """
+    sales = list(sales)
+    revenues = bulk_line_totals([s[5] for s in sales], [s[4] for s in sales])
+    hourly, per_product, per_category = {}, {}, {}
+    orders_seen = set()
+    for (order_key, created_at, product_id, category, quantity, _), line_cents in zip(sales, revenues):
+        bucket = hour_bucket(created_at)
+        day = created_at.date()
+
+        row = hourly.setdefault(bucket, {"bucket": bucket, "orders": 0, "units": 0, "revenue_cents": 0})
+        if order_key not in orders_seen:
+            orders_seen.add(order_key)
+            row["orders"] += sign
+        row["units"] += sign * quantity
+        row["revenue_cents"] += sign * line_cents
+
+        row = per_product.setdefault((day, product_id), {"day": day, "product_id": product_id, "units": 0, "revenue_cents": 0})
+        row["units"] += sign * quantity
+        row["revenue_cents"] += sign * line_cents
+
+        row = per_category.setdefault((day, category), {"day": day, "category": category, "units": 0, "revenue_cents": 0})
+        row["units"] += sign * quantity
+        row["revenue_cents"] += sign * line_cents
+
+    _upsert(SalesHourly, ['bucket'], list(hourly.values()), ('orders', 'units', 'revenue_cents'))
+    _upsert(ProductSalesDaily, ['day', 'product_id'], list(per_product.values()), ('units', 'revenue_cents'))
+    _upsert(CategorySalesDaily, ['day', 'category'], list(per_category.values()), ('units', 'revenue_cents'))
+
+
+def _order_lines(order_ids=None):
+    lines = select(Order.id, Order.created_at, OrderItem.product_id, Product.category,
+                   OrderItem.quantity, OrderItem.price_cents) \
+        .join(OrderItem, OrderItem.order_id == Order.id) \
+        .join(Product, Product.id == OrderItem.product_id)
+    if order_ids is not None:
+        lines = lines.where(Order.id.in_(order_ids))
+    return lines
+
+
+@jobs.handler(SALES_JOB, batch_size=500)
+def record_order_sales(payloads):
+    """Job: fold the lines of newly placed orders into the rollups.
+
+    Canceled orders are counted too: canceling took their lines back out
+    already, whether or not they had been counted yet. The upsert is not
+    idempotent by itself; a redelivered job cannot count an order twice
+    because ``jobs.run_batch`` deletes the job in this same transaction.
+    """
+    order_ids = sorted({payload["order_id"] for payload in payloads})
+    record_sales(db.session.execute(_order_lines(order_ids)).all())
+
+
+def rebuild_rollups(start=None):
+    """Recompute all rollups from ``order``/``order_item`` (from ``start``'s day on)."""
+    # Orders still waiting for their sales job are counted by the rebuild
+    # instead, so widen it to cover them.
+    pending = [payload["order_id"] for payload in jobs.take(SALES_JOB)]
+    if start and pending:
+        oldest = db.session.query(func.min(Order.created_at)).filter(Order.id.in_(pending)).scalar()
+        if oldest:
+            start = min(start, oldest)
+    # Daily rollups cannot be split, so always rebuild from midnight.
+    start = datetime.combine(start.date(), time.min) if start else None
+
+    for model, column in ((SalesHourly, SalesHourly.bucket),
+                          (ProductSalesDaily, ProductSalesDaily.day),
+                          (CategorySalesDaily, CategorySalesDaily.day)):
+        stmt = delete(model)
+        if start:
+            stmt = stmt.where(column >= (start if model is SalesHourly else start.date()))
+        db.session.execute(stmt)
+
+    lines = _order_lines().where(Order.status.is_distinct_from('canceled'))
+    if start:
+        lines = lines.where(Order.created_at >= start)
+
+    for chunk in db.session.execute(lines.execution_options(yield_per=5000)).partitions():
+        record_sales(chunk)
+    db.session.commit()
+
+
+# --- QUERIES ---
+def parse_range(args):
+    """Read ``from``/``to`` (ISO dates or datetimes, ``to`` exclusive) from query args."""
+    try:
+        end = datetime.fromisoformat(args['to']) if args.get('to') else datetime.utcnow()
+        begin = datetime.fromisoformat(args['from']) if args.get('from') else end - timedelta(days=DEFAULT_RANGE_DAYS)
+    except ValueError:
+        raise ValueError("Dates must be ISO formatted, e.g. 2025-01-31")
+    if begin >= end:
+        raise ValueError("'from' must be before 'to'")
+    return begin, end
+
+
+def _day_range(begin, end):
+    # Daily rollups cover whole days; a partial last day is included.
+    last = end.date() if end.time() != time.min else end.date() - timedelta(days=1)
+    return begin.date(), last
+
+
+def revenue(begin, end, granularity='hour'):
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity '{granularity}'")
+    bucket = SalesHourly.bucket if granularity == 'hour' else func.date(SalesHourly.bucket)
+    rows = (
+        db.session.query(
+            bucket.label('bucket'),
+            func.sum(SalesHourly.orders),
+            func.sum(SalesHourly.units),
+            func.sum(SalesHourly.revenue_cents),
+        )
+        .filter(SalesHourly.bucket >= hour_bucket(begin), SalesHourly.bucket < end)
+        .group_by(bucket)
+        .order_by(bucket)
+        .all()
+    )
+    return [
+        {"bucket": str(b), "orders": orders, "units": units, "revenue": to_dollars(total)}
+        for b, orders, units, total in rows
+    ]
+
+
+def top_products(begin, end, limit=10):
+    first, last = _day_range(begin, end)
+    units = func.sum(ProductSalesDaily.units).label('units')
+    rows = (
+        db.session.query(ProductSalesDaily.product_id, Product.name, units, func.sum(ProductSalesDaily.revenue_cents))
+        .join(Product, Product.id == ProductSalesDaily.product_id)
+        .filter(ProductSalesDaily.day >= first, ProductSalesDaily.day <= last)
+        .group_by(ProductSalesDaily.product_id, Product.name)
+        .order_by(units.desc())
+        .limit(limit)
+        .all()
+    )
+    return [
+        {"product_id": pid, "product": name, "units": units, "revenue": to_dollars(total)}
+        for pid, name, units, total in rows
+    ]
+
+
+def category_mix(begin, end):
+    first, last = _day_range(begin, end)
+    rows = (
+        db.session.query(
+            CategorySalesDaily.category,
+            func.sum(CategorySalesDaily.units),
+            func.sum(CategorySalesDaily.revenue_cents),
+        )
+        .filter(CategorySalesDaily.day >= first, CategorySalesDaily.day <= last)
+        .group_by(CategorySalesDaily.category)
+        .order_by(func.sum(CategorySalesDaily.revenue_cents).desc())
+        .all()
+    )
+    grand_total = sum(total for _, _, total in rows) or 1
+    return [
+        {"category": category, "units": units, "revenue": to_dollars(total), "share": round(total / grand_total, 4)}
+        for category, units, total in rows
+    ]
+
+
+# --- SHIFT (Z) REPORT ---
+SHIFT_FETCH_SIZE = 2000
+SHIFT_FORMATS = ('json', 'html', 'text')
+
+
+def parse_shift_range(args):
+    """``from``/``to`` like parse_range, defaulting to today (UTC) so far."""
+    try:
+        end = datetime.fromisoformat(args['to']) if args.get('to') else datetime.utcnow()
+        begin = datetime.fromisoformat(args['from']) if args.get('from') else datetime.combine(end.date(), time.min)
+    except ValueError:
+        raise ValueError("Dates must be ISO formatted, e.g. 2025-01-31T17:00")
+    if begin >= end:
+        raise ValueError("'from' must be before 'to'")
+    return begin, end
+
+
+def _shift_lines(begin, end):
+    """Every order line placed in [begin, end), one order's lines after another."""
+    lines = select(
+        Order.id, Order.created_at, Order.status, Order.total_cents, Order.discount_cents,
+        OrderItem.product_id, Product.name, Product.category, OrderItem.quantity, OrderItem.price_cents,
+    ) \
+        .join(OrderItem, OrderItem.order_id == Order.id) \
+        .join(Product, Product.id == OrderItem.product_id) \
+        .where(Order.created_at >= begin, Order.created_at < end) \
+        .order_by(Order.created_at, Order.id)
+    return db.session.execute(lines.execution_options(yield_per=SHIFT_FETCH_SIZE))
+
+
+def _tickets(lines):
+    """Group streamed lines into ``(order, lines)``; an order's lines arrive together."""
+    for _, group in groupby(lines, key=itemgetter(0)):
+        group = list(group)
+        yield group[0], group
+
+
+def summarize_shift(tickets):
+    """Fold ``(order, lines)`` tickets into the Z-report totals in one pass.
+
+    Gross sales are line totals before discounts, net sales what was charged
+    (``total_cents``); canceled orders only count towards the voids. Amounts
+    are in cents.
+    """
+    orders = units = gross = discount = net = voids = voided = 0
+    first = last = None
+    products = {}  # product_id -> [name, category, units, cents]
+    hours = {}     # start of hour -> [orders, units, gross cents, net cents]
+    hour_key = hour = None
+    for order, lines in tickets:
+        _, created_at, status, total_cents, discount_cents = order[:5]
+        if status == 'canceled':
+            voids += 1
+            voided += total_cents
+            continue
+        first = first or created_at
+        last = created_at
+        orders += 1
+        discount += discount_cents or 0
+        net += total_cents
+
+        order_units = order_cents = 0
+        for *_, product_id, name, category, quantity, price_cents in lines:
+            cents = quantity * price_cents
+            order_units += quantity
+            order_cents += cents
+            product = products.get(product_id)
+            if product is None:
+                product = products[product_id] = [name, category, 0, 0]
+            product[2] += quantity
+            product[3] += cents
+        units += order_units
+        gross += order_cents
+
+        key = hour_bucket(created_at)
+        if key != hour_key:
+            hour_key = key
+            hour = hours.setdefault(key, [0, 0, 0, 0])
+        hour[0] += 1
+        hour[1] += order_units
+        hour[2] += order_cents
+        hour[3] += total_cents
+
+    categories = {}
+    for _, category, product_units, cents in products.values():
+        row = categories.setdefault(category, [0, 0])
+        row[0] += product_units
+        row[1] += cents
+    return {
+        "orders": orders, "units": units, "gross_cents": gross, "discount_cents": discount, "net_cents": net,
+        "voids": voids, "voided_cents": voided, "first_order": first, "last_order": last,
+        "products": sorted(
+            ((pid, name, category, u, c) for pid, (name, category, u, c) in products.items()),
+            key=lambda row: (-row[4], row[1]),
+        ),
+        "categories": sorted(((category, u, c) for category, (u, c) in categories.items()), key=lambda row: (-row[2], row[0])),
+        "hours": [(key, *hours[key]) for key in sorted(hours)],
+    }
+
+
+def shift_report(begin, end):
+    """The Z-report for orders placed in [begin, end), as a JSON-ready dict."""
+    totals = summarize_shift(_tickets(_shift_lines(begin, end)))
+    db.session.rollback()  # release the read snapshot
+    orders = totals["orders"]
+    return {
+        "from": begin.isoformat(),
+        "to": end.isoformat(),
+        "orders": orders,
+        "units": totals["units"],
+        "gross": to_dollars(totals["gross_cents"]),
+        "discount": to_dollars(totals["discount_cents"]),
+        "net": to_dollars(totals["net_cents"]),
+        "average_ticket": to_dollars(totals["net_cents"] // orders) if orders else 0.0,
+        "voids": totals["voids"],
+        "voided": to_dollars(totals["voided_cents"]),
+        "first_order": totals["first_order"] and totals["first_order"].isoformat(),
+        "last_order": totals["last_order"] and totals["last_order"].isoformat(),
+        "hours": [
+            {"hour": hour.isoformat(), "orders": count, "units": u, "sales": to_dollars(gross), "net": to_dollars(net)}
+            for hour, count, u, gross, net in totals["hours"]
+        ],
+        "categories": [
+            {"category": category, "units": u, "sales": to_dollars(cents)} for category, u, cents in totals["categories"]
+        ],
+        "products": [
+            {"product_id": pid, "product": name, "category": category, "units": u, "sales": to_dollars(cents)}
+            for pid, name, category, u, cents in totals["products"]
+        ],
+    }
+
+
+def shift_report_text(report, width=40):
+    """The Z-report as fixed-width lines for a receipt printer."""
+    def row(label, value):
+        label = str(label)[:width - len(value) - 1]
+        return f"{label}{value:>{width - len(label)}}"
+
+    def amount(value):
+        return f"{value:,.2f}"
+
+    rule = '-' * width
+    lines = [
+        "Z-REPORT".center(width),
+        f"{report['from'][:16]} - {report['to'][:16]}".replace('T', ' ').center(width),
+        rule,
+        row("Orders", str(report['orders'])),
+        row("Items sold", str(report['units'])),
+        row("Gross sales", amount(report['gross'])),
+        row("Points discounts", amount(-report['discount'])),
+        row("Net sales", amount(report['net'])),
+        row("Average ticket", amount(report['average_ticket'])),
+        row(f"Voids ({report['voids']})", amount(report['voided'])),
+        rule,
+        "BY CATEGORY",
+    ]
+    lines += [row(f"{c['category']} x{c['units']}", amount(c['sales'])) for c in report['categories']]
+    lines += [rule, "BY HOUR"]
+    lines += [row(f"{h['hour'][11:16]}  {h['orders']} orders", amount(h['net'])) for h in report['hours']]
+    lines += [rule, "BY PRODUCT"]
+    lines += [row(f"{p['product']} x{p['units']}", amount(p['sales'])) for p in report['products']]
+    lines += [rule, f"Printed {datetime.utcnow():%Y-%m-%d %H:%M} UTC".center(width)]
+    return '\n'.join(lines) + '\n'
+
+
+# --- CLI ---
+reports_cli = AppGroup('reports', help="Sales reporting maintenance.")
+
+
+@reports_cli.command('rebuild')
+@click.option('--since', type=click.DateTime(), default=None,
+              help="Only rebuild buckets from this date on.")
+def rebuild_command(since):
+    """Recompute the sales rollups from the order tables."""
+    rebuild_rollups(since)
+    click.echo("Sales rollups rebuilt.")
+
+
+@reports_cli.command('shift')
+@click.option('--from', 'begin', type=click.DateTime(), default=None,
+              help="Start of the shift; midnight (UTC) by default.")
+@click.option('--to', 'end', type=click.DateTime(), default=None, help="End of the shift; now by default.")
+@click.option('--format', 'output', type=click.Choice(['text', 'json']), default='text', show_default=True)
+def shift_command(begin, end, output):
+    """Print the Z-report for a shift."""
+    try:
+        begin, end = parse_shift_range({
+            'from': begin and begin.isoformat(), 'to': end and end.isoformat(),
+        })
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    report = shift_report(begin, end)
+    click.echo(json.dumps(report, indent=2) + '\n' if output == 'json' else shift_report_text(report), nl=False)
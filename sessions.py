@@ -0,0 +1,275 @@
+"""Server-side sessions: the cookie holds an id, the data lives in a store.
+
+A store is anything with the Redis ``get`` / ``setex`` / ``delete`` calls,
+so a ``redis.Redis`` client works as-is (``SESSION_URL=redis://...``).
+Without ``SESSION_URL`` sessions live in the ``user_session`` table of the
+app database (``DatabaseStore``); ``SESSION_URL=memory://`` keeps them in
+this process only (``MemoryStore``, for a single worker and for tests).
+
+The cookie is ``<id>.<generation>``. Every write bumps the generation and
+reissues the cookie, so each worker can keep recently read payloads in a
+small in-memory front cache keyed by ``(id, generation)``: a browser always
+presents the newest generation, and an entry is never stale for it. Most
+requests only read the session and never touch the store at all. The
+price: a signed-out id stays readable from other workers' front caches for
+up to ``SESSION_CACHE_SECONDS``.
+
+Nothing about the user is kept in the session beyond ``user_id``; names and
+roles are looked up per request through ``access.current_user``.
+"""
+import logging
+import random
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from sqlalchemy.dialects import postgresql, sqlite
+from werkzeug.datastructures import CallbackDict
+
+from models import db, UserSession
+
+log = logging.getLogger(__name__)
+
+KEY_PREFIX = 'session:'
+# Share of writes that also delete expired rows from the session table.
+PURGE_PROBABILITY = 0.01
+
+
+# --- STORES ---
+class MemoryStore:
+    """Process-local stand-in for Redis; sessions do not survive a restart."""
+
+    def __init__(self):
+        self.items = {}
+        self.lock = threading.Lock()
+        self.writes = 0
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires <= time.time():
+                del self.items[key]
+                return None
+            return value
+
+    def setex(self, key, seconds, value):
+        with self.lock:
+            self.items[key] = (value, time.time() + seconds)
+            self.writes += 1
+            if self.writes % 1000 == 0:
+                now = time.time()
+                for expired in [k for k, (_, expires) in self.items.items() if expires <= now]:
+                    del self.items[expired]
+
+    def delete(self, *keys):
+        with self.lock:
+            return sum(self.items.pop(key, None) is not None for key in keys)
+
+
+class DatabaseStore:
+    """Sessions in the ``user_session`` table, shared by every worker.
+
+    Writes run on their own short transaction, independent of the request's
+    ``db.session``.
+    """
+
+    def get(self, key):
+        with db.engine.connect() as conn:
+            return conn.execute(
+                db.select(UserSession.data)
+                .where(UserSession.id == key, UserSession.expires_at > datetime.utcnow())
+            ).scalar()
+
+    def setex(self, key, seconds, value):
+        dialect = db.engine.dialect.name
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        expires_at = datetime.utcnow() + timedelta(seconds=seconds)
+        stmt = insert(UserSession).values(id=key, data=value, expires_at=expires_at)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['id'], set_={'data': stmt.excluded.data, 'expires_at': stmt.excluded.expires_at})
+        with db.engine.begin() as conn:
+            conn.execute(stmt)
+            if random.random() < PURGE_PROBABILITY:
+                conn.execute(db.delete(UserSession).where(UserSession.expires_at <= datetime.utcnow()))
+
+    def delete(self, *keys):
+        with db.engine.begin() as conn:
+            return conn.execute(db.delete(UserSession).where(UserSession.id.in_(keys))).rowcount
+
+
+def store_from_url(url):
+    if not url:
+        return DatabaseStore()
+    if url.startswith('memory://'):
+        return MemoryStore()
+    import redis  # optional dependency, only needed for SESSION_URL=redis://...
+    return redis.Redis.from_url(url)
+
+
+# --- FRONT CACHE ---
+class FrontCache:
+    """Per-worker LRU of recently read payloads, keyed by ``(id, generation)``.
+
+    Entries hold the encoded payload, never the live dict: views mutate
+    session values in place (``flash`` appends to a list).
+    """
+
+    def __init__(self, maxsize=10000, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def configure(self, maxsize, ttl):
+        with self.lock:
+            self.maxsize = maxsize
+            self.ttl = ttl
+            self.entries.clear()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            payload, expires = entry
+            if expires <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return payload
+
+    def put(self, key, payload):
+        if not self.maxsize:
+            return
+        with self.lock:
+            self.entries[key] = (payload, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def drop(self, sid):
+        with self.lock:
+            for key in [k for k in self.entries if k[0] == sid]:
+                del self.entries[key]
+
+
+front_cache = FrontCache()
+
+
+# --- SESSION INTERFACE ---
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, generation=0, touched=None):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.new = sid is None
+        self.sid = sid or _new_sid()
+        self.generation = generation
+        self.touched = touched or time.time()
+        self.previous_sid = None
+        self.modified = False
+
+    def regenerate(self):
+        """Move the data to a fresh id (on sign-in/out, against session fixation)."""
+        if not self.new and self.previous_sid is None:
+            self.previous_sid = self.sid
+        self.sid = _new_sid()
+        self.generation = 0
+        self.modified = True
+
+
+def _new_sid():
+    return secrets.token_urlsafe(32)
+
+
+class ServerSessionInterface(SessionInterface):
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store, lifetime):
+        self.store = store
+        self.lifetime = int(lifetime)
+
+    def _decode(self, payload):
+        raw = self.serializer.loads(payload.decode() if isinstance(payload, bytes) else payload)
+        return raw['g'], raw['t'], raw['d']
+
+    def _encode(self, session):
+        return self.serializer.dumps({'g': session.generation, 't': session.touched, 'd': dict(session)}).encode()
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if not cookie:
+            return ServerSession()
+        sid, _, generation = cookie.rpartition('.')
+        if not sid:
+            return ServerSession()
+
+        payload = front_cache.get((sid, generation))
+        if payload is None:
+            payload = self.store.get(KEY_PREFIX + sid)
+            if payload is None:
+                # Expired or signed out: start over under a new id.
+                return ServerSession()
+        stored_generation, touched, data = self._decode(payload)
+        front_cache.put((sid, str(stored_generation)), payload)
+        return ServerSession(data, sid, stored_generation, touched)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        try:
+            if session.previous_sid:
+                self.store.delete(KEY_PREFIX + session.previous_sid)
+                front_cache.drop(session.previous_sid)
+
+            if not session:
+                if session.modified and not session.new:
+                    self.store.delete(KEY_PREFIX + session.sid)
+                    front_cache.drop(session.sid)
+                    response.delete_cookie(name, domain=domain, path=path,
+                                           secure=self.get_cookie_secure(app),
+                                           samesite=self.get_cookie_samesite(app),
+                                           httponly=self.get_cookie_httponly(app))
+                return
+
+            if session.modified:
+                session.generation += 1
+            elif time.time() - session.touched < self.lifetime / 2:
+                return  # unchanged and far from expiry: nothing to write
+            session.touched = time.time()
+            payload = self._encode(session)
+            self.store.setex(KEY_PREFIX + session.sid, self.lifetime, payload)
+            front_cache.put((session.sid, str(session.generation)), payload)
+        except Exception:
+            # The response is already built; a lost session write only means
+            # a lost flash message or sign-in.
+            log.exception("Could not save session")
+            return
+
+        if session.modified or session.new:
+            response.vary.add('Cookie')
+            response.set_cookie(
+                name, f"{session.sid}.{session.generation}",
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+
+
+def init_app(app):
+    config = app.config
+    store = store_from_url(config.get('SESSION_URL', ''))
+    front_cache.configure(config.get('SESSION_CACHE_SIZE', 10000), config.get('SESSION_CACHE_SECONDS', 60))
+    app.session_interface = ServerSessionInterface(store, config.get('SESSION_LIFETIME', 12 * 3600))
@@ -0,0 +1,115 @@
+"""Shared fixtures: the app factory on a fresh SQLite file per test.
+
+Background threads are off (``JOBS_WORKERS=0``, ``IMAGE_WORKERS=0``), so
+tests run queued jobs themselves with ``jobs.run_pending()``; images are
+never fetched from the network.
+"""
+import os
+import sys
+
+import pytest
+from flask import g
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from config import Config  # noqa: E402
+from models import db, Customer, Product, User  # noqa: E402
+import access  # noqa: E402
+import auth  # noqa: E402
+import catalog  # noqa: E402
+import customer_directory  # noqa: E402
+import http_cache  # noqa: E402
+import images  # noqa: E402
+
+
+def offline_fetch(url):
+    raise images.FetchError("offline")
+
+
+@pytest.fixture
+def app(tmp_path):
+    class TestConfig(Config):
+        TESTING = True
+        SECRET_KEY = 'test'
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(tmp_path / 'pos.db')
+        AUTH_HASH_WORKERS = 0
+        SESSION_URL = 'memory://'
+        JOBS_WORKERS = 0
+        IMAGE_WORKERS = 0
+        IMAGE_DIR = str(tmp_path / 'images')
+        IMAGE_FETCHER = staticmethod(offline_fetch)
+        SNAPSHOT_DIR = str(tmp_path / 'snapshot')
+        METRICS_ENABLED = False
+
+    app = create_app(TestConfig)
+
+    @app.teardown_request
+    def fresh_globals(exc):
+        # Test client requests run inside this fixture's app context; clear
+        # ``g`` so each starts clean, as it would in a real worker.
+        for name in list(g):
+            g.pop(name)
+
+    with app.app_context():
+        db.create_all()
+        # Per-process caches keyed by version counters that restart with
+        # every fresh database.
+        catalog._snapshot = None
+        customer_directory.lookup_cache.clear()
+        access.user_cache.clear()
+        http_cache._bodies.clear()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_product(app):
+    count = [0]
+
+    def make(**values):
+        count[0] += 1
+        values.setdefault('name', f"Product {count[0]}")
+        values.setdefault('price_cents', 250)
+        values.setdefault('stock', 10)
+        values.setdefault('image_url', '')
+        product = Product(**values)
+        db.session.add(product)
+        db.session.commit()
+        return product.id
+    return make
+
+
+@pytest.fixture
+def make_customer(app):
+    count = [0]
+
+    def make(**values):
+        count[0] += 1
+        values.setdefault('name', f"Customer {count[0]}")
+        values.setdefault('phone', f"555-010{count[0]:02d}")
+        customer = Customer(**values)
+        db.session.add(customer)
+        db.session.commit()
+        return customer.id
+    return make
+
+
+@pytest.fixture
+def login(app, client):
+    """Sign ``client`` in as a new user with ``role``."""
+    def sign_in(role='employee'):
+        user = User(name=role, email=f"{role}@example.com", role=role, password_hash=auth.hash_password('secret'))
+        user.set_pin('1234')
+        db.session.add(user)
+        db.session.commit()
+        response = client.post('/login', data={"email": user.email, "password": 'secret'})
+        assert response.status_code == 302 and '/login' not in response.location
+        return client
+    return sign_in
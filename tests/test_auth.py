@@ -0,0 +1,98 @@
+import pytest
+
+from models import db, User
+import auth
+
+
+@pytest.fixture
+def cashier(app):
+    user = User(name='Cashier', email='cashier@example.com', role='employee',
+                password_hash=auth.hash_password('secret'))
+    user.set_pin('1234')
+    db.session.add(user)
+    db.session.commit()
+    # Room for the lockout tests; the throttle has its own test below.
+    auth.login_limiter.configure(50, 50, 100, 100)
+    return user
+
+
+def pin(client, value, email='cashier@example.com'):
+    return client.post('/login/pin', data={"email": email, "pin": value})
+
+
+def signed_in(client):
+    with client.session_transaction() as s:
+        return s.get('user_id')
+
+
+def failures(user):
+    db.session.expire_all()
+    return db.session.get(User, user.id).pin_failures
+
+
+def test_pin_signs_in_an_employee(client, cashier):
+    response = pin(client, '1234')
+    assert response.location.endswith('/order')
+    assert signed_in(client) == cashier.id
+
+
+def test_admins_cannot_use_a_pin(client, cashier):
+    cashier.role = 'admin'
+    db.session.commit()
+    pin(client, '1234')
+    assert signed_in(client) is None
+
+
+def test_pin_locks_after_too_many_wrong_guesses(app, client, cashier):
+    limit = app.config['AUTH_PIN_MAX_FAILURES']
+    for _ in range(limit):
+        pin(client, '0000')
+    assert failures(cashier) == limit
+
+    pin(client, '1234')
+    assert signed_in(client) is None
+
+    # Signing in with the password unlocks the PIN again.
+    client.post('/login', data={"email": cashier.email, "password": 'secret'})
+    assert failures(cashier) == 0
+    client.get('/logout')
+    pin(client, '1234')
+    assert signed_in(client) == cashier.id
+
+
+def test_a_good_pin_resets_the_count(client, cashier):
+    pin(client, '0000')
+    pin(client, '1234')
+    assert failures(cashier) == 0
+
+
+def test_password_attempts_are_throttled_per_account(client, cashier):
+    auth.login_limiter.configure(5, 5, 100, 100)
+    for _ in range(5):
+        client.post('/login', data={"email": cashier.email, "password": 'wrong'})
+    response = client.post('/login', data={"email": cashier.email, "password": 'secret'})
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    assert signed_in(client) is None
+
+
+def test_sign_in_moves_to_a_fresh_session_id(client, cashier):
+    client.get('/login')
+    with client.session_transaction() as s:
+        s['planted'] = True
+        before = s.sid
+    client.post('/login', data={"email": cashier.email, "password": 'secret'})
+    with client.session_transaction() as s:
+        assert s.sid != before
+        assert 'planted' not in s
+        assert s['user_id'] == cashier.id
+
+
+@pytest.mark.parametrize('role, enabled, status', [
+    ('employee', True, 403),
+    ('admin', False, 404),
+    ('admin', True, 200),
+])
+def test_auth_stats_are_for_admins_with_metrics_on(app, login, role, enabled, status):
+    app.config['METRICS_ENABLED'] = enabled
+    assert login(role).get('/auth/stats').status_code == status
@@ -0,0 +1,57 @@
+import pytest
+
+import events
+
+
+@pytest.fixture
+def broker():
+    return events.Broker(events.LocalBackend(), max_subscribers=2)
+
+
+def drain(subscription):
+    out = []
+    while (event := subscription.pop(0)) is not None:
+        out.append(event)
+        if event.type == events.RELOAD:
+            break
+    return out
+
+
+def test_reconnect_replays_what_was_missed(broker):
+    for n in range(3):
+        broker.publish(events.STOCK, {"n": n})
+    first = broker.recent[0].id
+
+    replayed = drain(broker.subscribe(first))
+    assert [event.data for event in replayed] == ['{"n":1}', '{"n":2}']
+
+
+def test_reconnect_past_the_replay_buffer_reloads(broker):
+    broker.publish(events.STOCK, {})
+    (event,) = drain(broker.subscribe('gone-1'))
+    assert event.type == events.RELOAD
+
+
+def test_a_slow_stream_is_told_to_reload(broker):
+    subscription = broker.subscribe()
+    for n in range(events.QUEUE_SIZE + 5):
+        broker.publish(events.STOCK, {"n": n})
+    assert [event.type for event in drain(subscription)] == [events.RELOAD]
+
+
+def test_streams_are_capped_per_worker(broker):
+    held = [broker.subscribe(), broker.subscribe()]
+    assert broker.subscribe() is None
+    broker.unsubscribe(held[0])
+    assert broker.subscribe() is not None
+    assert broker.stats()["subscribers"] == 2
+
+
+@pytest.mark.parametrize('role, enabled, status', [
+    ('employee', True, 403),
+    ('admin', False, 404),
+    ('admin', True, 200),
+])
+def test_stats_are_for_admins_with_metrics_on(app, login, role, enabled, status):
+    app.config['METRICS_ENABLED'] = enabled
+    assert login(role).get('/events/stats').status_code == status
@@ -0,0 +1,140 @@
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from models import db, Product
+import images
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 24
+
+
+@pytest.mark.parametrize('url', [
+    'http://127.0.0.1/logo.png',
+    'http://localhost/logo.png',
+    'http://10.1.2.3/logo.png',
+    'http://169.254.169.254/latest/meta-data/',
+    'http://[::1]/logo.png',
+    'http://[::ffff:127.0.0.1]/logo.png',
+    'https://127.0.0.1/logo.png',
+    'file:///etc/passwd',
+    'ftp://example.com/logo.png',
+])
+def test_fetch_refuses_non_public_targets(url):
+    with pytest.raises(images.FetchError, match="non-public|Unsupported"):
+        images.http_fetch(url)
+
+
+@pytest.mark.parametrize('address, public', [
+    ('93.184.216.34', True),
+    ('2606:4700:4700::1111', True),
+    ('0.0.0.0', False),
+    ('100.64.0.1', False),
+    ('192.168.1.10', False),
+    ('224.0.0.1', False),
+    ('fe80::1%eth0', False),
+    ('::ffff:10.0.0.1', False),
+])
+def test_public_address(address, public):
+    assert images._public_address(address) is public
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """A local HTTP server the fetch guard treats as public; returns its base URL."""
+    routes = {
+        '/logo.png': (200, {}, PNG),
+        '/to-private': (302, {'Location': 'http://10.0.0.1/logo.png'}, b''),
+        '/to-ftp': (302, {'Location': 'ftp://example.com/logo.png'}, b''),
+    }
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            status, headers, body = routes.get(self.path, (404, {}, b''))
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = HTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(images, '_public_address', lambda address: address == '127.0.0.1')
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_fetch_from_an_allowed_host(server, monkeypatch):
+    assert images.http_fetch(server + '/logo.png') == PNG
+
+    monkeypatch.setattr(images, 'MAX_IMAGE_BYTES', 10)
+    with pytest.raises(images.FetchError, match="larger than"):
+        images.http_fetch(server + '/logo.png')
+
+
+def test_redirect_to_a_private_host_is_refused(server):
+    with pytest.raises(images.FetchError, match="non-public host 10.0.0.1"):
+        images.http_fetch(server + '/to-private')
+
+
+def test_redirect_to_another_scheme_is_refused(server):
+    with pytest.raises(images.FetchError, match="Refusing redirect"):
+        images.http_fetch(server + '/to-ftp')
+
+
+def test_eviction_ignores_and_keeps_unrelated_url_memos(tmp_path):
+    store = images.ImageStore(str(tmp_path), max_bytes=250)
+    now = time.time()
+    digests = []
+    for age, fill in ((300, b'a'), (200, b'b'), (100, b'c')):
+        digest = store.put(fill * 100)
+        os.utime(store.path(digest), (now - age, now - age))
+        store.remember(f"https://example.com/{fill.decode()}.png", digest)
+        digests.append(digest)
+
+    assert store.evict() == 200
+    oldest, *kept = digests
+    assert not store.exists(oldest)
+    assert store.recall("https://example.com/a.png") is None
+    assert store.recall("https://example.com/b.png") == kept[0]
+    assert store.recall("https://example.com/c.png") == kept[1]
+    assert len(os.listdir(tmp_path / images.URLS_DIR)) == 2
+
+
+def test_pipeline_stores_once_and_points_products_at_it(app, monkeypatch, make_product):
+    url = 'https://example.com/latte.png'
+    first = make_product(image_url=url)
+    second = make_product(image_url=url)
+    fetched = []
+
+    def fetch(u):
+        fetched.append(u)
+        return PNG
+
+    monkeypatch.setattr(images, '_pillow', lambda: None)
+    monkeypatch.setattr(images.pipeline, 'fetcher', fetch)
+
+    digest = images.pipeline.process(url)
+    assert images.pipeline.process(url) == digest
+    assert fetched == [url]
+
+    db.session.expire_all()
+    assert {db.session.get(Product, p).image_hash for p in (first, second)} == {digest}
+    assert images.missing_urls() == []
+
+
+def test_pipeline_skips_what_is_not_an_image(app, monkeypatch, make_product):
+    make_product(image_url='https://example.com/page.html')
+    monkeypatch.setattr(images, '_pillow', lambda: None)
+    monkeypatch.setattr(images.pipeline, 'fetcher', lambda url: b'<html></html>')
+
+    assert images.pipeline.process('https://example.com/page.html') is None
+    assert images.missing_urls() == ['https://example.com/page.html']
@@ -0,0 +1,150 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from models import db, Customer, Job
+import jobs
+
+KIND = 'test.echo'
+
+
+@pytest.fixture
+def handled(app, monkeypatch):
+    """Register a ``test.echo`` handler; returns the payload batches it ran."""
+    batches = []
+
+    def echo(payloads):
+        bad = [p for p in payloads if p.get("fail")]
+        if bad:
+            raise RuntimeError(f"cannot handle {bad[0]['n']}")
+        batches.append([p["n"] for p in payloads])
+
+    monkeypatch.setitem(jobs.HANDLERS, KIND, (echo, 10))
+    return batches
+
+
+def queued():
+    db.session.expire_all()
+    return {job.id: job for job in Job.query.filter(Job.kind == KIND)}
+
+
+def enqueue(*payloads):
+    jobs.enqueue_many(KIND, list(payloads))
+    db.session.commit()
+
+
+def test_jobs_run_in_batches_and_leave_the_queue(handled):
+    enqueue(*({"n": n} for n in range(15)))
+
+    assert jobs.run_pending(KIND) == 15
+
+    assert handled == [list(range(10)), list(range(10, 15))]
+    assert queued() == {}
+
+
+def test_leased_jobs_are_not_claimed_twice(handled):
+    enqueue({"n": 1}, {"n": 2})
+
+    kind, token, claimed = jobs.claim(kind=KIND)
+    assert [job.attempts for job in claimed] == [1, 1]
+    assert jobs.claim(kind=KIND) is None
+    assert all(job.locked_by == token for job in queued().values())
+
+
+def test_expired_lease_moves_the_jobs_to_another_worker(handled):
+    enqueue({"n": 1})
+    stale = jobs.claim(kind=KIND)
+    db.session.execute(update(Job).values(locked_until=datetime.utcnow() - timedelta(seconds=1)))
+    db.session.commit()
+
+    fresh = jobs.claim(kind=KIND)
+    assert fresh is not None and fresh[1] != stale[1]
+    # The first worker wakes up late: its token no longer matches.
+    assert jobs.run_batch(*stale) == 0
+    assert handled == []
+    assert jobs.run_batch(*fresh) == 1
+    assert handled == [[1]]
+
+
+def test_a_failing_job_does_not_hold_back_its_batch(handled):
+    enqueue({"n": 1}, {"n": 2, "fail": True}, {"n": 3})
+
+    assert jobs.run_pending(KIND) == 2
+
+    assert handled == [[1], [3]]
+    (job,) = queued().values()
+    assert job.status == jobs.QUEUED
+    assert job.attempts == 1
+    assert job.locked_by is None
+    assert job.run_at > datetime.utcnow()
+    assert job.last_error == "RuntimeError: cannot handle 2"
+
+
+def test_a_job_is_parked_dead_after_max_attempts(handled):
+    enqueue({"n": 7, "fail": True})
+
+    for attempt in range(1, 4):
+        db.session.execute(update(Job).values(run_at=datetime.utcnow()))
+        db.session.commit()
+        jobs.run_pending(KIND, max_attempts=3)
+        (job,) = queued().values()
+        assert job.attempts == attempt
+    assert job.status == jobs.DEAD
+    assert jobs.claim(kind=KIND) is None
+
+
+def test_retry_command_requeues_dead_jobs(app, handled):
+    enqueue({"n": 7})
+    db.session.execute(update(Job).values(status=jobs.DEAD, attempts=8, last_error='x'))
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['jobs', 'retry', '--kind', KIND])
+
+    assert "1 jobs queued again" in result.output
+    (job,) = queued().values()
+    assert (job.status, job.attempts, job.last_error) == (jobs.QUEUED, 0, None)
+    assert jobs.run_pending(KIND) == 1
+
+
+def test_handler_writes_roll_back_with_a_failed_batch(app, monkeypatch, make_customer):
+    customer = make_customer()
+
+    def rename_then_fail(payloads):
+        db.session.execute(update(Customer).values(name='changed'))
+        raise RuntimeError("boom")
+
+    monkeypatch.setitem(jobs.HANDLERS, KIND, (rename_then_fail, 10))
+    enqueue({"n": 1})
+    jobs.run_pending(KIND)
+
+    db.session.expire_all()
+    assert db.session.get(Customer, customer).name != 'changed'
+    (job,) = queued().values()
+    assert job.last_error == "RuntimeError: boom"
+
+
+def test_take_removes_queued_jobs_in_the_callers_transaction(handled):
+    enqueue({"n": 1}, {"n": 2})
+
+    assert jobs.take(KIND) == [{"n": 1}, {"n": 2}]
+    db.session.rollback()
+    assert len(queued()) == 2
+
+    jobs.take(KIND)
+    db.session.commit()
+    assert queued() == {}
+
+
+def test_backlog_reports_count_and_age(handled):
+    assert jobs.backlog(KIND) == (0, None)
+    enqueue({"n": 1}, {"n": 2})
+    count, oldest = jobs.backlog(KIND)
+    assert count == 2 and oldest <= datetime.utcnow()
+
+
+@pytest.mark.parametrize('attempts', [1, 2, 5, 30])
+def test_backoff_grows_with_jitter_and_a_cap(attempts):
+    ceiling = min(jobs.BACKOFF_SECONDS * 2 ** (attempts - 1), jobs.BACKOFF_MAX_SECONDS)
+    for _ in range(20):
+        assert ceiling / 2 <= jobs.backoff(attempts) <= ceiling
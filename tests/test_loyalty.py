@@ -0,0 +1,115 @@
+import threading
+
+import pytest
+from sqlalchemy import func, update
+
+from models import db, Customer, LoyaltyEntry
+from order_engine import OrderError, submit_order
+import jobs
+import loyalty
+
+
+def ledger_sum(customer_id):
+    return db.session.query(func.coalesce(func.sum(LoyaltyEntry.delta), 0)) \
+        .filter(LoyaltyEntry.customer_id == customer_id).scalar()
+
+
+def test_points_are_earned_by_the_job_once(make_product, make_customer):
+    product = make_product(price_cents=1250)
+    customer = make_customer()
+    order_id, _ = submit_order(customer, [{"product_id": product, "quantity": 2}])
+    assert loyalty.current_balance(customer) == 0
+
+    jobs.run_pending()
+    assert loyalty.current_balance(customer) == 25
+
+    # A redelivered job finds the order already earned.
+    loyalty.earn_for_orders([{"order_id": order_id}])
+    db.session.commit()
+    assert loyalty.current_balance(customer) == 25
+    assert ledger_sum(customer) == 25
+
+
+def test_redeeming_more_than_the_balance_writes_nothing(make_product, make_customer):
+    product = make_product(price_cents=1000, stock=5)
+    customer = make_customer()
+    loyalty.credit([(customer, None, 50)], loyalty.OPENING)
+    db.session.commit()
+
+    with pytest.raises(OrderError) as error:
+        submit_order(customer, [{"product_id": product, "quantity": 1}], redeem_points=51)
+
+    assert error.value.status == 409
+    assert loyalty.current_balance(customer) == 50
+    assert ledger_sum(customer) == 50
+
+
+def test_points_cannot_pay_more_than_the_total(make_product, make_customer):
+    product = make_product(price_cents=100)
+    customer = make_customer()
+    loyalty.credit([(customer, None, 500)], loyalty.OPENING)
+    db.session.commit()
+    with pytest.raises(OrderError):
+        submit_order(customer, [{"product_id": product, "quantity": 1}], redeem_points=101)
+
+
+def test_concurrent_redemptions_never_overdraw(app, make_customer):
+    customer = make_customer()
+    loyalty.credit([(customer, None, 100)], loyalty.OPENING)
+    db.session.commit()
+    outcomes = []
+    start = threading.Barrier(8)
+
+    def spend():
+        with app.app_context():
+            start.wait()
+            try:
+                loyalty.redeem(customer, 30)
+                db.session.commit()
+                outcomes.append('spent')
+            except loyalty.InsufficientPoints:
+                db.session.rollback()
+                outcomes.append('refused')
+            finally:
+                db.session.remove()
+
+    threads = [threading.Thread(target=spend) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert outcomes.count('spent') == 3
+    db.session.expire_all()
+    assert loyalty.current_balance(customer) == 10
+    assert ledger_sum(customer) == 10
+
+
+def test_reconcile_finds_and_fixes_a_drifted_balance(make_customer):
+    honest = make_customer()
+    drifted = make_customer()
+    loyalty.credit([(honest, None, 40), (drifted, None, 70)], loyalty.OPENING)
+    db.session.execute(update(Customer).where(Customer.id == drifted).values(loyalty_points=999))
+    db.session.commit()
+
+    report = loyalty.reconcile(batch_size=1)
+    assert report["mismatched"] == 1
+    assert report["examples"] == [{"customer_id": drifted, "cached": 999, "ledger": 70}]
+
+    assert loyalty.reconcile(fix=True)["fixed"] == 1
+    assert loyalty.current_balance(drifted) == 70
+    assert loyalty.reconcile()["mismatched"] == 0
+
+
+def test_history_pages_newest_first(make_customer):
+    customer = make_customer()
+    loyalty.credit([(customer, None, delta) for delta in (1, 2, 3, 4, 5)], loyalty.OPENING)
+    db.session.commit()
+
+    page, cursor = loyalty.history(customer, limit=2)
+    assert [e["points"] for e in page] == [5, 4]
+    page, cursor = loyalty.history(customer, before=cursor, limit=2)
+    assert [e["points"] for e in page] == [3, 2]
+    page, cursor = loyalty.history(customer, before=cursor, limit=2)
+    assert [e["points"] for e in page] == [1]
+    assert cursor is None
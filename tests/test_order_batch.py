@@ -0,0 +1,106 @@
+import json
+
+from sqlalchemy import func
+
+from models import db, Order, Product
+import order_engine
+from order_engine import submit_batch, submit_order
+
+
+def ticket(key, customer, product, quantity=1):
+    return {"idempotency_key": key, "customer_id": customer, "items": [{"product_id": product, "quantity": quantity}]}
+
+
+def stock(product_id):
+    db.session.expire_all()
+    return db.session.get(Product, product_id).stock
+
+
+def test_batch_creates_orders_in_chunks(make_product, make_customer):
+    product = make_product(stock=10, price_cents=120)
+    customer = make_customer()
+
+    results = submit_batch([ticket(f"t{i}", customer, product, 2) for i in range(5)], chunk_size=2)
+
+    assert [r["status"] for r in results] == ["created"] * 5
+    assert len({r["order_id"] for r in results}) == 5
+    assert stock(product) == 0
+    assert {o.total_cents for o in Order.query} == {240}
+
+
+def test_replaying_a_batch_reports_duplicates_and_changes_nothing(make_product, make_customer):
+    product = make_product(stock=10)
+    customer = make_customer()
+    tickets = [ticket(f"t{i}", customer, product) for i in range(3)]
+
+    first = submit_batch(tickets)
+    again = submit_batch(tickets)
+
+    assert [r["status"] for r in again] == ["duplicate"] * 3
+    assert [r["order_id"] for r in again] == [r["order_id"] for r in first]
+    assert stock(product) == 7
+    assert db.session.query(func.count(Order.id)).scalar() == 3
+
+
+def test_repeated_key_within_a_batch_is_a_duplicate_of_the_first(make_product, make_customer):
+    product = make_product(stock=10)
+    customer = make_customer()
+
+    results = submit_batch([ticket("same", customer, product), ticket("same", customer, product)])
+
+    assert results[0]["status"] == "created"
+    assert results[1] == {"index": 1, "idempotency_key": "same", "status": "duplicate",
+                          "order_id": results[0]["order_id"]}
+    assert stock(product) == 9
+
+
+def test_bad_tickets_fail_alone(make_product, make_customer):
+    product = make_product(stock=2)
+    customer = make_customer()
+
+    results = submit_batch([
+        ticket("ok", customer, product),
+        {"customer_id": customer, "items": [{"product_id": product, "quantity": 1}]},
+        ticket("nobody", 999, product),
+        ticket("too-many", customer, product, 5),
+        dict(ticket("points", customer, product), redeem_points=10),
+    ])
+
+    assert [r["status"] for r in results] == ["created", "error", "error", "error", "error"]
+    assert results[2]["error"] == "Customer not found"
+    assert stock(product) == 1
+
+
+def test_fallback_reports_a_key_committed_meanwhile_as_duplicate(monkeypatch, make_product, make_customer):
+    product = make_product(stock=10)
+    customer = make_customer()
+    placed, _ = submit_order(customer, [{"product_id": product, "quantity": 1}], idempotency_key="raced")
+
+    # Another register commits "raced" after the batch looked up used keys,
+    # and the chunk write loses its stock guard, forcing the per-order path.
+    real_existing = order_engine.existing_orders
+    lookups = []
+
+    def existing_orders(keys):
+        lookups.append(keys)
+        return {} if len(lookups) == 1 else real_existing(keys)
+
+    monkeypatch.setattr(order_engine, 'existing_orders', existing_orders)
+    monkeypatch.setattr(order_engine, '_write_chunk', lambda chunk, snapshot: None)
+
+    results = submit_batch([ticket("raced", customer, product), ticket("fresh", customer, product)])
+
+    assert results[0] == {"index": 0, "idempotency_key": "raced", "status": "duplicate", "order_id": placed}
+    assert results[1]["status"] == "created"
+    assert stock(product) == 8
+
+
+def test_batch_endpoint_accepts_ndjson(client, make_product, make_customer):
+    product = make_product(stock=5)
+    customer = make_customer()
+    body = "\n".join(json.dumps(ticket(f"n{i}", customer, product)) for i in range(2))
+
+    response = client.post('/orders/batch', data=body, content_type='application/x-ndjson')
+
+    assert response.status_code == 200
+    assert response.json["created"] == 2
@@ -0,0 +1,127 @@
+import threading
+
+import pytest
+from sqlalchemy import func
+
+from models import db, Job, Order, OrderItem, Product
+from order_engine import OrderError, submit_order
+
+
+def stock(product_id):
+    db.session.expire_all()
+    return db.session.get(Product, product_id).stock
+
+
+def test_order_reserves_stock_and_prices_in_cents(make_product, make_customer):
+    coffee = make_product(price_cents=199, stock=5)
+    bagel = make_product(price_cents=350, stock=5)
+    customer = make_customer()
+
+    order_id, created = submit_order(customer, [
+        {"product_id": coffee, "quantity": 2},
+        {"product_id": bagel, "quantity": 1},
+        {"product_id": coffee, "quantity": 1},
+    ])
+
+    assert created
+    order = db.session.get(Order, order_id)
+    assert order.total_cents == 3 * 199 + 350
+    assert order.status == 'pending'
+    assert stock(coffee) == 2
+    assert stock(bagel) == 4
+    assert db.session.query(func.count(OrderItem.id)).filter(OrderItem.order_id == order_id).scalar() == 3
+
+
+def test_short_stock_rejects_the_whole_ticket(make_product, make_customer):
+    plenty = make_product(stock=10)
+    scarce = make_product(stock=1)
+    customer = make_customer()
+
+    with pytest.raises(OrderError):
+        submit_order(customer, [{"product_id": plenty, "quantity": 1}, {"product_id": scarce, "quantity": 2}])
+
+    assert stock(plenty) == 10
+    assert stock(scarce) == 1
+    assert db.session.query(func.count(Order.id)).scalar() == 0
+    assert db.session.query(func.count()).select_from(Job).scalar() == 0
+
+
+@pytest.mark.parametrize('items', [
+    [],
+    [{"product_id": 1}],
+    [{"product_id": 1, "quantity": 0}],
+    [{"product_id": "x", "quantity": 1}],
+])
+def test_malformed_items_are_rejected(make_product, make_customer, items):
+    make_product()
+    with pytest.raises(OrderError):
+        submit_order(make_customer(), items)
+
+
+def test_unknown_customer_is_not_found(make_product):
+    product = make_product()
+    with pytest.raises(OrderError) as error:
+        submit_order(999, [{"product_id": product, "quantity": 1}])
+    assert error.value.status == 404
+    assert stock(product) == 10
+
+
+def test_replayed_idempotency_key_returns_the_original_order(make_product, make_customer):
+    product = make_product(stock=5)
+    customer = make_customer()
+    items = [{"product_id": product, "quantity": 2}]
+
+    first = submit_order(customer, items, idempotency_key='register-1:42')
+    again = submit_order(customer, items, idempotency_key='register-1:42')
+
+    assert first == (first[0], True)
+    assert again == (first[0], False)
+    assert stock(product) == 3
+    assert db.session.query(func.count(Order.id)).scalar() == 1
+
+
+def test_order_queues_its_follow_up_jobs(make_product, make_customer):
+    order_id, _ = submit_order(make_customer(), [{"product_id": make_product(), "quantity": 1}])
+    kinds = sorted(kind for (kind,) in db.session.query(Job.kind))
+    assert kinds == ['loyalty.earn', 'reports.sales']
+
+
+def test_concurrent_orders_never_oversell(app, make_product, make_customer):
+    product = make_product(stock=5)
+    customer = make_customer()
+    outcomes = []
+    start = threading.Barrier(12)
+
+    def place():
+        with app.app_context():
+            start.wait()
+            try:
+                submit_order(customer, [{"product_id": product, "quantity": 1}])
+                outcomes.append('placed')
+            except OrderError:
+                outcomes.append('unavailable')
+            finally:
+                db.session.remove()
+
+    threads = [threading.Thread(target=place) for _ in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert outcomes.count('placed') == 5
+    assert outcomes.count('unavailable') == 7
+    assert stock(product) == 0
+    assert db.session.query(func.count(Order.id)).scalar() == 5
+
+
+def test_create_order_endpoint(client, make_product, make_customer):
+    product = make_product(stock=1)
+    customer = make_customer()
+
+    response = client.post('/create_order', json={"customer_id": customer, "items": [{"product_id": product, "quantity": 1}]})
+    assert response.status_code == 200
+    assert response.json["order_id"]
+
+    response = client.post('/create_order', json={"customer_id": customer, "items": [{"product_id": product, "quantity": 1}]})
+    assert response.status_code == 400
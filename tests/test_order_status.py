@@ -0,0 +1,96 @@
+import pytest
+from sqlalchemy import func
+
+from models import db, Order, Product, ProductSalesDaily, SalesHourly
+from order_engine import OrderError, submit_order
+import jobs
+import loyalty
+import order_status
+
+
+@pytest.fixture
+def sale(make_product, make_customer):
+    """A customer with 300 points who bought 3 x $4.00 paying 100 of them."""
+    product = make_product(price_cents=400, stock=10)
+    customer = make_customer()
+    loyalty.credit([(customer, None, 300)], loyalty.OPENING)
+    db.session.commit()
+    order_id, _ = submit_order(customer, [{"product_id": product, "quantity": 3}], redeem_points=100)
+    return product, customer, order_id
+
+
+def stock(product_id):
+    db.session.expire_all()
+    return db.session.get(Product, product_id).stock
+
+
+def units_sold(product_id):
+    return db.session.query(func.coalesce(func.sum(ProductSalesDaily.units), 0)) \
+        .filter(ProductSalesDaily.product_id == product_id).scalar()
+
+
+def test_order_moves_through_the_make_line(sale):
+    _, _, order_id = sale
+    for status in ('in_progress', 'ready', 'completed'):
+        row = order_status.transition(order_id, status)
+        assert row["status"] == status
+    order = db.session.get(Order, order_id)
+    assert order.started_at <= order.ready_at <= order.completed_at
+
+
+@pytest.mark.parametrize('path, target', [
+    ((), 'ready'),                                          # skipping a step
+    (('in_progress', 'ready', 'completed'), 'canceled'),    # too late to cancel
+    (('canceled',), 'in_progress'),                         # canceled is final
+])
+def test_illegal_transitions_are_refused(sale, path, target):
+    _, _, order_id = sale
+    for status in path:
+        order_status.transition(order_id, status)
+    with pytest.raises(OrderError) as error:
+        order_status.transition(order_id, target)
+    assert error.value.status == 409
+
+
+def test_unknown_order_and_status(sale):
+    _, _, order_id = sale
+    with pytest.raises(OrderError) as error:
+        order_status.transition(order_id + 100, 'in_progress')
+    assert error.value.status == 404
+    with pytest.raises(OrderError):
+        order_status.transition(order_id, 'lost')
+
+
+def test_cancel_after_the_jobs_ran_undoes_everything(sale):
+    product, customer, order_id = sale
+    jobs.run_pending()
+    # 300 - 100 redeemed + 11 earned on $11.00 paid.
+    assert loyalty.current_balance(customer) == 211
+    assert units_sold(product) == 3
+
+    order_status.transition(order_id, 'canceled')
+
+    assert stock(product) == 10
+    assert loyalty.current_balance(customer) == 300
+    assert units_sold(product) == 0
+    assert db.session.query(func.sum(SalesHourly.orders)).scalar() == 0
+
+
+def test_cancel_before_the_jobs_ran_undoes_everything(sale):
+    product, customer, order_id = sale
+
+    order_status.transition(order_id, 'canceled')
+    jobs.run_pending()
+
+    assert stock(product) == 10
+    assert loyalty.current_balance(customer) == 300
+    assert units_sold(product) == 0
+    assert loyalty.reconcile()["mismatched"] == 0
+
+
+def test_second_cancel_is_refused_and_changes_nothing(sale):
+    product, _, order_id = sale
+    order_status.transition(order_id, 'canceled')
+    with pytest.raises(OrderError):
+        order_status.transition(order_id, 'canceled')
+    assert stock(product) == 10
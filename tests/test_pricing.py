@@ -0,0 +1,55 @@
+from decimal import Decimal
+
+import pytest
+
+import pricing
+from models import Product
+
+
+@pytest.mark.parametrize('amount, cents', [
+    (0.1, 10),
+    (0.29, 29),           # 0.29 * 100 is 28.999999999999996 as a float
+    (1.005, 101),         # half up, not banker's rounding or float truncation
+    ('19.99', 1999),
+    (Decimal('2.675'), 268),
+    (-1.005, -101),
+    (None, None),
+])
+def test_to_cents_rounds_half_up_without_float_error(amount, cents):
+    assert pricing.to_cents(amount) == cents
+
+
+@pytest.mark.parametrize('cents, text', [(1205, '12.05'), (5, '0.05'), (0, '0.00'), (-250, '-2.50')])
+def test_format_cents(cents, text):
+    assert pricing.format_cents(cents) == text
+
+
+def test_price_order_is_exact_and_earns_whole_dollars():
+    line_totals, total, points = pricing.price_order([(1, 3), (2, 1)], {1: 10, 2: 1999})
+    assert line_totals == [30, 1999]
+    assert total == 2029
+    assert points == 20
+
+
+def test_price_setter_stores_cents():
+    product = Product(name='x', image_url='')
+    product.price = 0.29
+    assert product.price_cents == 29
+    assert product.price == 0.29
+
+
+@pytest.mark.parametrize('numpy', [True, False])
+def test_bulk_paths_match_single_ticket_pricing(monkeypatch, numpy):
+    if numpy:
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(pricing, '_numpy', lambda: None)
+    prices = [199, 350, 1, 99999]
+    quantities = [3, 1, 7, 2]
+    order_index = [0, 1, 0, 2]
+
+    assert pricing.bulk_line_totals(prices, quantities) == [597, 350, 7, 199998]
+    totals, points = pricing.bulk_order_totals(order_index, prices, quantities, 4)
+    assert totals == [604, 350, 199998, 0]
+    assert points == [6, 3, 1999, 0]
+    assert all(type(t) is int for t in totals)
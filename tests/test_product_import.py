@@ -0,0 +1,137 @@
+import io
+import json
+
+import pytest
+
+from models import db, Product
+import product_import
+
+
+def run(text, fmt='csv', encoding='utf-8', **options):
+    report = product_import.import_file(io.BytesIO(text.encode(encoding)), fmt, **options)
+    return report.as_dict()
+
+
+def products():
+    db.session.expire_all()
+    return {p.name: p for p in Product.query}
+
+
+def test_csv_inserts_then_updates_only_the_given_columns(app):
+    report = run("name,category,price,stock\nLatte,Drink,$4.50,20\nScone,Food,3.25,8\n")
+    assert (report["inserted"], report["updated"], report["failed"]) == (2, 0, 0)
+
+    report = run("name,price\nLatte,4.75\n")
+    assert (report["inserted"], report["updated"]) == (0, 1)
+
+    latte = products()["Latte"]
+    assert latte.price_cents == 475
+    assert latte.stock == 20
+    assert latte.category == 'Drink'
+
+
+def test_bad_rows_are_reported_by_line_and_skipped(app):
+    report = run(
+        "name,price,stock\n"
+        "Good,1.00,1\n"
+        ",1.00,1\n"
+        "Cheap,abc,1\n"
+        "Negative,1.00,-4\n"
+        f"Huge,1.00,{2 ** 63}\n"
+        "NoPrice,,3\n"
+    )
+
+    assert report["inserted"] == 1
+    assert [(e["line"], e["error"]) for e in report["errors"]] == [
+        (3, "name is required"),
+        (4, "invalid price 'abc'"),
+        (5, "stock cannot be negative"),
+        (6, "stock is too large"),
+        (7, "price is required for new products"),
+    ]
+    assert set(products()) == {"Good"}
+
+
+def test_later_rows_win_within_a_file(app):
+    report = run("name,price\nTea,1.00\nTea,1.50\n", chunk_size=10)
+    assert report["inserted"] == 1
+    assert products()["Tea"].price_cents == 150
+
+
+def test_chunks_commit_independently(app):
+    rows = "".join(f"P{i},1.00\n" for i in range(7))
+    report = run("name,price\n" + rows, chunk_size=3)
+    assert report["inserted"] == 7
+    assert len(products()) == 7
+
+
+def test_insert_only_leaves_existing_products_alone(app):
+    run("name,price,stock\nMuffin,2.00,5\n")
+
+    rows = [(1, {"name": "Muffin", "price": "9.99"}), (2, {"name": "Bagel", "price": "1.50"})]
+    report = product_import.import_rows(rows, overwrite=False).as_dict()
+
+    assert (report["inserted"], report["skipped"], report["updated"]) == (1, 1, 0)
+    assert products()["Muffin"].price_cents == 200
+
+
+def test_ndjson_and_json_array(app):
+    ndjson = '{"name": "A", "price": 1}\nnot json\n{"name": "B", "price": 2}\n'
+    report = run(ndjson, 'json')
+    assert report["inserted"] == 2
+    assert report["errors"] == [{"line": 2, "error": "Invalid JSON"}]
+
+    report = run(json.dumps([{"name": "C", "price": "3.10"}]), 'json')
+    assert report["inserted"] == 1
+    assert products()["C"].price_cents == 310
+
+
+def test_non_utf8_file_is_reported_not_raised(app):
+    report = run("name,price\nCafé,2.00\n", encoding='latin-1')
+    assert report["failed"] == 1
+    assert report["errors"][0]["line"] is None
+    assert "UTF-8" in report["errors"][0]["error"]
+
+
+def test_malformed_csv_keeps_the_rows_before_it(app):
+    text = "name,price\nA,1\n" + '"' + "x" * 200000 + '",1\n'
+    report = run(text, chunk_size=1)
+    assert report["inserted"] == 1
+    assert report["errors"][0]["error"].startswith("Malformed CSV")
+
+
+def test_a_row_the_database_rejects_fails_alone(app, monkeypatch):
+    real_upsert = product_import._upsert
+
+    def upsert(rows, overwrite=True):
+        if any(values["name"] == "Bad" for values in rows):
+            raise OverflowError("Python int too large to convert to SQLite INTEGER")
+        real_upsert(rows, overwrite)
+
+    monkeypatch.setattr(product_import, '_upsert', upsert)
+    report = run("name,price\nA,1\nBad,1\nC,1\n")
+
+    assert report["inserted"] == 2
+    assert report["errors"] == [{"line": 3, "error": "could not be saved: OverflowError"}]
+
+
+@pytest.mark.parametrize('role, status', [(None, 401), ('customer', 403), ('employee', 200)])
+def test_import_endpoint_requires_staff(client, login, role, status):
+    if role:
+        login(role)
+    response = client.post('/products/import', data="name,price\nX,1\n", content_type='text/csv')
+    assert response.status_code == status
+
+
+def test_sample_products_are_admin_only_and_insert_only(client, login, make_product):
+    make_product(name='Latte', price_cents=999, stock=3)
+    assert client.get('/add_multiple_products').status_code == 405
+    login('employee')
+    assert client.post('/add_multiple_products').status_code == 302
+    assert set(products()) == {'Latte'}
+
+    client.get('/logout')
+    login('admin')
+    assert client.post('/add_multiple_products').status_code == 200
+    latte = products()['Latte']
+    assert (latte.price_cents, latte.stock) == (999, 3)
@@ -0,0 +1,39 @@
+import pytest
+
+from order_engine import submit_order
+import jobs
+
+ROLLUPS = ['/reports/revenue', '/reports/top-products', '/reports/categories']
+
+
+@pytest.mark.parametrize('url', ROLLUPS)
+@pytest.mark.parametrize('role, status', [(None, 401), ('customer', 403), ('employee', 200)])
+def test_rollups_are_for_staff(client, login, url, role, status):
+    if role:
+        login(role)
+    assert client.get(url).status_code == status
+
+
+def test_rollups_count_sales_once_the_jobs_ran(client, login, make_product, make_customer):
+    latte = make_product(name='Latte', category='Drink', price_cents=450)
+    scone = make_product(name='Scone', category='Food', price_cents=300)
+    submit_order(make_customer(), [{"product_id": latte, "quantity": 3}, {"product_id": scone, "quantity": 1}])
+    login('employee')
+
+    assert client.get('/reports/top-products').get_json() == []
+    jobs.run_pending()
+
+    top = client.get('/reports/top-products').get_json()
+    assert [(row["product"], row["units"]) for row in top] == [('Latte', 3), ('Scone', 1)]
+    mix = client.get('/reports/categories').get_json()
+    assert [(row["category"], row["units"]) for row in mix] == [('Drink', 3), ('Food', 1)]
+    (hour,) = client.get('/reports/revenue').get_json()
+    assert (hour["orders"], hour["units"]) == (1, 4)
+
+
+@pytest.mark.parametrize('query', ['from=yesterday', 'from=2025-02-01&to=2025-01-01', 'granularity=week'])
+def test_bad_ranges_are_rejected(client, login, query):
+    login('employee')
+    response = client.get('/reports/revenue?' + query)
+    assert response.status_code == 400
+    assert "error" in response.get_json()
@@ -0,0 +1,26 @@
+"""Database-backed version counters for cross-worker cache invalidation."""
+from sqlalchemy import update
+
+from models import db, DataVersion
+
+CATALOG = "catalog"
+CUSTOMERS = "customers"
+USERS = "users"
+
+
+def current(name):
+    """Return the committed version of ``name`` (0 if never bumped)."""
+    version = db.session.query(DataVersion.version).filter(DataVersion.name == name).scalar()
+    return version or 0
+
+
+def bump(name):
+    """Increment ``name`` inside the caller's transaction."""
+    result = db.session.execute(
+        update(DataVersion)
+        .where(DataVersion.name == name)
+        .values(version=DataVersion.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        db.session.add(DataVersion(name=name, version=1))
@@ -0,0 +1,7 @@
+"""HTTP views, one blueprint per area of the POS."""
+from views import customers, events, exports, images, metrics, orders, products, reports, users
+
+
+def register_blueprints(app):
+    for module in (users, products, customers, orders, reports, events, exports, metrics, images):
+        app.register_blueprint(module.bp)
@@ -0,0 +1,118 @@
+from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash
+
+from models import Customer, db, normalize_phone
+import customer_directory
+import http_cache
+import loyalty
+import versions
+
+bp = Blueprint('customers', __name__)
+
+
+def _directory_args():
+    return {
+        "q": request.args.get('q', ''),
+        "sort": request.args.get('sort', 'name'),
+        "after": request.args.get('after', type=int),
+        "limit": request.args.get('limit', customer_directory.PAGE_SIZE, type=int),
+    }
+
+
+@bp.route('/customers-page')
+def customers_page():
+    args = _directory_args()
+    try:
+        customers, next_after = customer_directory.search_customers(**args)
+    except ValueError as e:
+        flash(str(e))
+        return redirect(url_for('.customers_page'))
+    return render_template(
+        'customer.html',
+        customers=customers,
+        q=args['q'],
+        sort=args['sort'],
+        limit=args['limit'],
+        next_after=next_after,
+    )
+
+
+
+@bp.route('/customers', methods=['POST'])
+def create_customer():
+    data = request.form
+    name = data.get('name')
+    email = data.get('email')
+    phone = data.get('phone')
+    address = data.get('address')
+
+    if not name or not phone:
+        flash("Name and phone are required")
+        return redirect(url_for('products.order'))
+
+    if Customer.query.filter_by(phone_normalized=normalize_phone(phone)).first():
+        flash("A customer with that phone number already exists")
+        return redirect(url_for('products.order'))
+
+    customer = Customer(name=name, email=email, phone=phone, address=address)
+    db.session.add(customer)
+    versions.bump(versions.CUSTOMERS)
+    db.session.commit()
+    customer_directory.lookup_cache.clear()
+    flash("Customer created successfully!")
+    return redirect(url_for('products.order'))
+
+
+@bp.route('/customers', methods=['GET'])
+def get_customers():
+    # Paged directory: ?q=<name/phone/email prefix>&sort=name|newest&after=<id>&limit=<n>
+    args = _directory_args()
+
+    def build():
+        customers, next_after = customer_directory.search_customers(**args)
+        headers = {}
+        if next_after:
+            next_args = {k: v for k, v in dict(args, after=next_after).items() if v}
+            next_url = url_for('.get_customers', **next_args)
+            headers['Link'] = f'<{next_url}>; rel="next"'
+        return [
+            {
+                "id": c.id,
+                "name": c.name,
+                "email": c.email,
+                "phone": c.phone,
+                "points": c.loyalty_points
+            } for c in customers
+        ], headers
+
+    query_string = request.query_string.decode('utf-8', 'replace')
+    key = 'customers?' + query_string if query_string else 'customers'
+    try:
+        return http_cache.cached_json(key, versions.current(versions.CUSTOMERS), build)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@bp.route('/customers/lookup', methods=['GET'])
+def lookup_customer():
+    try:
+        customer = customer_directory.lookup_by_phone(request.args.get('phone', ''))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if customer is None:
+        return jsonify({"error": "Customer not found"}), 404
+    return jsonify(customer)
+
+
+@bp.route('/customers/<int:customer_id>/points', methods=['GET'])
+def customer_points(customer_id):
+    # Balance plus the ledger behind it, newest first: ?before=<entry id>&limit=<n>
+    balance = loyalty.current_balance(customer_id)
+    if balance is None:
+        return jsonify({"error": "Customer not found"}), 404
+    limit = request.args.get('limit', loyalty.HISTORY_PAGE_SIZE, type=int)
+    entries, next_before = loyalty.history(customer_id, request.args.get('before', type=int), limit)
+    response = jsonify({"customer_id": customer_id, "balance": balance, "entries": entries})
+    if next_before:
+        next_url = url_for('.customer_points', customer_id=customer_id, before=next_before, limit=limit)
+        response.headers['Link'] = f'<{next_url}>; rel="next"'
+    return response
@@ -0,0 +1,54 @@
+from flask import Blueprint, Response, current_app, jsonify, request
+import time
+
+from access import login_required
+import events
+
+bp = Blueprint('events', __name__)
+
+HEARTBEAT_SECONDS = 15
+
+
+@bp.route('/events')
+@login_required(api=True)
+def stream():
+    # EventSource sends Last-Event-ID on reconnect; pages pass ?since= for
+    # the first connection so nothing between render and connect is lost.
+    since = request.headers.get('Last-Event-ID') or request.args.get('since', '')
+    subscription = events.broker.subscribe(since)
+    if subscription is None:
+        return jsonify({"error": "Too many live connections"}), 503, {'Retry-After': '30'}
+
+    # Streams hold a worker thread, so they end after a while and the
+    # browser reconnects (replaying from Last-Event-ID) somewhere else.
+    deadline = time.monotonic() + current_app.config.get('EVENTS_STREAM_SECONDS', 300)
+
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                event = subscription.pop(min(HEARTBEAT_SECONDS, remaining))
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield event.encode()
+                if event.type == events.RELOAD:
+                    return
+        finally:
+            events.broker.unsubscribe(subscription)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+
+@bp.route('/events/stats')
+@login_required(role='admin', api=True)
+def stats():
+    if not current_app.config.get('METRICS_ENABLED', True):
+        return jsonify({"error": "Metrics are disabled"}), 404
+    return jsonify(events.broker.stats())
@@ -0,0 +1,34 @@
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from datetime import datetime
+
+from models import db
+from access import login_required
+import exports
+
+bp = Blueprint('exports', __name__, url_prefix='/export')
+
+
+@bp.route('/<any(orders, order_items, customers):name>', methods=['GET'])
+@login_required(role='admin', api=True)  # customer data leaves the building here
+def export(name):
+    fmt = request.args.get('format', 'csv')
+    if fmt not in exports.FORMATS:
+        return jsonify({"error": f"Unknown format '{fmt}'"}), 400
+    try:
+        begin, end = exports.parse_bounds(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    gzip = request.accept_encodings['gzip'] > 0
+    filename = f"{name}-{datetime.utcnow():%Y%m%d-%H%M%S}.{fmt}"
+    headers = {
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'Cache-Control': 'no-store',
+        'X-Accel-Buffering': 'no',
+        'Vary': 'Accept-Encoding',
+    }
+    if gzip:
+        headers['Content-Encoding'] = 'gzip'
+
+    body = exports.stream(db.session, name, fmt, begin, end, gzip=gzip)
+    return Response(stream_with_context(body), mimetype=exports.FORMATS[fmt], headers=headers)
@@ -0,0 +1,34 @@
+import re
+
+from flask import Blueprint, jsonify, redirect, send_file
+
+from models import db, Product
+import images
+
+bp = Blueprint('images', __name__)
+
+DIGEST = re.compile(r'[0-9a-f]{64}')
+# The bytes behind a hash never change, so browsers may keep them forever.
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+@bp.route('/img/<digest>')
+def image(digest):
+    if not DIGEST.fullmatch(digest):
+        return jsonify({"error": "Image not found"}), 404
+    path = images.store.open(digest)
+    if path is None:
+        # Evicted: fall back to the original and cache it again.
+        url = db.session.query(Product.image_url).filter(Product.image_hash == digest).limit(1).scalar()
+        if not url:
+            return jsonify({"error": "Image not found"}), 404
+        images.pipeline.submit(url)
+        response = redirect(url)
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+
+    with open(path, 'rb') as f:
+        mimetype = images.sniff(f.read(12)) or 'application/octet-stream'
+    response = send_file(path, mimetype=mimetype, etag=digest, conditional=True)
+    response.headers['Cache-Control'] = IMMUTABLE
+    return response
@@ -0,0 +1,22 @@
+from flask import Blueprint, Response, current_app, jsonify
+
+import auth
+import events
+import metrics
+
+bp = Blueprint('metrics', __name__)
+
+
+@bp.route('/metrics')
+def prometheus():
+    if not current_app.config.get('METRICS_ENABLED', True):
+        return jsonify({"error": "Metrics are disabled"}), 404
+
+    pool = auth.hash_pool.stats()
+    gauges = [
+        ('pos_auth_hash_pending', "Password hash jobs running or queued in this worker.", pool['pending']),
+        ('pos_auth_hash_queued', "Password hash jobs waiting for a pool process in this worker.", pool['queued']),
+        ('pos_event_streams', "Open /events streams in this worker.", events.broker.stats()['subscribers']),
+    ]
+    body = metrics.render(current_app.config.get('METRICS_DIR'), gauges)
+    return Response(body, mimetype='text/plain; version=0.0.4')
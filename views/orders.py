@@ -0,0 +1,147 @@
+from flask import Blueprint, request, jsonify, url_for
+from sqlalchemy import tuple_
+from sqlalchemy.orm import selectinload
+import json
+
+from models import db, Order, OrderItem
+from access import STAFF, login_required
+from order_engine import submit_order, submit_batch, OrderError
+import events
+import order_status
+import pricing
+
+bp = Blueprint('orders', __name__)
+
+
+@bp.route('/create_order', methods=['POST'])
+def create_order():
+    data = request.get_json(silent=True) or {}
+    customer_id = data.get('customer_id')
+    items = data.get('items', [])  # list of {product_id, quantity}
+
+    try:
+        order_id, _ = submit_order(
+            customer_id, items,
+            idempotency_key=data.get('idempotency_key'),
+            redeem_points=data.get('redeem_points', 0),
+        )
+    except OrderError as e:
+        return jsonify({"error": e.message}), e.status
+
+    return jsonify({"message": "Order created", "order_id": order_id})
+
+
+def _read_ndjson(stream):
+    for line_no, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            raise OrderError(f"Invalid JSON on line {line_no}")
+
+
+@bp.route('/orders/batch', methods=['POST'])
+def create_orders_batch():
+    # Offline registers replay their queued tickets here, either as a JSON
+    # array (or {"orders": [...]}) or as NDJSON, one order per line.
+    try:
+        if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+            orders = list(_read_ndjson(request.stream))
+        else:
+            data = request.get_json(silent=True)
+            orders = data.get('orders') if isinstance(data, dict) else data
+            if not isinstance(orders, list):
+                raise OrderError("Expected a list of orders")
+    except OrderError as e:
+        return jsonify({"error": e.message}), e.status
+
+    results = submit_batch(orders)
+    created = sum(1 for r in results if r['status'] == 'created')
+    return jsonify({"created": created, "results": results})
+
+
+ORDER_PAGE_SIZE = 50
+ORDER_PAGE_MAX = 200
+
+
+@bp.route('/orders/<int:customer_id>', methods=['GET'])
+def get_customer_orders(customer_id):
+    # Keyset pagination, newest first: ?after=<order id>&limit=<n>
+    after = request.args.get('after', type=int)
+    limit = min(max(request.args.get('limit', ORDER_PAGE_SIZE, type=int), 1), ORDER_PAGE_MAX)
+
+    query = (
+        Order.query
+        .options(selectinload(Order.items).joinedload(OrderItem.product))
+        .filter(Order.customer_id == customer_id)
+    )
+    if after:
+        cursor = (
+            db.session.query(Order.created_at, Order.id)
+            .filter(Order.id == after, Order.customer_id == customer_id)
+            .first()
+        )
+        if cursor is None:
+            return jsonify({"error": "Unknown cursor"}), 400
+        query = query.filter(tuple_(Order.created_at, Order.id) < tuple_(*cursor))
+
+    orders = query.order_by(Order.created_at.desc(), Order.id.desc()).limit(limit + 1).all()
+    has_more = len(orders) > limit
+    orders = orders[:limit]
+
+    response = jsonify([
+        {
+            "id": o.id,
+            "total_price": o.total_price,
+            "discount": pricing.to_dollars(o.discount_cents),
+            "status": o.status,
+            "created_at": o.created_at,
+            "items": [
+                {"product": item.product.name, "qty": item.quantity, "price": item.price}
+                for item in o.items
+            ]
+        } for o in orders
+    ])
+    if has_more:
+        next_url = url_for('.get_customer_orders', customer_id=customer_id, after=orders[-1].id, limit=limit)
+        response.headers['Link'] = f'<{next_url}>; rel="next"'
+    return response
+
+
+# --- MAKE-LINE QUEUE ---
+@bp.route('/orders/<int:order_id>/status', methods=['POST'])
+@login_required(role=STAFF, api=True)
+def update_order_status(order_id):
+    data = request.get_json(silent=True) or {}
+    try:
+        order = order_status.transition(order_id, data.get('status'))
+    except OrderError as e:
+        return jsonify({"error": e.message}), e.status
+    return jsonify(order)
+
+
+@bp.route('/queue', methods=['GET'])
+@login_required(role=STAFF, api=True)
+def queue():
+    # Open tickets, oldest first: ?status=pending,ready narrows the list.
+    # Long-poll with ?wait=<seconds>&since=<cursor of the previous answer>:
+    # the answer comes as soon as an order is placed or moves, or after wait.
+    # Screens holding an /events stream get the same `order`/`status` events.
+    statuses = tuple(s for s in request.args.get('status', '').split(',') if s) or order_status.ACTIVE
+    unknown = [s for s in statuses if s not in order_status.ACTIVE]
+    if unknown:
+        return jsonify({"error": f"Unknown queue status '{unknown[0]}'"}), 400
+    limit = min(max(request.args.get('limit', order_status.QUEUE_LIMIT, type=int), 1), order_status.QUEUE_LIMIT)
+
+    wait = min(max(request.args.get('wait', 0, type=float), 0), order_status.QUEUE_WAIT_MAX)
+    if wait:
+        # Don't hold a pooled connection while parked.
+        db.session.remove()
+        order_status.wait_for_change(request.args.get('since', ''), wait)
+
+    # Read the cursor first: anything after it shows up in the next poll.
+    cursor = events.broker.last_event_id()
+    orders = order_status.active_queue(statuses, limit)
+    return jsonify({"cursor": cursor, "orders": orders})
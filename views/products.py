@@ -0,0 +1,209 @@
+from flask import Blueprint, render_template, request, redirect, url_for, jsonify
+from datetime import datetime
+
+from models import Product, db
+from access import STAFF, current_user, login_required
+import catalog
+import events
+import http_cache
+import images
+import product_import
+import reorder
+
+bp = Blueprint('products', __name__)
+
+
+@bp.route('/order')
+@login_required()
+def order():
+    # Read the event position first so the page's stream replays anything
+    # committed while the snapshot was being rendered.
+    since = events.broker.last_event_id()
+    products = catalog.get_catalog().products
+    return render_template('order.html', name=current_user().name, products=products, events_since=since)
+
+
+@bp.route('/products', methods=['GET'])
+def get_products():
+    snapshot = catalog.get_catalog()
+    return http_cache.cached_json('products', snapshot.version, lambda: [
+        {"id": p.id, "name": p.name, "price": p.price, "stock": p.stock, "category": p.category,
+         "image_url": p.image_url, "image": p.image_src}
+        for p in snapshot.products
+    ])
+
+
+SAMPLE_PRODUCTS = [
+    {
+        "name": "Espresso",
+        "category": "Drink",
+        "stock": 10,
+        "price": "2.50",
+        "image_url": "https://lh3.googleusercontent.com/aida-public/AB6AXuAj8EpLVI56YxMycwpZRJvLxvVzpE-QfVwjqdzdrMIEUX2qczthx5VbMy_LpjwzIsWQvGV3GyFSpq2Wl4LRXZ5Rs2HAwqtobp6WYCIhTqDMgV-Y8f6xq4aSXTPf8PJSMhzm-OvHZsgxMkzm0n7SpXYQI8RvgLaoeDWN3fCaPsPt1xe4k3utvkpqxvT6D1N0DAfQbCDLYps_k8a3e6R7SpNAM0GNfIibFw0WRQZvwpzhryAEWjVMPc1P01N0yWPlET0TdSRiUpwvL1M",
+    },
+    {
+        "name": "Cappuccino",
+        "category": "Drink",
+        "stock": 15,
+        "price": "3.50",
+        "image_url": "https://lh3.googleusercontent.com/aida-public/AB6AXuDHnAxhppAEV661r6lI8-XGoLCcsyVfQdg12Q1U2TDFLfY0QN7nYzEREHQbR8D8PwfEMawGds2yxd7GvWwShQPhHLEcUUNqWcnH7EDL8wNitIo2ccKg1YPqh6uyOYL4Ks57PUZ8JYFi_XZQm40jwJzu4j4vlHC0T7b0XjoNTStI3lgvlVIoOJ2lmgNNFnZKO0P1eyEwYSYXIm4s7BpF7V5OPXNdy1Drv_aQOY5nI09G492by4ZTP4VmtWpP7pxZcwYNqD4_vwZQ2fI",
+    },
+    {
+        "name": "Latte",
+        "category": "Drink",
+        "stock": 20,
+        "price": "4.00",
+        "image_url": "https://lh3.googleusercontent.com/aida-public/AB6AXuDLD_S6LvEpZF9j_ER8EfiStDf3DFPwpFU2ulokzowa5A4gMHM2E2i2yXWiblv5hL6Xx8Dn6k0bJ_Do7V33qGNRpVvDz1OsTE4Sqw_jUIM-KoeVEF-qRggqsLjycTd2C3yQmb3htXY5cGeoIs-c0RgdfCOQILa9Gxb-8k1Z1gOKUzvKFTrbUuFM-BO1ao0cG2Hkf_J_4Q_fSKh1FgyCfpBWooTRTbAGUhIclBsSoze218tpVl1rvxx6Ip2vatEVXCZQtJOiroH3pvY",
+    },
+    {
+        "name": "Iced Coffee",
+        "category": "Drink",
+        "stock": 10,
+        "price": "3.00",
+        "image_url": "https://lh3.googleusercontent.com/aida-public/AB6AXuAj8EpLVI56YxMycwpZRJvLxvVzpE-QfVwjqdzdrMIEUX2qczthx5VbMy_LpjwzIsWQvGV3GyFSpq2Wl4LRXZ5Rs2HAwqtobp6WYCIhTqDMgV-Y8f6xq4aSXTPf8PJSMhzm-OvHZsgxMkzm0n7SpXYQI8RvgLaoeDWN3fCaPsPt1xe4k3utvkpqxvT6D1N0DAfQbCDLYps_k8a3e6R7SpNAM0GNfIibFw0WRQZvwpzhryAEWjVMPc1P01N0yWPlET0TdSRiUpwvL1M",
+    },
+    {
+        "name": "Pastry",
+        "category": "Food",
+        "stock": 30,
+        "price": "2.00",
+        "image_url": "https://lh3.googleusercontent.com/aida-public/AB6AXuDHnAxhppAEV661r6lI8-XGoLCcsyVfQdg12Q1U2TDFLfY0QN7nYzEREHQbR8D8PwfEMawGds2yxd7GvWwShQPhHLEcUUNqWcnH7EDL8wNitIo2ccKg1YPqh6uyOYL4Ks57PUZ8JYFi_XZQm40jwJzu4j4vlHC0T7b0XjoNTStI3lgvlVIoOJ2lmgNNFnZKO0P1eyEwYSYXIm4s7BpF7V5OPXNdy1Drv_aQOY5nI09G492by4ZTP4VmtWpP7pxZcwYNqD4_vwZQ2fI",
+    },
+]
+
+
+@bp.route('/add_multiple_products', methods=['POST'])
+@login_required(role='admin')
+def add_multiple_products():
+    # Seeds the demo menu. Insert-only: products that already exist keep
+    # their live price, stock and image.
+    report = product_import.import_rows(enumerate(SAMPLE_PRODUCTS, start=1), overwrite=False)
+    if report.failed:
+        return f"Error: {report.errors[0]['error']}"
+    return f"{report.inserted} products added, {report.skipped} already existed."
+
+
+@bp.route('/products/import', methods=['POST'])
+@login_required(role=STAFF, api=True)
+def import_products():
+    # Either a multipart upload (field "file") or the raw file as the body.
+    upload = request.files.get('file')
+    stream = upload.stream if upload else request.stream
+    filename = (upload.filename if upload else '') or ''
+    mimetype = upload.mimetype if upload else request.mimetype
+    fmt = request.args.get('format')
+    if not fmt:
+        is_csv = mimetype in ('text/csv', 'application/csv') or filename.lower().endswith('.csv')
+        fmt = 'csv' if is_csv else 'json'
+    if fmt not in product_import.READERS:
+        return jsonify({"error": f"Unknown format '{fmt}'"}), 400
+
+    report = product_import.import_file(stream, fmt)
+    status = 400 if report.failed and not (report.inserted or report.updated) else 200
+    return jsonify(report.as_dict()), status
+
+
+
+
+
+# --- INVENTORY PAGE ---
+@bp.route('/inventory')
+@login_required()
+def inventory():
+    category_filter = request.args.get('category')
+    since = events.broker.last_event_id()
+    snapshot = catalog.get_catalog()
+
+    if category_filter:
+        products = snapshot.in_category(category_filter)
+    else:
+        products = snapshot.products
+        category_filter = "Category"  # default text when no filter
+    low_only = bool(request.args.get('low'))
+    if low_only:
+        products = [p for p in products if p.is_low]
+
+    categories = snapshot.categories
+    
+    return render_template(
+        'inventory.html', 
+        name=current_user().name,
+        products=products, 
+        categories=categories,
+        current_category=category_filter,
+        events_since=since,
+        low_stock_count=reorder.low_stock_count(),
+        low_only=low_only,
+    )
+
+@bp.route('/inventory/alerts')
+@login_required(api=True)
+def inventory_alerts():
+    limit = request.args.get('limit', type=int)
+    return jsonify({
+        "count": reorder.low_stock_count(),
+        "alerts": reorder.alerts(min(max(limit, 1), 500) if limit else None),
+        # Velocities lag placed orders by the sales job backlog.
+        "velocity_lag": reorder.velocity_lag(),
+    })
+
+
+@bp.route('/add_product', methods=['POST'])
+@login_required(role=STAFF)
+def add_product():
+    name = request.form['name']
+    category = request.form['category']
+    stock = int(request.form['stock'])
+    last_restocked = datetime.strptime(request.form['last_restocked'], '%Y-%m-%dT%H:%M')
+    price = float(request.form['price'])
+    image_url = request.form['image_url']
+    reorder_threshold = max(int(request.form.get('reorder_threshold') or 0), 0)
+
+    new_product = Product(
+        name=name,
+        category=category,
+        stock=stock,
+        last_restocked=last_restocked,
+        price=price,
+        image_url=image_url,
+        reorder_threshold=reorder_threshold,
+    )
+    db.session.add(new_product)
+    catalog.invalidate()
+    db.session.commit()
+    events.publish_product(new_product)
+    images.pipeline.submit(new_product.image_url)
+    return redirect(url_for('.inventory'))
+
+# edit product form
+
+@bp.route("/product/<int:product_id>/edit", methods=["GET", "POST"])
+@login_required(role=STAFF)
+def edit_product(product_id):
+    product = Product.query.get_or_404(product_id)
+
+    if request.method == "POST":
+        product.name = request.form["name"]
+        product.stock = int(request.form["stock"])   # convert to int
+        product.price = float(request.form["price"]) # convert to float
+        if request.form.get("reorder_threshold"):
+            product.reorder_threshold = max(int(request.form["reorder_threshold"]), 0)
+        image_url = request.form.get("image_url", "").strip()
+        image_changed = bool(image_url) and image_url != product.image_url
+        if image_changed:
+            product.image_url = image_url
+            product.image_hash = None  # until the new picture is cached
+
+        # Convert the string 'YYYY-MM-DD' into a Python date object
+        product.last_restocked = datetime.strptime(
+            request.form["last_restocked"], "%Y-%m-%d"
+        ).date()
+
+        catalog.invalidate()
+        db.session.commit()
+        events.publish_product(product)
+        if image_changed:
+            images.pipeline.submit(product.image_url)
+        return redirect(url_for(".inventory"))
+
+    return render_template("product_edit.html", product=product)
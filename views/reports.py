@@ -0,0 +1,59 @@
+from flask import Blueprint, Response, render_template, request, jsonify
+
+from access import STAFF, login_required
+import reports
+
+bp = Blueprint('reports', __name__, url_prefix='/reports')
+
+
+# The report endpoints read the rollup tables only, except /shift; ?from=&to= are ISO dates.
+@bp.route('/revenue', methods=['GET'])
+@login_required(role=STAFF, api=True)
+def report_revenue():
+    try:
+        begin, end = reports.parse_range(request.args)
+        data = reports.revenue(begin, end, request.args.get('granularity', 'hour'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(data)
+
+
+@bp.route('/top-products', methods=['GET'])
+@login_required(role=STAFF, api=True)
+def report_top_products():
+    try:
+        begin, end = reports.parse_range(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 100)
+    return jsonify(reports.top_products(begin, end, limit))
+
+
+@bp.route('/categories', methods=['GET'])
+@login_required(role=STAFF, api=True)
+def report_categories():
+    try:
+        begin, end = reports.parse_range(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(reports.category_mix(begin, end))
+
+
+# Z-report for closing a register: ?from=&to= default to today so far,
+# ?format=html|text gives a page or printable text instead of JSON.
+@bp.route('/shift', methods=['GET'])
+@login_required(role=STAFF, api=True)
+def report_shift():
+    output = request.args.get('format', 'json')
+    if output not in reports.SHIFT_FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(reports.SHIFT_FORMATS)}"}), 400
+    try:
+        begin, end = reports.parse_shift_range(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    report = reports.shift_report(begin, end)
+    if output == 'html':
+        return render_template('shift_report.html', report=report)
+    if output == 'text':
+        return Response(reports.shift_report_text(report), mimetype='text/plain')
+    return jsonify(report)
@@ -0,0 +1,223 @@
+from flask import Blueprint, current_app, render_template, request, jsonify, redirect, url_for, flash, session
+from sqlalchemy import update
+
+from models import User, db
+from access import ROLES, login_required, user_changed
+import auth
+import http_cache
+import versions
+
+bp = Blueprint('users', __name__)
+
+
+@bp.route('/')
+def index():
+    return render_template('signup.html')
+
+
+@bp.route('/users', methods=['POST'])
+def create_user():
+    data = request.get_json()
+    if not data or 'name' not in data:
+        return jsonify({'error': 'Name is required'}), 400
+    
+    new_user = User(name=data['name'], email=data.get('email', ''))
+    new_user.set_pin(data.get('pin', '0000'))
+    try:
+        if 'password' in data:
+            new_user.password_hash = auth.hash_password(data['password'])
+    except auth.AuthBusy as e:
+        return jsonify({'error': str(e)}), 503
+    db.session.add(new_user)
+    versions.bump(versions.USERS)
+    db.session.commit()
+    return jsonify({'message': 'User created', 'user': {'id': new_user.id, 'name': new_user.name}}), 201
+
+
+@bp.route('/users', methods=['GET'])
+def get_users():
+    def build():
+        users = User.query.all()
+        return [{'id': u.id, 'name': u.name, 'email': u.email, 'role': u.role} for u in users]
+
+    return http_cache.cached_json('users', versions.current(versions.USERS), build)
+
+
+@bp.route('/oneusers/<int:user_id>', methods=['GET'])
+def get_user(user_id):
+    user = User.query.get_or_404(user_id)
+    return jsonify({'id': user.id, 'name': user.name, 'email': user.email, 'role': user.role})
+
+
+@bp.route('/users/<int:user_id>', methods=['PATCH'])
+@login_required(role='admin', api=True)
+def update_user(user_id):
+    user = User.query.get_or_404(user_id)
+    data = request.get_json(silent=True) or {}
+    if 'role' in data:
+        if data['role'] not in ROLES:
+            return jsonify({'error': f"Role must be one of {', '.join(ROLES)}"}), 400
+        user.role = data['role']
+    if data.get('name'):
+        user.name = data['name']
+    if data.get('email'):
+        if User.query.filter(User.email == data['email'], User.id != user_id).first():
+            return jsonify({'error': 'Email already registered'}), 400
+        user.email = data['email']
+    versions.bump(versions.USERS)
+    db.session.commit()
+    # Takes effect on the user's next request, no re-login needed.
+    user_changed(user_id)
+    return jsonify({'id': user.id, 'name': user.name, 'email': user.email, 'role': user.role})
+
+
+@bp.route('/signup', methods=['GET', 'POST'])
+def signup():
+    if request.method == 'POST':
+        name = request.form.get('name')
+        email = request.form.get('email')
+        password = request.form.get('password')
+        pin = request.form.get('pin')
+        role = request.form.get('role', 'admin')
+
+        if not all([name, email, password, pin]):
+            flash('All fields are required!')
+            return redirect(url_for('.signup'))
+
+        if User.query.filter_by(email=email).first():
+            flash('Email already registered!')
+            return redirect(url_for('.signup'))
+
+        new_user = User(name=name, email=email, role=role)
+        new_user.set_pin(pin)
+        try:
+            new_user.password_hash = auth.hash_password(password)
+        except auth.AuthBusy:
+            flash('Sign-up is busy, please try again in a moment.')
+            return render_template('signup.html'), 503
+
+        try:
+            db.session.add(new_user)
+            versions.bump(versions.USERS)
+            db.session.commit()
+            flash('Account created successfully!')
+            return redirect(url_for('.login'))
+        except Exception as e:
+            db.session.rollback()
+            return f'Error: {str(e)}'
+
+    return render_template('signup.html')
+
+
+def _throttled(account):
+    """Render the login page with 429 if this attempt is over the rate limit."""
+    wait = auth.login_limiter.retry_after(account, request.remote_addr)
+    if not wait:
+        return None
+    flash('Too many sign-in attempts, please wait a moment.')
+    return render_template('login.html'), 429, {'Retry-After': str(int(wait) + 1)}
+
+
+def _sign_in(user):
+    # A fresh session id on every sign-in, so a planted cookie is worthless.
+    if user.pin_failures:
+        user.pin_failures = 0
+        db.session.commit()
+    session.clear()
+    session.regenerate()
+    session['user_id'] = user.id
+    flash(f'Welcome back, {user.name}!')
+    return redirect(url_for('products.order'))
+
+
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    if request.method == 'POST':
+        email = request.form.get('email')
+        password = request.form.get('password')
+
+        if not all([email, password]):
+            flash('Email and password are required!')
+            return redirect(url_for('.login'))
+
+        throttled = _throttled(email)
+        if throttled:
+            return throttled
+
+        user = User.query.filter_by(email=email).first()
+        try:
+            valid = user is not None and auth.verify_password(user.password_hash, password)
+        except auth.AuthBusy:
+            flash('Sign-in is busy, please try again in a moment.')
+            return render_template('login.html'), 503
+        if valid:
+            return _sign_in(user)
+        else:
+            flash('Invalid email or password')
+            return redirect(url_for('.login'))
+
+    return render_template('login.html')
+
+
+@bp.route('/logout', methods=['GET', 'POST'])
+def logout():
+    session.clear()
+    session.regenerate()
+    flash('You have been logged out.')
+    return redirect(url_for('.login'))
+
+
+def _take_pin_attempt(user):
+    """Count a PIN attempt against ``user`` in the database; False once the PIN is locked.
+
+    The counter lives in the shared database rather than in this worker, so
+    every worker draws on the same few attempts. The guarded UPDATE claims
+    the attempt before the PIN is checked, so concurrent guesses cannot
+    overrun the limit; ``_sign_in`` resets it.
+    """
+    claimed = db.session.execute(
+        update(User)
+        .where(User.id == user.id, User.pin_failures < current_app.config.get('AUTH_PIN_MAX_FAILURES', 5))
+        .values(pin_failures=User.pin_failures + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return bool(claimed)
+
+
+@bp.route('/login/pin', methods=['POST'])
+def pin_login():
+    """Fast register switching: email + PIN, no password hash.
+
+    Not for admins: a four-digit PIN is not enough to guard the admin role.
+    """
+    email = request.form.get('email')
+    pin = request.form.get('pin')
+
+    if not all([email, pin]):
+        flash('Email and PIN are required!')
+        return redirect(url_for('.login'))
+
+    throttled = _throttled(email)
+    if throttled:
+        return throttled
+
+    user = User.query.filter_by(email=email).first()
+    if user is None or user.is_admin():
+        flash('Invalid email or PIN')
+        return redirect(url_for('.login'))
+    if not _take_pin_attempt(user):
+        flash('PIN sign-in is locked after too many wrong PINs; sign in with your password.')
+        return redirect(url_for('.login'))
+    if user.check_pin(pin):
+        return _sign_in(user)
+    flash('Invalid email or PIN')
+    return redirect(url_for('.login'))
+
+
+@bp.route('/auth/stats', methods=['GET'])
+@login_required(role='admin', api=True)
+def auth_stats():
+    if not current_app.config.get('METRICS_ENABLED', True):
+        return jsonify({"error": "Metrics are disabled"}), 404
+    return jsonify(auth.hash_pool.stats())